@@ -0,0 +1,143 @@
+"""
+Asyncio fetch engine for the Tesco scraper
+Fetches listing pages concurrently under a per-host token-bucket rate limit
+instead of sleeping a fixed delay after every page.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from page_index import page_hash
+from rate_limiter import HostRateLimiter
+from tesco_scraper import DeadlineExceeded, Product, TescoScraper, _parse_listing_in_worker, product_to_dict
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTescoScraper(TescoScraper):
+    """TescoScraper that fetches listing pages concurrently"""
+
+    def __init__(self, delay=2, max_concurrency: int = 4, rate: Optional[float] = None,
+                 burst: Optional[float] = None, **kwargs):
+        """
+        Initialize the scraper
+        Args:
+            delay (int): Delay between requests in seconds, used to derive the default rate
+            max_concurrency (int): Maximum number of requests in flight at once
+            rate (float): Requests per second allowed per host (defaults to 1 / delay)
+            burst (float): Number of requests allowed back-to-back before the rate applies
+            **kwargs: Other TescoScraper options (parser, parse_workers, ...); with
+                adaptive_rate the adaptive controller replaces the fixed rate
+        """
+        super().__init__(delay=delay, **kwargs)
+        self.max_concurrency = max(1, max_concurrency)
+
+        if rate is None:
+            rate = 1.0 / delay if delay else float(self.max_concurrency)
+        self.rate_limiter = self.rate_controller or HostRateLimiter(rate, burst)
+
+        # Make sure the connection pool can hold every concurrent request
+        self._mount_adapter(pool_size=self.max_concurrency)
+
+    def search_products(self, query: str, max_pages: int = 5) -> List[Product]:
+        """
+        Search for products on Tesco website, fetching pages concurrently
+        Args:
+            query (str): Search term
+            max_pages (int): Maximum number of pages to scrape
+        Returns:
+            List[Product]: List of scraped products
+        """
+        return asyncio.run(self.search_products_async(query, max_pages))
+
+    def scrape_category(self, category_url: str, max_pages: int = 5) -> List[Product]:
+        """
+        Scrape products from a specific category, fetching pages concurrently
+        Args:
+            category_url (str): URL of the category page
+            max_pages (int): Maximum number of pages to scrape
+        Returns:
+            List[Product]: List of scraped products
+        """
+        return asyncio.run(self.scrape_category_async(category_url, max_pages))
+
+    async def search_products_async(self, query: str, max_pages: int = 5) -> List[Product]:
+        """Coroutine version of search_products for callers already inside an event loop"""
+        logger.info(f"Scraping up to {max_pages} pages for query: {query}")
+        return await self._crawl_pages(lambda page: self._search_url(query, page), max_pages)
+
+    async def scrape_category_async(self, category_url: str, max_pages: int = 5) -> List[Product]:
+        """Coroutine version of scrape_category for callers already inside an event loop"""
+        logger.info(f"Scraping up to {max_pages} category pages")
+        return await self._crawl_pages(lambda page: self._category_page_url(category_url, page), max_pages)
+
+    async def _crawl_pages(self, url_for_page: Callable[[int], str], max_pages: int) -> List[Product]:
+        """
+        Fetch pages 1..max_pages concurrently and return their products in page order
+        Args:
+            url_for_page: Function building the URL of a page number
+            max_pages (int): Maximum number of pages to scrape
+        Returns:
+            List[Product]: Products from every page before the first empty or failed one
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        deadline = self._deadline_at()
+        results: Dict[int, List[Product]] = {}
+        # Like the sequential scraper, the crawl ends at the first empty or failed page
+        last_page = max_pages
+
+        async def fetch(page: int) -> int:
+            async with semaphore:
+                if page > last_page:
+                    return page
+                url = url_for_page(page)
+                await self.rate_limiter.acquire_async(url)
+                if page > last_page:
+                    return page
+                results[page] = await self._fetch_listing(url, page, deadline)
+                return page
+
+        tasks = [asyncio.create_task(fetch(page)) for page in range(1, max_pages + 1)]
+        for finished in asyncio.as_completed(tasks):
+            page = await finished
+            if page <= last_page and not results.get(page):
+                logger.info(f"No more products found on page {page}")
+                # Pages still waiting for a slot see the new limit and return without fetching
+                last_page = page - 1
+
+        products = []
+        for page in range(1, last_page + 1):
+            products.extend(results[page])
+        return products
+
+    async def _fetch_listing(self, url: str, page: int, deadline: Optional[float] = None) -> List[Product]:
+        """Fetch and parse one listing page, returning no products on error or once the deadline passes"""
+        try:
+            # _crawl_pages has already waited for the rate limiter
+            response = await asyncio.to_thread(self._get, url, False, deadline)
+        except DeadlineExceeded:
+            logger.warning(f"Deadline reached before page {page}, returning partial results")
+            self.deadline_reached = True
+            return []
+        except requests.RequestException as e:
+            logger.error(f"Error fetching page {page}: {e}")
+            return []
+        # Unchanged pages reuse their stored products (stop_after_unchanged needs pages
+        # in order, so it only applies to the sequential crawl)
+        content_hash = None
+        if self.page_index is not None:
+            content_hash = page_hash(response.content, self.embedded_state)
+            rows = self.page_index.lookup(url, content_hash)
+            if rows is not None:
+                return [Product(**row) for row in rows]
+        if self.parse_workers:
+            loop = asyncio.get_running_loop()
+            page_products = await loop.run_in_executor(self.parse_pool(), _parse_listing_in_worker, response.content)
+        else:
+            page_products = await asyncio.to_thread(self._parse_listing_html, response.content)
+        if content_hash is not None:
+            self.page_index.put(url, content_hash, [product_to_dict(product) for product in page_products])
+        return page_products
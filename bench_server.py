@@ -0,0 +1,303 @@
+"""
+Local Tesco stand-in server for offline benchmarks
+Serves a generated corpus of Tesco-like search listings, category pages and product pages
+with configurable page counts, latency and error rate.
+"""
+
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+BRANDS = ['Tesco', 'Tesco Finest', 'Warburtons', 'Hovis', 'Kingsmill', 'Heinz', 'Cadbury', 'Arla', 'Cravendale']
+ADJECTIVES = ['Soft', 'Thick', 'Wholemeal', 'Organic', 'Smooth', 'Crunchy', 'Semi Skimmed', 'Sliced', 'Seeded']
+NOUNS = ['White Bread', 'Milk', 'Bagels', 'Butter', 'Beans', 'Chocolate', 'Yoghurt', 'Cheddar', 'Rolls']
+SIZES = ['400G', '800G', '1L', '2.272L', '4 Pack', '6 Pack', '200G', '500G']
+
+# Departments and their aisles, served under /groceries/en-GB/shop/
+CATEGORY_TREE = {
+    'fresh-food': ['milk-butter-eggs', 'cheese'],
+    'bakery': ['bread', 'rolls-bagels'],
+    'food-cupboard': ['tins-cans', 'chocolate'],
+}
+
+
+class Corpus:
+    """Deterministic set of Tesco-like products and the HTML pages that show them"""
+
+    def __init__(self, products: int = 2000, tiles_per_page: int = 24, seed: int = 1,
+                 embed_state: bool = True):
+        """
+        Generate the corpus
+        Args:
+            products (int): Number of distinct products
+            tiles_per_page (int): Product tiles on each listing page
+            seed (int): Random seed, so every run serves the same pages
+            embed_state (bool): Also embed each listing's products as JSON page state,
+                as Tesco's own pages do
+        """
+        rng = random.Random(seed)
+        self.tiles_per_page = tiles_per_page
+        self.embed_state = embed_state
+        self.products: List[Dict] = []
+        for index in range(products):
+            pence = rng.randint(35, 1500)
+            self.products.append({
+                'id': 250000000 + index,
+                'name': f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(SIZES)}",
+                'brand': rng.choice(BRANDS),
+                'price': f"£{pence // 100}.{pence % 100:02d}",
+                'unit_price': f"£{rng.randint(5, 900) / 100:.2f}/{rng.choice(['kg', 'litre', 'each', '100g'])}",
+                'available': rng.random() > 0.05,
+                'rating': round(rng.uniform(1, 5), 1),
+                'reviews': rng.randint(0, 900),
+            })
+
+        # Products are dealt round-robin into the aisles; a department lists all of its aisles' products
+        aisles = [f'{department}/{aisle}' for department, names in CATEGORY_TREE.items() for aisle in names]
+        self.categories: Dict[str, List[Dict]] = {path: [] for path in list(CATEGORY_TREE) + aisles}
+        for index, product in enumerate(self.products):
+            aisle = aisles[index % len(aisles)]
+            self.categories[aisle].append(product)
+            self.categories[aisle.split('/')[0]].append(product)
+
+    @property
+    def pages(self) -> int:
+        """Number of non-empty listing pages"""
+        return -(-len(self.products) // self.tiles_per_page)
+
+    def listing_page(self, page: int) -> bytes:
+        """HTML of one search results page (empty past the last page)"""
+        return self._document('Search results', *self._listing(self.products, page))
+
+    def category_page(self, path: str, page: int) -> Optional[bytes]:
+        """
+        HTML of one page of a category, or None for an unknown category
+        Args:
+            path (str): Category path below /groceries/en-GB/shop/ ('' for the shop root)
+            page (int): Listing page number
+        """
+        if not path:
+            return self._document('Shop', '')
+        if path not in self.categories:
+            return None
+        aisles = ''.join(
+            f'<a class="category-link" href="/groceries/en-GB/shop/{path}/{aisle}">{aisle}</a>'
+            for aisle in CATEGORY_TREE.get(path, [])
+        )
+        listing, state = self._listing(self.categories[path], page)
+        return self._document(path, f'<div class="categories">{aisles}</div>' + listing, state)
+
+    def _listing(self, products: List[Dict], page: int) -> Tuple[str, Optional[Dict]]:
+        """Tiles of one listing page, and the matching page state (None without embed_state)"""
+        start = (page - 1) * self.tiles_per_page
+        page_products = products[start:start + self.tiles_per_page]
+        html = '<ul class="product-list">' + ''.join(self._tile(product) for product in page_products) + '</ul>'
+        state = None
+        if self.embed_state:
+            state = {'results': {'page': page, 'productItems': [self._state_record(p) for p in page_products]}}
+        return html, state
+
+    @staticmethod
+    def _state_record(product: Dict) -> Dict:
+        """A product as it appears in the page state: numbers rather than display strings"""
+        unit_price, unit = product['unit_price'].lstrip('£').split('/')
+        return {
+            '__typename': 'ProductType',
+            'id': str(product['id']),
+            'title': product['name'],
+            'brandName': product['brand'],
+            'defaultImageUrl': f"https://digitalcontent.api.tesco.com/v2/media/{product['id']}.jpeg",
+            'isForSale': product['available'],
+            'price': {
+                'actual': float(product['price'].lstrip('£')),
+                'unitPrice': float(unit_price),
+                'unitOfMeasure': unit,
+            },
+        }
+
+    def product_page(self, product_id: int) -> Optional[bytes]:
+        """HTML of one product detail page, or None for an unknown product"""
+        index = product_id - 250000000
+        if not 0 <= index < len(self.products):
+            return None
+        product = self.products[index]
+        body = (
+            f'<h1>{product["name"]}</h1>'
+            f'<div class="product-description"><p>{product["name"]}, made with care.</p>'
+            f'<p>Store in a cool, dry place.</p></div>'
+            f'<div class="product-ingredients">Wheat Flour, Water, Yeast, Salt</div>'
+            f'<table class="nutrition-table">'
+            f'<tr><th>Typical values</th><th>Per 100g</th></tr>'
+            f'<tr><td>Energy</td><td>1012kJ / 239kcal</td></tr>'
+            f'<tr><td>Fat</td><td>1.9g</td></tr>'
+            f'<tr><td>Salt</td><td>0.9g</td></tr></table>'
+            f'<span class="star-rating">{product["rating"]}</span>'
+            f'<span class="review-count">{product["reviews"]} reviews</span>'
+        )
+        return self._document(product['name'], body)
+
+    def _tile(self, product: Dict) -> str:
+        availability = 'Available' if product['available'] else 'Currently unavailable'
+        return (
+            f'<li class="product-list--list-item"><div class="product-tile">'
+            f'<div class="product-tile--image"><img src="https://digitalcontent.api.tesco.com/v2/media/'
+            f'{product["id"]}.jpeg" alt=""></div>'
+            f'<h3 class="product-tile--title"><a href="/groceries/en-GB/products/{product["id"]}">'
+            f'{product["name"]}</a></h3>'
+            f'<p class="product-tile--price">{product["price"]}</p>'
+            f'<p class="product-tile--price-per-unit">{product["unit_price"]}</p>'
+            f'<span class="product-tile--brand">{product["brand"]}</span>'
+            f'<span class="product-tile--availability">{availability}</span>'
+            f'<div class="tile-actions"><button>Add</button><script>track({product["id"]})</script></div>'
+            f'</div></li>'
+        )
+
+    @staticmethod
+    def _document(title: str, body: str, state: Optional[Dict] = None) -> bytes:
+        # Pad with the kind of boilerplate real pages carry around the products
+        departments = [f'<a href="/groceries/en-GB/shop/{department}">{department}</a>' for department in CATEGORY_TREE]
+        links = [f'<a href="/groceries/en-GB/zone/{i}">Offer {i}</a>' for i in range(60 - len(departments))]
+        chrome = '<nav>' + ''.join(departments + links) + '</nav>'
+        if state is not None:
+            # '</' can't appear inside a script element
+            state_json = json.dumps(state, separators=(',', ':')).replace('</', '<\\/')
+            body += f'<script type="application/discover+json">{state_json}</script>'
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<script>window.__CONFIG__ = {{"env": "bench"}};</script></head>'
+            f'<body>{chrome}<main>{body}</main><footer>Tesco stand-in</footer></body></html>'
+        ).encode('utf-8')
+
+
+class StandInServer:
+    """Threaded HTTP server serving a Corpus at /groceries/en-GB/..."""
+
+    def __init__(self, corpus: Optional[Corpus] = None, latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 1, rate_limit: Optional[float] = None):
+        """
+        Initialize the server
+        Args:
+            corpus (Corpus): Pages to serve (a default corpus if omitted)
+            latency (float): Seconds added before every response
+            error_rate (float): Fraction of requests answered with a 503
+            seed (int): Random seed for error injection
+            rate_limit (float): Requests per second served before further requests in
+                the same second are answered with a 429 and Retry-After
+        """
+        self.corpus = corpus or Corpus()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def start(self) -> 'StandInServer':
+        """Start serving on a free local port"""
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                try:
+                    server._handle(self)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting (e.g. a timeout or a hedged request)
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            throttle = False
+            if self.rate_limit is not None:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                throttle = len(self._recent) >= self.rate_limit
+                if throttle:
+                    self.throttled += 1
+                else:
+                    self._recent.append(now)
+        if throttle:
+            self._send(handler, 429, b'Too Many Requests', retry_after=1)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            self._send(handler, 503, b'Service Unavailable')
+            return
+
+        url = urlsplit(handler.path)
+        body = None
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+        if url.path == '/groceries/en-GB/search':
+            body = self.corpus.listing_page(page)
+        elif url.path == '/groceries/en-GB/shop' or url.path.startswith('/groceries/en-GB/shop/'):
+            body = self.corpus.category_page(url.path[len('/groceries/en-GB/shop'):].strip('/'), page)
+        elif url.path.startswith('/groceries/en-GB/products/'):
+            try:
+                body = self.corpus.product_page(int(url.path.rsplit('/', 1)[1]))
+            except ValueError:
+                body = None
+
+        if body is None:
+            self._send(handler, 404, b'Not Found')
+            return
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if handler.headers.get('If-None-Match') == etag:
+            self._send(handler, 304, b'', etag)
+        else:
+            self._send(handler, 200, body, etag)
+
+    @staticmethod
+    def _send(handler, status: int, body: bytes, etag: Optional[str] = None,
+              retry_after: Optional[int] = None):
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        if etag:
+            handler.send_header('ETag', etag)
+        if retry_after is not None:
+            handler.send_header('Retry-After', str(retry_after))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
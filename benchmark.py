@@ -0,0 +1,201 @@
+"""
+Offline benchmark suite for the Tesco scraper
+Crawls a local stand-in server and times fetching, parsing and saving.
+Each run is stored as JSON and compared with a saved baseline; a metric
+that gets worse than the baseline by more than the tolerance fails the run.
+
+Usage:
+    python benchmark.py                    # run and compare with the baseline
+    python benchmark.py --save-baseline    # run and make this run the baseline
+    python benchmark.py --pages 40 --latency 0.02 --error-rate 0.01
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from async_scraper import AsyncTescoScraper
+from bench_server import Corpus, StandInServer
+from parsers import PARSER_BACKENDS
+from tesco_scraper import Product, TescoScraper
+
+RESULTS_DIR = 'benchmark_results'
+BASELINE_FILE = os.path.join(RESULTS_DIR, 'baseline.json')
+
+
+def timed(function: Callable, repeat: int = 1) -> float:
+    """Best wall-clock time of `repeat` calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def metric(value: float, unit: str, better: str) -> Dict:
+    return {'value': round(value, 4), 'unit': unit, 'better': better}
+
+
+def bench_crawl(server: StandInServer, pages: int, metrics: Dict):
+    """Pages per second for the sequential and concurrent engines"""
+    engines = [
+        ('crawl_sequential', TescoScraper(delay=0)),
+        ('crawl_async', AsyncTescoScraper(delay=0, max_concurrency=8, rate=1000)),
+    ]
+    for name, scraper in engines:
+        scraper.base_url = server.base_url
+        before = server.requests
+        elapsed = timed(lambda: scraper.search_products('bench', max_pages=pages))
+        metrics[f'{name}_pages_per_sec'] = metric((server.requests - before) / elapsed, 'pages/s', 'higher')
+        scraper.close()
+
+
+def bench_details(server: StandInServer, count: int, metrics: Dict):
+    """Product pages enriched per second"""
+    scraper = TescoScraper(delay=0)
+    urls = [f"{server.base_url}/groceries/en-GB/products/{250000000 + index}" for index in range(count)]
+    elapsed = timed(lambda: scraper.get_product_details_many(urls, max_workers=8, rate=1000))
+    metrics['details_per_sec'] = metric(count / elapsed, 'pages/s', 'higher')
+    scraper.close()
+
+
+def bench_parse(corpus: Corpus, metrics: Dict):
+    """Parse time per product tile for every installed parser backend"""
+    page = corpus.listing_page(1)
+    for name, backend_class in PARSER_BACKENDS.items():
+        try:
+            backend_class()
+        except ImportError:
+            continue
+        for adaptive in (False, True):
+            scraper = TescoScraper(delay=0, parser=name, adaptive_selectors=adaptive)
+            elapsed = timed(lambda: scraper._parse_listing_html(page), repeat=5)
+            suffix = '_adaptive' if adaptive else ''
+            metrics[f'parse_{name}{suffix}_us_per_tile'] = metric(
+                elapsed / corpus.tiles_per_page * 1e6, 'us/tile', 'lower'
+            )
+
+    scraper = TescoScraper(delay=0, embedded_state=True)
+    elapsed = timed(lambda: scraper._parse_listing_html(page), repeat=5)
+    metrics['parse_embedded_state_us_per_tile'] = metric(elapsed / corpus.tiles_per_page * 1e6, 'us/tile', 'lower')
+
+
+def bench_save(products: List[Product], metrics: Dict):
+    """Cost of the CSV and JSON writers per 1000 products"""
+    scraper = TescoScraper(delay=0)
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt, save in (('csv', scraper.save_to_csv), ('json', scraper.save_to_json)):
+            filename = os.path.join(directory, f'products.{fmt}')
+            elapsed = timed(lambda: save(products, filename), repeat=3)
+            metrics[f'save_to_{fmt}_ms_per_1k'] = metric(elapsed / len(products) * 1e6, 'ms/1k', 'lower')
+
+
+def bench_memory(server: StandInServer, pages: int, metrics: Dict):
+    """Peak Python memory of a sequential crawl"""
+    scraper = TescoScraper(delay=0)
+    scraper.base_url = server.base_url
+    tracemalloc.start()
+    scraper.search_products('bench', max_pages=pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    metrics['crawl_peak_memory_mb'] = metric(peak / 1e6, 'MB', 'lower')
+    scraper.close()
+
+
+def run(args) -> Dict:
+    """Run every benchmark and return the results"""
+    corpus = Corpus(products=args.pages * args.tiles, tiles_per_page=args.tiles)
+    metrics: Dict[str, Dict] = {}
+
+    with StandInServer(corpus, latency=args.latency, error_rate=args.error_rate) as server:
+        bench_crawl(server, args.pages, metrics)
+        bench_details(server, min(args.details, len(corpus.products)), metrics)
+        bench_memory(server, args.pages, metrics)
+
+        scraper = TescoScraper(delay=0)
+        scraper.base_url = server.base_url
+        products = scraper.search_products('bench', max_pages=args.pages)
+
+    bench_parse(corpus, metrics)
+    bench_save(products * max(1, 20000 // max(1, len(products))), metrics)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': vars(args).copy(),
+        'metrics': metrics,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Print each metric next to its baseline value
+    Returns:
+        List[str]: Names of the metrics that regressed by more than `tolerance`
+    """
+    regressions = []
+    print(f"{'metric':40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results['metrics'].items():
+        previous = baseline.get('metrics', {}).get(name)
+        if not previous or not previous['value']:
+            print(f"{name:40} {'-':>12} {current['value']:>12} {'new':>8}")
+            continue
+
+        change = current['value'] / previous['value'] - 1
+        worse = -change if current['better'] == 'higher' else change
+        flag = ''
+        if worse > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:40} {previous['value']:>12} {current['value']:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the Tesco scraper')
+    parser.add_argument('--pages', type=int, default=20, help='listing pages to crawl')
+    parser.add_argument('--tiles', type=int, default=24, help='product tiles per listing page')
+    parser.add_argument('--details', type=int, default=100, help='product pages to enrich')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of server latency per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a run fails')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = {key: value for key, value in vars(args).items() if key not in ('tolerance', 'save_baseline')}
+    results = run(argparse.Namespace(**config))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    run_file = os.path.join(RESULTS_DIR, f"run-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(run_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {run_file}")
+
+    if args.save_baseline or not os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {BASELINE_FILE}")
+
+    with open(BASELINE_FILE, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('config') != results['config']:
+        print("Warning: baseline was recorded with different settings")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Persistent product catalogue for the Tesco scraper
+Keeps the latest known state of every product in SQLite, written through
+batched upserts that skip unchanged products, plus an append-only price
+history recording each change of price or availability.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from tesco_scraper import Product
+
+logger = logging.getLogger(__name__)
+
+# Tesco product pages end in a numeric product ID
+PRODUCT_ID_PATTERN = re.compile(r'/products/(\d+)')
+
+# Stored product columns, in table order (after product_id)
+CATALOGUE_COLUMNS = [
+    'name', 'price', 'price_pence', 'price_per_unit', 'image_url', 'product_url',
+    'availability', 'rating', 'review_count', 'description', 'brand',
+]
+
+# Filled in by product detail enrichment; a listing crawl leaves them None
+# and must not wipe out values stored by an earlier enriched crawl
+DETAIL_COLUMNS = ('rating', 'review_count', 'description')
+
+# Changes to these columns are recorded in the price history
+HISTORY_COLUMNS = ('price', 'price_pence', 'price_per_unit', 'availability')
+
+
+def product_id(product_url: Optional[str]) -> Optional[str]:
+    """
+    Catalogue key of a product
+    Args:
+        product_url (str): Product page URL
+    Returns:
+        Optional[str]: Tesco product ID, the URL itself if it has none, or None without a URL
+    """
+    if not product_url:
+        return None
+    match = PRODUCT_ID_PATTERN.search(product_url)
+    return match.group(1) if match else product_url
+
+
+class Catalogue:
+    """SQLite store of the latest state of each product and its price history"""
+
+    def __init__(self, path: str = '.tesco_cache/catalogue.sqlite', batch_size: int = 500):
+        """
+        Open (or create) the catalogue
+        Args:
+            path (str): SQLite database file
+            batch_size (int): Products compared and written per transaction
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS products (
+                product_id TEXT PRIMARY KEY,
+                name TEXT,
+                price TEXT,
+                price_pence INTEGER,
+                price_per_unit TEXT,
+                image_url TEXT,
+                product_url TEXT,
+                availability TEXT,
+                rating REAL,
+                review_count INTEGER,
+                description TEXT,
+                brand TEXT,
+                first_seen REAL NOT NULL,
+                last_changed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS products_changed ON products (last_changed);
+            CREATE INDEX IF NOT EXISTS products_brand ON products (brand);
+            CREATE TABLE IF NOT EXISTS price_history (
+                product_id TEXT NOT NULL,
+                observed_at REAL NOT NULL,
+                price TEXT,
+                price_pence INTEGER,
+                price_per_unit TEXT,
+                availability TEXT
+            );
+            CREATE INDEX IF NOT EXISTS price_history_product ON price_history (product_id, observed_at);
+            CREATE INDEX IF NOT EXISTS price_history_observed ON price_history (observed_at);
+        ''')
+
+    def upsert(self, products: Iterable[Product], observed_at: Optional[float] = None) -> Dict[str, int]:
+        """
+        Add or update products, writing only those that changed
+        Args:
+            products: Products to store; an iterator is consumed batch by batch
+            observed_at (float): Time of the crawl (defaults to now)
+        Returns:
+            Dict[str, int]: Counts of inserted, updated, unchanged and skipped
+                (no product URL) products, and of price history rows added
+        """
+        observed_at = observed_at or time.time()
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'price_changes': 0}
+        products = iter(products)
+        while True:
+            batch = list(islice(products, self.batch_size))
+            if not batch:
+                break
+            self._upsert_batch(batch, observed_at, counts)
+        logger.info(
+            f"Catalogue: {counts['inserted']} new, {counts['updated']} changed, "
+            f"{counts['unchanged']} unchanged products"
+        )
+        return counts
+
+    def _upsert_batch(self, products: List[Product], observed_at: float, counts: Dict[str, int]):
+        # Last occurrence wins when a product appears twice in one batch
+        incoming = {}
+        for product in products:
+            key = product_id(product.product_url)
+            if key is None:
+                counts['skipped'] += 1
+                continue
+            incoming[key] = tuple(getattr(product, column) for column in CATALOGUE_COLUMNS)
+
+        detail_indexes = [CATALOGUE_COLUMNS.index(column) for column in DETAIL_COLUMNS]
+        history_indexes = [CATALOGUE_COLUMNS.index(column) for column in HISTORY_COLUMNS]
+        changed_rows = []
+        history_rows = []
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                stored = self._stored_rows(list(incoming))
+                for key, values in incoming.items():
+                    previous = stored.get(key)
+                    if previous is None:
+                        counts['inserted'] += 1
+                    else:
+                        # Keep enrichment data when this crawl didn't fetch details
+                        values = list(values)
+                        for index in detail_indexes:
+                            if values[index] is None:
+                                values[index] = previous[index]
+                        values = tuple(values)
+                        if values == previous:
+                            counts['unchanged'] += 1
+                            continue
+                        counts['updated'] += 1
+                    changed_rows.append((key, *values, observed_at, observed_at))
+                    if previous is None or any(values[i] != previous[i] for i in history_indexes):
+                        history_rows.append((key, observed_at, *(values[i] for i in history_indexes)))
+
+                columns = ', '.join(CATALOGUE_COLUMNS)
+                assignments = ', '.join(f'{column} = excluded.{column}' for column in CATALOGUE_COLUMNS)
+                self._conn.executemany(
+                    f'INSERT INTO products (product_id, {columns}, first_seen, last_changed) '
+                    f'VALUES ({", ".join("?" * (len(CATALOGUE_COLUMNS) + 3))}) '
+                    f'ON CONFLICT(product_id) DO UPDATE SET {assignments}, last_changed = excluded.last_changed',
+                    changed_rows
+                )
+                self._conn.executemany(
+                    f'INSERT INTO price_history VALUES ({", ".join("?" * (len(HISTORY_COLUMNS) + 2))})',
+                    history_rows
+                )
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        counts['price_changes'] += len(history_rows)
+
+    def _stored_rows(self, keys: List[str]) -> Dict[str, tuple]:
+        """Stored column values of the given products (call with the lock held)"""
+        stored = {}
+        columns = ', '.join(CATALOGUE_COLUMNS)
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            rows = self._conn.execute(
+                f'SELECT product_id, {columns} FROM products WHERE product_id IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            for row in rows:
+                stored[row[0]] = tuple(row[1:])
+        return stored
+
+    def get(self, key: str) -> Optional[Product]:
+        """
+        Latest stored state of a product
+        Args:
+            key (str): Product ID or product URL
+        Returns:
+            Optional[Product]: The product, or None if it isn't in the catalogue
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {", ".join(CATALOGUE_COLUMNS)} FROM products WHERE product_id = ?', (product_id(key),)
+            ).fetchone()
+        return Product(**dict(zip(CATALOGUE_COLUMNS, row))) if row else None
+
+    def price_history(self, key: str, since: float = 0) -> List[Dict]:
+        """
+        Recorded prices of a product, oldest first
+        Args:
+            key (str): Product ID or product URL
+            since (float): Only changes observed at or after this time
+        Returns:
+            List[Dict]: observed_at plus the HISTORY_COLUMNS values
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT observed_at, {", ".join(HISTORY_COLUMNS)} FROM price_history '
+                f'WHERE product_id = ? AND observed_at >= ? ORDER BY observed_at',
+                (product_id(key), since)
+            ).fetchall()
+        return [dict(zip(('observed_at',) + HISTORY_COLUMNS, row)) for row in rows]
+
+    def changes_since(self, since: float) -> List[Dict]:
+        """
+        Price and availability changes observed since a point in time
+        Args:
+            since (float): Unix timestamp, e.g. time.time() - 86400 for the last day
+        Returns:
+            List[Dict]: product_id, name, observed_at, the new price/availability and
+                the previous ones (None for products first seen in the period)
+        """
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT h.product_id, p.name, h.observed_at, h.price, h.price_pence, h.availability,
+                       prev.price, prev.price_pence, prev.availability
+                FROM price_history h
+                JOIN products p ON p.product_id = h.product_id
+                LEFT JOIN price_history prev ON prev.rowid = (
+                    SELECT rowid FROM price_history
+                    WHERE product_id = h.product_id AND observed_at < h.observed_at
+                    ORDER BY observed_at DESC LIMIT 1
+                )
+                WHERE h.observed_at >= ?
+                ORDER BY h.observed_at, h.product_id
+            ''', (since,)).fetchall()
+        keys = ('product_id', 'name', 'observed_at', 'price', 'price_pence', 'availability',
+                'previous_price', 'previous_price_pence', 'previous_availability')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,238 @@
+"""
+Columnar export for scraped products
+Parquet and Arrow (Feather) writers and readers with typed, compressed
+columns. Columns are built straight from ProductBatch arrays, and large
+crawls are written one row group / record batch at a time.
+
+Requires the optional pyarrow package.
+"""
+
+import logging
+from typing import Iterable, List, Optional
+
+from product_batch import ProductBatch
+from tesco_scraper import PRODUCT_FIELDS, Product
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Export columns: the usual product fields followed by the parsed price
+COLUMNS = PRODUCT_FIELDS + ['price_pence']
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet and Arrow export need the pyarrow package (pip install pyarrow)")
+
+
+def product_schema():
+    """Arrow schema of exported products"""
+    _require_pyarrow()
+    category = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        'name': pa.string(),
+        'price': pa.string(),
+        'price_per_unit': pa.string(),
+        'image_url': pa.string(),
+        'product_url': pa.string(),
+        'availability': category,
+        'rating': pa.float64(),
+        'review_count': pa.int64(),
+        'description': pa.string(),
+        'brand': category,
+        'price_pence': pa.int64(),
+    }
+    return pa.schema([(column, types[column]) for column in COLUMNS])
+
+
+def batch_to_table(batch: ProductBatch):
+    """
+    Build an Arrow table from a ProductBatch without going through per-row dicts
+    Args:
+        batch (ProductBatch): Products to convert
+    Returns:
+        pyarrow.Table: Typed table with the columns in COLUMNS
+    """
+    _require_pyarrow()
+    schema = product_schema()
+    arrays = []
+    for column in COLUMNS:
+        if column in ProductBatch.TEXT_COLUMNS:
+            arrays.append(pa.array(batch.column(column), type=pa.string()))
+        elif column in ProductBatch.CATEGORY_COLUMNS:
+            codes, values = batch.encoded(column)
+            # Missing values become nulls rather than an entry in the dictionary
+            present = [value for value in values if value is not None]
+            lookup = np.full(len(values), -1, dtype=np.int32)
+            lookup[[code for code, value in enumerate(values) if value is not None]] = np.arange(len(present))
+            indices = lookup[np.frombuffer(codes, dtype=np.uint32)] if len(values) else np.empty(0, dtype=np.int32)
+            indices = pa.array(indices, mask=indices < 0)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(present, type=pa.string())))
+        elif column == 'rating':
+            values = np.frombuffer(batch.rating, dtype=np.float64)
+            arrays.append(pa.array(values, mask=np.isnan(values)))
+        else:
+            values = np.frombuffer(getattr(batch, column), dtype=np.int64)
+            arrays.append(pa.array(values, mask=values == -1))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def products_to_table(products: Iterable[Product]):
+    """Build an Arrow table from products"""
+    batch = products if isinstance(products, ProductBatch) else ProductBatch(products)
+    return batch_to_table(batch)
+
+
+class ColumnarWriter:
+    """Base class for writers that buffer products into row groups"""
+
+    def __init__(self, filename: str, compression: str = 'zstd', row_group_size: int = 50000):
+        """
+        Open the output file
+        Args:
+            filename (str): Output filename
+            compression (str): Column compression codec ('zstd', 'lz4', 'snappy', ... or None)
+            row_group_size (int): Products buffered before a row group is written
+        """
+        _require_pyarrow()
+        self.filename = filename
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._batch = ProductBatch()
+        self._writer = None
+
+    def _write_table(self, table):
+        raise NotImplementedError
+
+    def write(self, product: Product):
+        """Append one product"""
+        self._batch.append(product)
+        if len(self._batch) >= self.row_group_size:
+            self.flush()
+
+    def write_many(self, products: Iterable[Product]) -> int:
+        """
+        Append products as they are produced
+        Returns:
+            int: Number of products written
+        """
+        written = 0
+        for product in products:
+            self.write(product)
+            written += 1
+        return written
+
+    def flush(self):
+        """Write buffered products as one row group"""
+        # An empty file still gets written once so that it carries the schema
+        if not len(self._batch) and self._writer is not None:
+            return
+        self._write_table(batch_to_table(self._batch))
+        self.count += len(self._batch)
+        self._batch = ProductBatch()
+
+    def close(self):
+        """Write the last row group and close the file"""
+        self.flush()
+        self._writer.close()
+        logger.info(f"Saved {self.count} products to {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetProductWriter(ColumnarWriter):
+    """Streams products to a Parquet file, one row group per row_group_size products"""
+
+    def _write_table(self, table):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.filename, table.schema, compression=self.compression)
+        self._writer.write_table(table)
+
+
+class ArrowProductWriter(ColumnarWriter):
+    """Streams products to an Arrow IPC (Feather v2) file, one record batch per row_group_size products"""
+
+    def _write_table(self, table):
+        if self._writer is None:
+            options = ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = ipc.new_file(self.filename, table.schema, options=options)
+        self._writer.write_table(table)
+
+
+def write_parquet(products: Iterable[Product], filename: str, compression: str = 'zstd',
+                  row_group_size: int = 50000) -> int:
+    """
+    Write products to a Parquet file
+    Returns:
+        int: Number of products written
+    """
+    with ParquetProductWriter(filename, compression, row_group_size) as writer:
+        writer.write_many(products)
+    return writer.count
+
+
+def write_arrow(products: Iterable[Product], filename: str, compression: str = 'zstd',
+                row_group_size: int = 50000) -> int:
+    """
+    Write products to an Arrow IPC (Feather v2) file
+    Returns:
+        int: Number of products written
+    """
+    with ArrowProductWriter(filename, compression, row_group_size) as writer:
+        writer.write_many(products)
+    return writer.count
+
+
+def read_parquet(filename: str, columns: Optional[List[str]] = None):
+    """
+    Load a Parquet export
+    Args:
+        filename (str): File written by save_to_parquet / write_parquet
+        columns (List[str]): Only load these columns
+    Returns:
+        pandas.DataFrame: The exported products
+    """
+    _require_pyarrow()
+    return pq.read_table(filename, columns=columns).to_pandas()
+
+
+def read_arrow(filename: str, columns: Optional[List[str]] = None):
+    """
+    Load an Arrow (Feather) export, memory-mapping the file
+    Args:
+        filename (str): File written by save_to_arrow / write_arrow
+        columns (List[str]): Only load these columns
+    Returns:
+        pandas.DataFrame: The exported products
+    """
+    _require_pyarrow()
+    return feather.read_table(filename, columns=columns, memory_map=True).to_pandas()
+
+
+def read_products(filename: str) -> List[Product]:
+    """
+    Load a Parquet or Arrow export back into Product objects
+    Args:
+        filename (str): File written by one of the columnar writers
+    Returns:
+        List[Product]: The exported products
+    """
+    _require_pyarrow()
+    if filename.endswith('.parquet'):
+        table = pq.read_table(filename)
+    else:
+        table = feather.read_table(filename, memory_map=True)
+    return [Product(**row) for row in table.to_pylist()]
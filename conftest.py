@@ -0,0 +1,54 @@
+"""
+Fixtures shared by the tests that scrape a local server
+"""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from bench_server import Corpus, StandInServer
+from tesco_scraper import TescoScraper
+from transport import close_shared_transports
+
+
+@pytest.fixture
+def corpus():
+    """Catalogue served by the `server` fixture; test modules override it to change its size"""
+    return Corpus(products=40, tiles_per_page=8)
+
+
+@pytest.fixture
+def server(corpus):
+    """Stand-in Tesco site serving `corpus`, with fresh shared transports"""
+    close_shared_transports()
+    with StandInServer(corpus) as server:
+        yield server
+    close_shared_transports()
+
+
+@pytest.fixture
+def make_scraper(server):
+    """Build TescoScrapers pointed at the stand-in server (without a delay unless one is given)"""
+    def make(**kwargs):
+        scraper = TescoScraper(**{'delay': 0, **kwargs})
+        scraper.base_url = server.base_url
+        return scraper
+    return make
+
+
+@pytest.fixture
+def serve():
+    """Start local HTTP servers for request handler classes, returning their base URLs"""
+    servers = []
+
+    def start(handler) -> str:
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return f'http://127.0.0.1:{httpd.server_port}'
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,259 @@
+"""
+Full-catalogue crawler for the Tesco scraper
+Discovers the category tree from the groceries shop root, keeps a
+deduplicated frontier of category URLs on disk and scrapes every leaf
+category with a bounded number of workers. Progress is checkpointed after
+each category, so an interrupted crawl resumes where it stopped.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from rate_limiter import HostRateLimiter
+from tesco_scraper import DeadlineExceeded, Product, TescoScraper
+
+logger = logging.getLogger(__name__)
+
+SHOP_PATH = '/groceries/en-GB/shop'
+
+# Frontier states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Frontier:
+    """On-disk set of category URLs with their crawl state"""
+
+    def __init__(self, path: str = '.tesco_cache/crawl.sqlite'):
+        """
+        Open (or create) the frontier
+        Args:
+            path (str): SQLite database file holding the crawl checkpoint
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                products INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, depth)')
+
+    def add(self, urls: List[Tuple[str, int]]) -> int:
+        """
+        Add URLs not seen before
+        Args:
+            urls: (URL, depth) pairs
+        Returns:
+            int: Number of new URLs
+        """
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO frontier (url, depth, state, updated_at) VALUES (?, ?, ?, ?)',
+                [(url, depth, PENDING, time.time()) for url, depth in urls]
+            )
+            return self._conn.total_changes - before
+
+    def take(self, limit: int) -> List[Tuple[str, int]]:
+        """Mark up to `limit` pending URLs as running (shallowest first) and return them with their depth"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, depth FROM frontier WHERE state = ? ORDER BY depth, rowid LIMIT ?', (PENDING, limit)
+            ).fetchall()
+            self._conn.executemany(
+                'UPDATE frontier SET state = ?, updated_at = ? WHERE url = ?',
+                [(RUNNING, time.time(), url) for url, _ in rows]
+            )
+        return rows
+
+    def mark(self, url: str, state: str, products: int = 0, error: Optional[str] = None):
+        """Record the outcome of crawling a URL"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE frontier SET state = ?, products = ?, error = ?, updated_at = ? WHERE url = ?',
+                (state, products, error, time.time(), url)
+            )
+
+    def reset(self, retry_failed: bool = False):
+        """Return URLs left running by an interrupted crawl (and optionally failed ones) to pending"""
+        states = (RUNNING, FAILED) if retry_failed else (RUNNING,)
+        with self._lock:
+            self._conn.execute(
+                f'UPDATE frontier SET state = ? WHERE state IN ({", ".join("?" * len(states))})',
+                (PENDING, *states)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Number of URLs in each state, and the products scraped so far"""
+        with self._lock:
+            counts = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED)}
+            for state, count in self._conn.execute('SELECT state, COUNT(*) FROM frontier GROUP BY state'):
+                counts[state] = count
+            counts['products'] = self._conn.execute('SELECT COALESCE(SUM(products), 0) FROM frontier').fetchone()[0]
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CatalogueCrawler:
+    """Crawls every category of the Tesco groceries shop"""
+
+    def __init__(self, scraper: Optional[TescoScraper] = None, frontier: Optional[Frontier] = None,
+                 max_workers: int = 2, max_pages: int = 50, max_depth: int = 4):
+        """
+        Initialize the crawler
+        Args:
+            scraper (TescoScraper): Scraper used for fetching and parsing (a default one if omitted)
+            frontier (Frontier): Checkpoint of the crawl (the default file if omitted)
+            max_workers (int): Categories crawled at the same time; together the
+                workers send one request every `delay` seconds, as one sequential worker would
+            max_pages (int): Maximum listing pages scraped per category
+            max_depth (int): Deepest category level followed (1 = departments)
+        """
+        self.scraper = scraper or TescoScraper()
+        self.frontier = frontier or Frontier()
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        scraper = self.scraper
+        if scraper.rate_controller is None and scraper.rate_limiter is None and scraper.delay:
+            # Workers share the scraper, so one limiter paces all their requests
+            scraper.rate_limiter = HostRateLimiter(1 / scraper.delay, capacity=1)
+
+    @property
+    def root_url(self) -> str:
+        return self.scraper.base_url + SHOP_PATH
+
+    def run(self, on_products: Optional[Callable[[str, List[Product]], None]] = None, catalogue=None,
+            max_categories: Optional[int] = None, retry_failed: bool = False,
+            deadline: Optional[float] = None) -> Dict[str, int]:
+        """
+        Crawl until the frontier is exhausted, resuming any earlier interrupted crawl
+        Args:
+            on_products: Called with each leaf category URL and its products, in this thread
+            catalogue: Catalogue the products are upserted into
+            max_categories (int): Stop after crawling this many categories
+            retry_failed (bool): Crawl categories that failed in an earlier run again
+            deadline (float): Seconds after which the crawl stops; categories not yet
+                crawled, or cut short, stay pending for the next run
+        Returns:
+            Dict[str, int]: Frontier counts by state and total products
+        """
+        self.frontier.reset(retry_failed)
+        self.frontier.add([(self.root_url, 0)])
+
+        stop_at = time.monotonic() + deadline if deadline else None
+        crawled = 0
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawl') as pool:
+            while True:
+                budget = self.max_workers - len(running)
+                if max_categories is not None:
+                    budget = min(budget, max_categories - crawled - len(running))
+                if stop_at is not None and time.monotonic() >= stop_at:
+                    budget = 0
+                for url, depth in self.frontier.take(max(0, budget)):
+                    running[pool.submit(self._crawl_category, url, depth, stop_at)] = (url, depth)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    url, depth = running.pop(future)
+                    try:
+                        links, products = future.result()
+                    except DeadlineExceeded:
+                        logger.warning(f"Deadline reached while crawling {url}, leaving it for the next run")
+                        self.frontier.mark(url, PENDING)
+                        continue
+                    except requests.RequestException as e:
+                        crawled += 1
+                        logger.error(f"Error crawling category {url}: {e}")
+                        self.frontier.mark(url, FAILED, error=str(e))
+                        continue
+
+                    crawled += 1
+                    new = self.frontier.add(links)
+                    if products:
+                        if on_products is not None:
+                            on_products(url, products)
+                        if catalogue is not None:
+                            catalogue.upsert(products)
+                    # Checkpoint only once the products have been handed over
+                    self.frontier.mark(url, DONE, len(products))
+                    logger.info(f"Crawled {url}: {len(products)} products, {new} new categories")
+
+        return self.frontier.stats()
+
+    def _crawl_category(self, url: str, depth: int,
+                        stop_at: Optional[float] = None) -> Tuple[List[Tuple[str, int]], List[Product]]:
+        """
+        Fetch a category, discovering its links; leaf categories are also scraped
+        Args:
+            stop_at (float): time.monotonic() value at which the whole crawl stops
+        Returns:
+            Tuple: (URL, depth) of the categories linked from the page, and the
+                products of a leaf category
+        Raises:
+            DeadlineExceeded: If the crawl's deadline cut the category short
+        """
+        # Only the crawl's deadline applies: the scraper's per-listing one would cut categories
+        # short on every run, and the scraper's deadline_reached is shared by all the workers
+        first_page_url = self.scraper._category_page_url(url, 1)
+        response = self.scraper._get(first_page_url, deadline=stop_at)
+
+        links = self._category_links(response.content)
+        # Departments and aisles list their sub-categories' products too, so only leaves are scraped
+        if depth == 0 or any(link.startswith(url + '/') for link, _ in links):
+            return links, []
+
+        products, _ = self.scraper._listing_products(first_page_url, response.content)
+        if products and self.max_pages > 1:
+            # Page 1 is already parsed, so the remaining pages are listed from page 2
+            pages = self.scraper._iter_listing_pages(
+                lambda page: self.scraper._category_page_url(url, page + 1), self.max_pages - 1, f"of category: {url}",
+                deadline=stop_at, partial=False,
+            )
+            for page_products in pages:
+                products.extend(page_products)
+        return links, products
+
+    def _category_links(self, content: bytes) -> List[Tuple[str, int]]:
+        """Normalised URLs and depths of the shop categories (up to max_depth) linked from a page"""
+        parser = self.scraper.parser
+        base = urlsplit(self.scraper.base_url)
+        links = {}
+        for element in parser.select(parser.parse(content), f'a[href*="{SHOP_PATH}/"]'):
+            url = urlsplit(urljoin(self.scraper.base_url, parser.attr(element, 'href') or ''))
+            path = url.path.rstrip('/')
+            if url.netloc != base.netloc or not path.startswith(SHOP_PATH + '/'):
+                continue
+            # Depth is the number of path segments below the shop root (1 = department)
+            depth = path[len(SHOP_PATH) + 1:].count('/') + 1
+            if depth <= self.max_depth:
+                links[f"{base.scheme}://{base.netloc}{path}"] = depth
+        return list(links.items())
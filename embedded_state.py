@@ -0,0 +1,158 @@
+"""
+Embedded page state for the Tesco scraper
+Tesco listing pages carry their application state as JSON in a script tag.
+Finding that blob with a byte scan and mapping its product records straight
+to Products skips building the DOM and walking the tile selectors entirely.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urljoin
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Opening tags of the script elements known to hold page state
+STATE_MARKERS = [
+    b'<script type="application/discover+json"',
+    b'<script id="__NEXT_DATA__"',
+]
+
+# GraphQL type names of product records in the state
+PRODUCT_TYPENAMES = {'ProductType', 'Product'}
+
+
+def find_state_blob(content: bytes) -> Optional[bytes]:
+    """
+    Locate the page state JSON without parsing the HTML
+    Args:
+        content (bytes): Raw page body
+    Returns:
+        Optional[bytes]: Body of the state script element, or None if the page has none
+    """
+    for marker in STATE_MARKERS:
+        start = content.find(marker)
+        if start < 0:
+            continue
+        start = content.find(b'>', start + len(marker)) + 1
+        end = content.find(b'</script', start)
+        if start > 0 and end > start:
+            return content[start:end]
+    return None
+
+
+def load_state(blob: bytes) -> Optional[Any]:
+    """Decode a state blob, with orjson when it is installed; None if it isn't valid JSON"""
+    try:
+        if orjson is not None:
+            return orjson.loads(blob)
+        return json.loads(blob)
+    except ValueError as e:
+        logger.warning(f"Unreadable page state: {e}")
+        return None
+
+
+def iter_product_records(state: Any) -> Iterator[Dict]:
+    """
+    Yield the product records anywhere in a decoded state, in document order
+    A record is a dict typed as a product, or one with a title/name and a price;
+    records nested inside a product are not searched.
+    """
+    stack = [state]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get('__typename') in PRODUCT_TYPENAMES or (
+                ('title' in node or 'name' in node) and 'price' in node
+            ):
+                yield node
+                continue
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            continue
+        # Reversed, so the stack pops children in their original order
+        stack.extend(child for child in reversed(list(children)) if isinstance(child, (dict, list)))
+
+
+def _money(value: Any) -> Optional[str]:
+    """Display form of a price given as a number of pounds (strings pass through)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return f"£{value:.2f}"
+    return str(value)
+
+
+def product_fields(record: Dict, base_url: str) -> Optional[Dict]:
+    """
+    Map a state product record to Product fields
+    Args:
+        record (Dict): Product record from the page state
+        base_url (str): Site root that relative product URLs are resolved against
+    Returns:
+        Optional[Dict]: Keyword arguments for Product, or None if the record has no name
+    """
+    name = record.get('title') or record.get('name')
+    if not name:
+        return None
+
+    price = record.get('price')
+    unit_price = record.get('unitPrice')
+    unit = record.get('unitOfMeasure')
+    if isinstance(price, dict):
+        unit_price = price.get('unitPrice', unit_price)
+        unit = price.get('unitOfMeasure', unit)
+        price = price.get('actual', price.get('price'))
+    price_per_unit = _money(unit_price)
+    if price_per_unit is not None and unit and isinstance(unit_price, (int, float)):
+        price_per_unit = f"{price_per_unit}/{unit}"
+
+    url = record.get('url') or record.get('href')
+    if not url and record.get('id') is not None:
+        url = f"/groceries/en-GB/products/{record['id']}"
+
+    if 'isForSale' in record:
+        availability = 'Available' if record['isForSale'] else 'Currently unavailable'
+    else:
+        availability = record.get('availability') or record.get('status') or 'Available'
+
+    return {
+        'name': str(name).strip(),
+        'price': _money(price) or 'N/A',
+        'price_per_unit': price_per_unit,
+        'image_url': record.get('defaultImageUrl') or record.get('imageUrl'),
+        'product_url': urljoin(base_url, url) if url else '',
+        'availability': str(availability).strip(),
+        'rating': None,
+        'review_count': None,
+        'description': None,
+        'brand': record.get('brandName') or record.get('brand'),
+    }
+
+
+def embedded_products(content: bytes, base_url: str) -> Optional[List[Dict]]:
+    """
+    Product fields of every product in a page's embedded state
+    Args:
+        content (bytes): Raw listing page body
+        base_url (str): Site root for relative product URLs
+    Returns:
+        Optional[List[Dict]]: Keyword arguments for Product, or None if the page has
+            no readable state or it holds no products (parse the HTML instead)
+    """
+    blob = find_state_blob(content)
+    if blob is None:
+        return None
+    state = load_state(blob)
+    if state is None:
+        return None
+    products = [fields for fields in (product_fields(record, base_url) for record in iter_product_records(state))
+                if fields is not None]
+    return products or None
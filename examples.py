@@ -3,6 +3,8 @@ Simple usage examples for the Tesco scraper
 """
 
 from tesco_scraper import TescoScraper
+from crawler import CatalogueCrawler, Frontier
+from prices import by_unit_price, products_frame
 import json
 
 def search_example():
@@ -39,35 +41,32 @@ def search_example():
         print("-" * 50)
 
 def category_example():
-    """Example of scraping from a category URL"""
+    """Example of discovering categories and scraping them"""
     print("=== TESCO SCRAPER - CATEGORY EXAMPLE ===\n")
     
     scraper = TescoScraper(delay=1)
     
-    # Example category URLs (these would need to be updated with real Tesco URLs)
-    example_categories = {
-        "Fresh Food": "https://www.tesco.com/groceries/en-GB/shop/fresh-food",
-        "Bakery": "https://www.tesco.com/groceries/en-GB/shop/fresh-food/bakery"
-    }
+    # Categories are discovered from the groceries shop root, so no URLs are needed.
+    # The checkpoint file lets an interrupted crawl carry on where it stopped.
+    crawler = CatalogueCrawler(scraper, Frontier('.tesco_cache/example_crawl.sqlite'), max_pages=1)
     
-    for category_name, category_url in example_categories.items():
-        print(f"Scraping category: {category_name}")
-        print(f"URL: {category_url}")
+    def show_category(category_url, products):
+        print(f"Scraping category: {category_url}")
+        print(f"Found {len(products)} products\n")
         
-        try:
-            products = scraper.scrape_category(category_url, max_pages=1)
-            print(f"Found {len(products)} products in {category_name}\n")
-            
-            # Display first 3 products
-            for i, product in enumerate(products[:3]):
-                print(f"  {i+1}. {product.name}")
-                print(f"     Price: {product.price}")
-                print()
-                
-        except Exception as e:
-            print(f"Error scraping {category_name}: {e}\n")
+        # Display first 3 products
+        for i, product in enumerate(products[:3]):
+            print(f"  {i+1}. {product.name}")
+            print(f"     Price: {product.price}")
+            print()
         
         print("-" * 50)
+    
+    try:
+        stats = crawler.run(on_products=show_category, max_categories=8)
+        print(f"Categories crawled: {stats['done']}, still to crawl: {stats['pending']}")
+    except Exception as e:
+        print(f"Error crawling categories: {e}\n")
 
 def detailed_product_example():
     """Example of getting detailed product information"""
@@ -111,20 +110,16 @@ def custom_search_with_filters():
     search_term = "chocolate"
     products = scraper.search_products(search_term, max_pages=3)
     
-    # Filter products by price (example: under £5)
-    affordable_products = []
-    for product in products:
-        # Extract numeric price (basic example)
-        price_str = product.price.replace('£', '').replace(',', '')
-        try:
-            price_value = float(price_str.split()[0])  # Get first number
-            if price_value < 5.0:
-                affordable_products.append(product)
-        except (ValueError, IndexError):
-            continue
+    # Filter products by price (example: under £5), parsing all prices at once
+    frame = products_frame(products)
+    affordable = frame['price_pence'] < 500
+    affordable_products = [product for product, keep in zip(products, affordable.fillna(False)) if keep]
+    unreadable = int(frame['price_pence'].isna().sum())
     
     print(f"Found {len(products)} total chocolate products")
     print(f"Found {len(affordable_products)} chocolate products under £5\n")
+    if unreadable:
+        print(f"({unreadable} products had no readable price)\n")
     
     # Display affordable products
     for i, product in enumerate(affordable_products[:10]):
@@ -133,6 +128,10 @@ def custom_search_with_filters():
         print(f"     Brand: {product.brand or 'N/A'}")
         print()
     
+    # Cheapest by weight
+    for _, row in by_unit_price(frame, 'kg').head(3).iterrows():
+        print(f"  {row['name']}: £{row['unit_price_pence'] / 100:.2f}/kg")
+    
     # Save filtered results
     if affordable_products:
         scraper.save_to_csv(affordable_products, "affordable_chocolate.csv")
@@ -149,8 +148,8 @@ def main():
         search_example()
         print("\n" + "=" * 50 + "\n")
         
-        # category_example()  # Uncomment if you have valid category URLs
-        # print("\n" + "=" * 50 + "\n")
+        category_example()
+        print("\n" + "=" * 50 + "\n")
         
         detailed_product_example()
         print("\n" + "=" * 50 + "\n")
@@ -0,0 +1,177 @@
+"""
+On-demand result downloads for the web UI
+Builds CSV/JSON exports from stored job results the first time they are
+asked for, keeps them (and gzip/zstd compressed copies) in a directory
+and evicts them by age and total size.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content types of the export formats
+EXPORT_FORMATS = {'csv': 'text/csv', 'json': 'application/json'}
+
+# File suffixes of the compressed copies, most preferred first
+ENCODING_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+
+def available_encodings() -> List[str]:
+    """Content encodings that can be produced here, most preferred first"""
+    return [encoding for encoding in ENCODING_SUFFIXES if encoding != 'zstd' or zstandard is not None]
+
+
+def render_export(rows: List[Dict], fmt: str) -> bytes:
+    """
+    Serialise result rows
+    Args:
+        rows (List[Dict]): Job result rows
+        fmt (str): 'csv' or 'json'
+    Returns:
+        bytes: UTF-8 encoded file contents
+    """
+    if fmt == 'json':
+        return json.dumps(rows, indent=2, ensure_ascii=False).encode('utf-8')
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        if rows:
+            writer = csv.DictWriter(buffer, fieldnames=list(rows[0]), lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+    raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress export contents with a content encoding from ENCODING_SUFFIXES"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd downloads need the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    raise ValueError(f"Unknown content encoding '{encoding}'")
+
+
+class ExportCache:
+    """Directory of generated exports, bounded by age and total size"""
+
+    def __init__(self, directory: str = 'static/downloads', max_age: float = 24 * 3600,
+                 max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache
+        Args:
+            directory (str): Where exports are kept
+            max_age (float): Seconds after which an export is deleted
+            max_bytes (int): Total size kept before least recently used exports are deleted
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename: str, encoding: Optional[str] = None) -> str:
+        """Location of an export, or of its compressed copy"""
+        return os.path.join(self.directory, filename + ENCODING_SUFFIXES.get(encoding, ''))
+
+    def get(self, filename: str, load_rows: Callable[[], Optional[List[Dict]]],
+            encoding: Optional[str] = None) -> Optional[str]:
+        """
+        Return the path of an export, generating it if needed
+        Args:
+            filename (str): Export filename; its extension picks the format
+            load_rows: Function returning the job's result rows, or None if the job is gone
+            encoding (str): 'gzip' or 'zstd' for a compressed copy, None for the plain file
+        Returns:
+            str: Path of the file to send, or None if it can't be produced. Another
+                process may still evict it before it is opened; call again if so
+        """
+        path = self.path(filename, encoding)
+        if self._touch(path):
+            return path
+
+        plain = self.path(filename)
+        try:
+            with open(plain, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            rows = load_rows()
+            if rows is None:
+                return None
+            data = render_export(rows, os.path.splitext(filename)[1].lstrip('.'))
+            self._write(plain, data)
+
+        if encoding:
+            self._write(path, compress(data, encoding))
+        self.evict(keep=path)
+        return path
+
+    def _touch(self, path: str) -> bool:
+        """Mark an export as recently used; returns False if it doesn't exist"""
+        try:
+            # Only the access time changes, so Last-Modified and ETag stay stable
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temporary file first so other workers never see a partial export
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix='.export-')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Delete expired exports, then least recently used ones until under max_bytes
+        Args:
+            keep (str): Path of an export about to be sent, which is never deleted
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.startswith('.') or entry.path == keep:
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > self.max_age:
+                    self._remove(entry.path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+            logger.info(f"Evicted export {path}")
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict:
+        """Number and total size of the kept exports"""
+        sizes = [entry.stat().st_size for entry in os.scandir(self.directory)
+                 if entry.is_file() and not entry.name.startswith('.')]
+        return {'files': len(sizes), 'bytes': sum(sizes)}
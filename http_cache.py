@@ -0,0 +1,301 @@
+"""
+Persistent HTTP cache for the Tesco scraper
+Stores response bodies in SQLite with their ETag/Last-Modified validators,
+revalidates them with conditional GETs and keeps parsed results keyed by
+body hash so an unchanged page is never parsed twice.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the wire format; the cache stores decoded bodies
+_HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class HTTPCache:
+    """SQLite-backed store for response bodies and parsed page data"""
+
+    def __init__(self, path: str = '.tesco_cache/http_cache.sqlite', ttl: float = 7 * 24 * 3600,
+                 max_age: float = 0, max_size: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache
+        Args:
+            path (str): SQLite database file
+            ttl (float): Seconds after which an entry is evicted even if unused
+            max_age (float): Seconds an entry is served without revalidating (0 always revalidates)
+            max_size (int): Total body bytes kept before least recently used entries are evicted
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+            CREATE INDEX IF NOT EXISTS responses_stored ON responses (stored_at);
+            CREATE INDEX IF NOT EXISTS responses_body_hash ON responses (body_hash);
+            CREATE TABLE IF NOT EXISTS parsed (
+                body_hash TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (body_hash, kind)
+            );
+        ''')
+        # Body bytes stored, kept up to date on each write instead of summed every time
+        self._total_size = self._stored_size()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry for `url` (marking it as recently used), or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, body, body_hash, etag, last_modified, stored_at, size '
+                'FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[6] > self.ttl:
+                self._conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+                self._total_size -= row[7]
+                self._drop_parsed(row[3])
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (now, url))
+
+        return {
+            'status': row[0],
+            'headers': json.loads(row[1]),
+            'body': row[2],
+            'body_hash': row[3],
+            'etag': row[4],
+            'last_modified': row[5],
+            'stored_at': row[6],
+        }
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> str:
+        """
+        Store a response body and its validators
+        Returns:
+            str: Hash of the body
+        """
+        body_hash = hashlib.sha256(body).hexdigest()
+        stored_headers = {key: value for key, value in headers.items() if key.lower() not in _HOP_HEADERS}
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute('SELECT body_hash, size FROM responses WHERE url = ?', (url,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, status, json.dumps(stored_headers), body, body_hash,
+                 headers.get('ETag'), headers.get('Last-Modified'), now, now, len(body))
+            )
+            self._total_size += len(body)
+            if replaced is not None:
+                self._total_size -= replaced[1]
+                if replaced[0] != body_hash:
+                    # The page changed: what was parsed from its old body is no longer needed
+                    self._drop_parsed(replaced[0])
+            self._evict(now)
+        return body_hash
+
+    def touch(self, url: str):
+        """Mark an entry as freshly validated (after a 304)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?', (now, now, url))
+
+    def get_parsed(self, body_hash: str, kind: str) -> Optional[Any]:
+        """Return data previously parsed from the body with this hash, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM parsed WHERE body_hash = ? AND kind = ?', (body_hash, kind)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_parsed(self, body_hash: str, kind: str, data: Any):
+        """Remember data parsed from the body with this hash"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)', (body_hash, kind, json.dumps(data))
+            )
+
+    def _stored_size(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def _drop_parsed(self, body_hash: str):
+        """Forget what was parsed from a body no longer stored under any URL"""
+        self._conn.execute(
+            'DELETE FROM parsed WHERE body_hash = ? AND NOT EXISTS (SELECT 1 FROM responses WHERE body_hash = ?)',
+            (body_hash, body_hash)
+        )
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones until under max_size"""
+        removed = self._conn.execute('DELETE FROM responses WHERE stored_at < ?', (now - self.ttl,)).rowcount
+        if removed or self._total_size > self.max_size:
+            # Other processes may share the file, so count exactly before evicting
+            self._total_size = self._stored_size()
+        total = self._total_size
+        if total > self.max_size:
+            freed = 0
+            victims = []
+            rows = self._conn.execute('SELECT url, size FROM responses ORDER BY accessed_at').fetchall()
+            for url, size in rows:
+                if total - freed <= self.max_size:
+                    break
+                victims.append((url,))
+                freed += size
+            self._conn.executemany('DELETE FROM responses WHERE url = ?', victims)
+            logger.info(f"HTTP cache evicted {len(victims)} entries ({freed} bytes)")
+            self._total_size -= freed
+            removed += len(victims)
+        if removed:
+            self._conn.execute('DELETE FROM parsed WHERE body_hash NOT IN (SELECT body_hash FROM responses)')
+
+    def clear(self):
+        """Remove every cached response and parsed result"""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.execute('DELETE FROM parsed')
+            self._total_size = 0
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachingAdapter(HTTPAdapter):
+    """Transport adapter that answers GETs from an HTTPCache, revalidating with conditional requests"""
+
+    def __init__(self, cache: HTTPCache, transport: Optional[BaseAdapter] = None, **kwargs):
+        """
+        Initialize the adapter
+        Args:
+            cache (HTTPCache): Store for cached responses
+            transport (BaseAdapter): Adapter that sends requests the cache can't answer,
+                e.g. a shared transport (this adapter's own pool if omitted)
+            **kwargs: HTTPAdapter options such as pool_maxsize
+        """
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.transport = transport
+
+    def _send(self, request, **kwargs) -> Response:
+        """Send a request over the network"""
+        if self.transport is not None:
+            return self.transport.send(request, **kwargs)
+        return super().send(request, **kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET':
+            return self._send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None and time.time() - entry['stored_at'] < self.cache.max_age:
+            return self._cached_response(request, entry, revalidated=False)
+
+        if entry is not None:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self._send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.cache.touch(request.url)
+            return self._cached_response(request, entry, revalidated=True)
+
+        response.from_cache = False
+        response.body_hash = None
+        if response.status_code == 200:
+            if kwargs.get('stream') and not response._content_consumed:
+                # Store the body once the reader has consumed all of it
+                response.raw = _RecordingBody(response.raw, lambda body: self._store(request.url, response, body))
+            else:
+                self._store(request.url, response, response.content)
+        return response
+
+    def _store(self, url: str, response: Response, body: bytes):
+        """Cache a complete response body"""
+        response.body_hash = self.cache.put(url, response.status_code, response.headers, body)
+
+    def _cached_response(self, request, entry: Dict[str, Any], revalidated: bool) -> Response:
+        """Build a Response from a cache entry"""
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK'
+        response.connection = self
+        response.from_cache = True
+        response.revalidated = revalidated
+        response.body_hash = entry['body_hash']
+        # The body is already in memory: there is no connection to read or close
+        response._content_consumed = True
+        return response
+
+
+class _RecordingBody:
+    """Wrapper of a streamed response body that hands the whole body to a callback at its end"""
+
+    def __init__(self, raw, on_complete):
+        self._raw = raw
+        self._on_complete = on_complete
+        self._chunks = []
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._chunks.append(chunk)
+            yield chunk
+        self._complete()
+
+    def read(self, *args, **kwargs) -> bytes:
+        data = self._raw.read(*args, **kwargs)
+        if data:
+            self._chunks.append(data)
+        else:
+            self._complete()
+        return data
+
+    def _complete(self):
+        if self._chunks is not None:
+            body, self._chunks = b''.join(self._chunks), None
+            self._on_complete(body)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
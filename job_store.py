@@ -0,0 +1,405 @@
+"""
+Shared job store for serving the web UI from several processes
+Keeps job status, progress events and results in SQLite (WAL mode), so any
+worker process can answer status, stream and download requests for a job
+running in another one.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from jobs import Job, JobManager, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+# Job attributes kept in the jobs table (files is stored as JSON)
+_JOB_COLUMNS = ('status', 'progress', 'message', 'error', 'files', 'started_at', 'finished_at')
+
+
+class JobStore:
+    """SQLite database of jobs, their results and their progress events"""
+
+    def __init__(self, path: str = '.tesco_cache/jobs.sqlite', timeout: float = 30):
+        """
+        Open (or create) the store
+        Args:
+            path (str): SQLite database file, shared by every worker process
+            timeout (float): Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                search_key TEXT NOT NULL,
+                search_term TEXT NOT NULL,
+                max_pages INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                error TEXT,
+                files TEXT NOT NULL DEFAULT '{}',
+                result_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_search ON jobs (search_key, used_at);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS results (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                job_id TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, id)
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements atomically with respect to every process using the store"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def update(self, job_id: str, fields: Dict):
+        """Set job attributes (only those listed in _JOB_COLUMNS are stored)"""
+        values = {name: value for name, value in fields.items() if name in _JOB_COLUMNS}
+        if 'files' in values:
+            values['files'] = json.dumps(values['files'])
+        values['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in values)
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*values.values(), job_id))
+
+    def add_event(self, job_id: str, event: str, data: Dict):
+        """Append a progress event, numbered after the job's previous ones"""
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO events SELECT ?, COALESCE(MAX(id), 0) + 1, ?, ? FROM events WHERE job_id = ?',
+                (job_id, event, json.dumps(data), job_id)
+            )
+            conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time(), job_id))
+
+    def add_results(self, job_id: str, rows: List[Dict]) -> Tuple[int, int]:
+        """
+        Append result rows
+        Returns:
+            Tuple[int, int]: Positions of the first row added and one past the last
+        """
+        with self.transaction() as conn:
+            start = conn.execute('SELECT result_count FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+            conn.executemany(
+                'INSERT INTO results VALUES (?, ?, ?)',
+                ((job_id, start + offset, json.dumps(row)) for offset, row in enumerate(rows))
+            )
+            end = start + len(rows)
+            conn.execute('UPDATE jobs SET result_count = ?, updated_at = ? WHERE id = ?', (end, time.time(), job_id))
+        return start, end
+
+    def touch(self, job_ids: List[str]):
+        """Mark jobs as still alive without changing them"""
+        with self._lock:
+            self._conn.executemany('UPDATE jobs SET updated_at = ? WHERE id = ?',
+                                   ((time.time(), job_id) for job_id in job_ids))
+
+    def row(self, job_id: str) -> Optional[sqlite3.Row]:
+        """Stored attributes of a job, or None"""
+        with self._lock:
+            return self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def latest(self) -> Optional[sqlite3.Row]:
+        """The most recently submitted (or reused) job, or None"""
+        with self._lock:
+            return self._conn.execute('SELECT * FROM jobs ORDER BY used_at DESC LIMIT 1').fetchone()
+
+    def queued_before(self, created_at: float) -> int:
+        """Number of queued jobs submitted before `created_at`"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?', (Job.QUEUED, created_at)
+            ).fetchone()[0]
+
+    def results(self, job_id: str, start: int = 0, end: Optional[int] = None) -> List[Dict]:
+        """Result rows start..end of a job"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT row FROM results WHERE job_id = ? AND seq >= ? AND seq < ? ORDER BY seq',
+                (job_id, start, end if end is not None else 2 ** 62)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def events(self, job_id: str, after: int) -> List[Dict]:
+        """Events of a job with IDs greater than `after`"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, event, data FROM events WHERE job_id = ? AND id > ? ORDER BY id', (job_id, after)
+            ).fetchall()
+        return [{'id': row[0], 'event': row[1], 'data': json.loads(row[2])} for row in rows]
+
+    def remove(self, job_id: str):
+        """Delete a job with its results and events"""
+        with self._lock:
+            for table, column in (('results', 'job_id'), ('events', 'job_id'), ('jobs', 'id')):
+                self._conn.execute(f'DELETE FROM {table} WHERE {column} = ?', (job_id,))
+
+    def increment(self, name: str):
+        """Add one to a named counter"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,)
+            )
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {row[0]: row[1] for row in self._conn.execute('SELECT name, value FROM counters')}
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class StoredJob(Job):
+    """Job whose state lives in a JobStore, so other processes can follow it"""
+
+    # Seconds between checks for new events when following a job
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, store: JobStore, search_term: str, max_pages: int):
+        super().__init__(search_term, max_pages)
+        self.store = store
+
+    @classmethod
+    def from_row(cls, store: JobStore, row: sqlite3.Row) -> 'StoredJob':
+        """Job as last stored, possibly by another process"""
+        job = cls(store, row['search_term'], row['max_pages'])
+        job.id = row['id']
+        job.created_at = row['created_at']
+        job._load(row)
+        return job
+
+    def _load(self, row: sqlite3.Row):
+        with self._lock:
+            for name in _JOB_COLUMNS:
+                setattr(self, name, row[name])
+            self.files = json.loads(row['files'])
+
+    def update(self, **fields):
+        super().update(**fields)
+        self.store.update(self.id, fields)
+
+    def _publish(self, event: str, data: Dict):
+        self.store.add_event(self.id, event, data)
+        self._changed.notify_all()
+
+    def report_progress(self, progress: int, message: str, **data):
+        self.update(progress=progress, message=message)
+        self.publish('progress', **dict(data, progress=progress, message=message))
+
+    def add_results(self, rows: List[Dict]):
+        start, end = self.store.add_results(self.id, rows)
+        self.publish('products', start=start, end=end)
+
+    def wait_for_events(self, after: int, timeout: float) -> List[Dict]:
+        # The job may be running in another process, so poll the store
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.store.events(self.id, after)
+            if events or time.monotonic() >= deadline:
+                return events
+            time.sleep(min(self.POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def results_slice(self, start: int, end: int) -> List[Dict]:
+        return self.store.results(self.id, start, end)
+
+    def to_dict(self, include_results: bool = True) -> Dict:
+        row = self.store.row(self.id)
+        if row is not None:
+            self._load(row)
+        data = super().to_dict(include_results=False)
+        data['result_count'] = row['result_count'] if row is not None else 0
+        if include_results:
+            data['results'] = self.store.results(self.id)
+        return data
+
+
+class SharedJobManager(JobManager):
+    """
+    JobManager whose jobs are kept in a JobStore shared by every worker process
+    Each process runs the jobs submitted to it on its own thread pool; queue
+    limits, result reuse and coalescing of identical searches apply across all
+    processes. Finished jobs are dropped least recently used first, so
+    max_finished also bounds the result cache.
+    """
+
+    def __init__(self, runner: Callable[[Job], None], store: JobStore, max_workers: int = 4,
+                 max_queued: int = 50, max_finished: int = 200, cache_ttl: float = 600,
+                 stale_after: float = 900):
+        """
+        Initialize the manager
+        Args:
+            runner: Function doing the work of a job, updating it as it goes
+            store (JobStore): Store shared with the other worker processes
+            max_workers (int): Jobs this process runs at the same time
+            max_queued (int): Jobs allowed to wait, across all processes, before new ones are refused
+            max_finished (int): Finished jobs kept for status, download and reuse
+            cache_ttl (float): Seconds a completed search is reused for identical searches (0 disables)
+            stale_after (float): Seconds without progress after which an unfinished job is
+                marked failed (its worker process most likely died); jobs waiting in
+                this process's queue are kept alive by a heartbeat
+        """
+        super().__init__(runner, max_workers, max_queued, max_finished, cache_ttl, cache_size=max_finished)
+        self.store = store
+        self.stale_after = stale_after
+        # Jobs submitted to this process that have not started yet
+        self._waiting: Set[str] = set()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key_text(search_term: str, max_pages: int) -> str:
+        term, pages = JobManager.search_key(search_term, max_pages)
+        return f'{pages}:{term}'
+
+    def submit(self, search_term: str, max_pages: int) -> Job:
+        key = self._key_text(search_term, max_pages)
+        now = time.time()
+        with self.store.transaction() as conn:
+            self._fail_stale(conn, now)
+
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE search_key = ? ORDER BY used_at DESC LIMIT 1', (key,)
+            ).fetchone()
+            if row is not None:
+                if row['status'] in (Job.QUEUED, Job.RUNNING):
+                    self.store.increment('coalesced')
+                    reused = True
+                elif row['status'] == Job.COMPLETED and now - (row['finished_at'] or now) < self.cache_ttl:
+                    self.store.increment('cache_hits')
+                    reused = True
+                else:
+                    reused = False
+                if reused:
+                    conn.execute('UPDATE jobs SET used_at = ? WHERE id = ?', (now, row['id']))
+                    return StoredJob.from_row(self.store, row)
+
+            waiting = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (Job.QUEUED,)).fetchone()[0]
+            if waiting >= self.max_queued:
+                raise QueueFullError(f'{waiting} searches are already waiting, try again shortly')
+
+            job = StoredJob(self.store, search_term, max_pages)
+            conn.execute(
+                'INSERT INTO jobs (id, search_key, search_term, max_pages, status, progress, message, error, '
+                'created_at, updated_at, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job.id, key, job.search_term, job.max_pages, job.status, job.progress, job.message,
+                 job.error, job.created_at, now, now)
+            )
+            self._prune_stored(conn)
+        with self._lock:
+            self._waiting.add(job.id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._keep_waiting_alive, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job):
+        with self._lock:
+            self._waiting.discard(job.id)
+        super()._run(job)
+
+    def _keep_waiting_alive(self):
+        """Refresh the queued jobs of this process, so other processes don't take them for stale"""
+        while True:
+            time.sleep(self.stale_after / 3)
+            with self._lock:
+                waiting = list(self._waiting)
+            if waiting:
+                try:
+                    self.store.touch(waiting)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not refresh queued jobs: {e}")
+
+    def _fail_stale(self, conn: sqlite3.Connection, now: float):
+        """Mark unfinished jobs that stopped reporting as failed"""
+        conn.execute(
+            'UPDATE jobs SET status = ?, message = ?, error = ?, finished_at = ? '
+            'WHERE status IN (?, ?) AND updated_at < ?',
+            (Job.FAILED, 'Search failed', 'Worker stopped responding', now, Job.QUEUED, Job.RUNNING,
+             now - self.stale_after)
+        )
+
+    def _prune_stored(self, conn: sqlite3.Connection):
+        """Forget the least recently used finished jobs beyond max_finished"""
+        rows = conn.execute(
+            'SELECT id FROM jobs WHERE status NOT IN (?, ?) ORDER BY used_at DESC LIMIT -1 OFFSET ?',
+            (Job.QUEUED, Job.RUNNING, self.max_finished)
+        ).fetchall()
+        for row in rows:
+            self.store.remove(row[0])
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self.store.row(job_id)
+        return StoredJob.from_row(self.store, row) if row is not None else None
+
+    def latest(self) -> Optional[Job]:
+        row = self.store.latest()
+        return StoredJob.from_row(self.store, row) if row is not None else None
+
+    def remove(self, job_id: str) -> bool:
+        with self.store.transaction() as conn:
+            row = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row['status'] in (Job.QUEUED, Job.RUNNING):
+                return False
+            self.store.remove(job_id)
+            return True
+
+    def queue_position(self, job: Job) -> int:
+        row = self.store.row(job.id)
+        if row is None or row['status'] != Job.QUEUED:
+            return 0
+        return self.store.queued_before(row['created_at'])
+
+    def stats(self) -> Dict:
+        counts = {status: 0 for status in (Job.QUEUED, Job.RUNNING, Job.COMPLETED, Job.FAILED)}
+        counts.update(self.store.status_counts())
+        counters = self.store.counters()
+        counts['cache_hits'] = counters.get('cache_hits', 0)
+        counts['coalesced'] = counters.get('coalesced', 0)
+        counts['max_workers'] = self.max_workers
+        return counts
@@ -0,0 +1,263 @@
+"""
+Scraping job scheduler for the web UI
+Runs many searches at once on a bounded worker pool, queueing the rest,
+and keeps per-job status and results.
+"""
+
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+class Job:
+    """One scraping request and its progress"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, search_term: str, max_pages: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.search_term = search_term
+        self.max_pages = max_pages
+        self.status = Job.QUEUED
+        self.progress = 0
+        self.message = f'Queued search for "{search_term}"...'
+        self.results: List[Dict] = []
+        self.error: Optional[str] = None
+        self.files: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Append-only log of progress events for streaming clients
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def is_running(self) -> bool:
+        return self.status in (Job.QUEUED, Job.RUNNING)
+
+    def update(self, **fields):
+        """Set several fields at once, so readers never see a half-updated job"""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def publish(self, event: str, **data):
+        """Append an event for streaming clients"""
+        with self._lock:
+            self._publish(event, data)
+
+    def _publish(self, event: str, data: Dict):
+        self.events.append({'id': len(self.events) + 1, 'event': event, 'data': data})
+        self._changed.notify_all()
+
+    def report_progress(self, progress: int, message: str, **data):
+        """Update progress and publish it as a 'progress' event"""
+        with self._lock:
+            self.progress = progress
+            self.message = message
+            self._publish('progress', dict(data, progress=progress, message=message))
+
+    def add_results(self, rows: List[Dict]):
+        """Append result rows and publish a 'products' event naming the new slice"""
+        with self._lock:
+            start = len(self.results)
+            self.results.extend(rows)
+            self._publish('products', {'start': start, 'end': len(self.results)})
+
+    def wait_for_events(self, after: int, timeout: float) -> List[Dict]:
+        """
+        Wait until there are events newer than `after`
+        Args:
+            after (int): ID of the last event the caller has seen
+            timeout (float): Seconds to wait before giving up
+        Returns:
+            List[Dict]: New events, empty if none arrived in time
+        """
+        with self._lock:
+            self._changed.wait_for(lambda: len(self.events) > after, timeout)
+            return self.events[after:]
+
+    def results_slice(self, start: int, end: int) -> List[Dict]:
+        """Result rows start..end"""
+        with self._lock:
+            return self.results[start:end]
+
+    def to_dict(self, include_results: bool = True) -> Dict:
+        """JSON-ready view of the job (keeps the keys of the old scraping_status dict)"""
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'search_term': self.search_term,
+                'max_pages': self.max_pages,
+                'status': self.status,
+                'is_running': self.is_running,
+                'progress': self.progress,
+                'message': self.message,
+                'error': self.error,
+                'result_count': len(self.results),
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+            data.update({f'{fmt}_file': filename for fmt, filename in self.files.items()})
+            if include_results:
+                data['results'] = list(self.results)
+            return data
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps recent ones for status queries"""
+
+    def __init__(self, runner: Callable[[Job], None], max_workers: int = 4, max_queued: int = 50,
+                 max_finished: int = 200, cache_ttl: float = 600, cache_size: int = 100):
+        """
+        Initialize the manager
+        Args:
+            runner: Function doing the work of a job, updating it as it goes
+            max_workers (int): Jobs allowed to run at the same time
+            max_queued (int): Jobs allowed to wait for a worker before new ones are refused
+            max_finished (int): Finished jobs kept for status and download requests
+            cache_ttl (float): Seconds a completed search is reused for identical searches (0 disables)
+            cache_size (int): Searches remembered for reuse, least recently used dropped first
+        """
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.coalesced = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        # Latest job for each search, for result reuse and coalescing
+        self._by_search: 'OrderedDict[Tuple[str, int], Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def search_key(search_term: str, max_pages: int) -> Tuple[str, int]:
+        """Key under which identical searches share a job (case and spacing ignored)"""
+        return ' '.join(search_term.lower().split()), max_pages
+
+    def submit(self, search_term: str, max_pages: int) -> Job:
+        """
+        Queue a new job, or reuse the job of an identical search that is still
+        running or completed less than cache_ttl seconds ago
+        Returns:
+            Job: The queued or reused job
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        key = self.search_key(search_term, max_pages)
+        with self._lock:
+            job = self._reusable_job(key)
+            if job is not None:
+                self._jobs[job.id] = job
+                self._jobs.move_to_end(job.id)
+                return job
+
+            waiting = sum(1 for queued in self._jobs.values() if queued.status == Job.QUEUED)
+            if waiting >= self.max_queued:
+                raise QueueFullError(f'{waiting} searches are already waiting, try again shortly')
+            job = Job(search_term, max_pages)
+            self._jobs[job.id] = job
+            self._by_search[key] = job
+            while len(self._by_search) > self.cache_size:
+                self._by_search.popitem(last=False)
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _reusable_job(self, key: Tuple[str, int]) -> Optional[Job]:
+        """Job that can answer a search for `key`, if any (call with the lock held)"""
+        job = self._by_search.get(key)
+        if job is None:
+            return None
+        if job.is_running:
+            self.coalesced += 1
+        # A runner may mark its job completed a moment before finished_at is set
+        elif job.status == Job.COMPLETED and time.time() - (job.finished_at or time.time()) < self.cache_ttl:
+            self.cache_hits += 1
+        else:
+            del self._by_search[key]
+            return None
+        self._by_search.move_to_end(key)
+        return job
+
+    def _run(self, job: Job):
+        job.update(status=Job.RUNNING, started_at=time.time(), message=f'Searching for "{job.search_term}"...')
+        job.publish('status', status=Job.RUNNING)
+        try:
+            self.runner(job)
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            job.update(status=Job.FAILED, progress=0, message='Search failed', error=str(e))
+        else:
+            if job.status == Job.RUNNING:
+                job.update(status=Job.COMPLETED, progress=100)
+        finally:
+            job.update(finished_at=time.time())
+            job.publish('done', **job.to_dict(include_results=False))
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (call with the lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_running]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by ID, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self) -> Optional[Job]:
+        """Return the most recently submitted job, or None"""
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def remove(self, job_id: str) -> bool:
+        """Forget a finished job; returns False if it is unknown or still running"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_running:
+                return False
+            del self._jobs[job_id]
+            key = self.search_key(job.search_term, job.max_pages)
+            if self._by_search.get(key) is job:
+                del self._by_search[key]
+            return True
+
+    def queue_position(self, job: Job) -> int:
+        """Number of queued jobs ahead of `job` (0 once it is running)"""
+        if job.status != Job.QUEUED:
+            return 0
+        with self._lock:
+            queued = (queued for queued in self._jobs.values() if queued.status == Job.QUEUED)
+            return sum(1 for _ in itertools.takewhile(lambda queued: queued is not job, queued))
+
+    def stats(self) -> Dict:
+        """Counts of jobs by status"""
+        with self._lock:
+            counts = {status: 0 for status in (Job.QUEUED, Job.RUNNING, Job.COMPLETED, Job.FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            counts['cache_hits'] = self.cache_hits
+            counts['coalesced'] = self.coalesced
+        counts['max_workers'] = self.max_workers
+        return counts
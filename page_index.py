@@ -0,0 +1,111 @@
+"""
+Listing page index for incremental crawls
+Remembers a content hash and the parsed products of every listing page URL,
+so a re-crawl can reuse the products of pages that haven't changed instead
+of parsing them again. Products are stored as plain dictionaries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from embedded_state import find_state_blob
+
+logger = logging.getLogger(__name__)
+
+# Scripts carry per-request tokens and timestamps, so they are left out of the hash
+SCRIPT_PATTERN = re.compile(rb'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+
+
+def page_hash(content: bytes, include_state: bool = False) -> str:
+    """
+    Hash of a listing page's markup, ignoring inline scripts
+    Args:
+        content (bytes): Raw page body
+        include_state (bool): Also hash the embedded page state script, for scrapers
+            that read their products from it
+    """
+    digest = hashlib.blake2b(SCRIPT_PATTERN.sub(b'', content), digest_size=16)
+    if include_state:
+        digest.update(b'\0' + (find_state_blob(content) or b''))
+    return digest.hexdigest()
+
+
+class PageIndex:
+    """SQLite store of listing page hashes and the products parsed from them"""
+
+    def __init__(self, path: str = '.tesco_cache/pages.sqlite'):
+        """
+        Open (or create) the index
+        Args:
+            path (str): SQLite database file
+        """
+        self.path = path
+        self.unchanged = 0
+        self.changed = 0
+        self.assumed = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                products TEXT NOT NULL,
+                crawled_at REAL NOT NULL
+            )
+        ''')
+
+    def lookup(self, url: str, content_hash: str) -> Optional[List[Dict]]:
+        """
+        Products stored for a page, if its content is unchanged
+        Args:
+            url (str): Listing page URL
+            content_hash (str): page_hash() of the page just fetched
+        Returns:
+            Optional[List[Dict]]: The stored products, or None if the page changed or is new
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT products FROM pages WHERE url = ? AND content_hash = ?', (url, content_hash)
+            ).fetchone()
+            if row is None:
+                self.changed += 1
+                return None
+            self.unchanged += 1
+        return json.loads(row[0])
+
+    def stored(self, url: str) -> Optional[List[Dict]]:
+        """Products stored for a page by the last crawl, without fetching it"""
+        with self._lock:
+            row = self._conn.execute('SELECT products FROM pages WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self.assumed += 1
+        return json.loads(row[0])
+
+    def put(self, url: str, content_hash: str, products: List[Dict]):
+        """Remember the products parsed from a page"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                (url, content_hash, json.dumps(products), time.time())
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Pages found unchanged, changed (or new), and assumed unchanged without fetching"""
+        return {'unchanged': self.unchanged, 'changed': self.changed, 'assumed': self.assumed}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
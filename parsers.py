@@ -0,0 +1,188 @@
+"""
+HTML parser backends for the Tesco scraper
+Each backend parses a page once and answers CSS selector queries against it.
+Selectors are compiled the first time they are seen and reused for every
+later page and product tile.
+"""
+
+from typing import Any, Dict, List, Optional, Union
+
+from bs4 import BeautifulSoup
+import soupsieve
+
+# Text inside these tags is not part of an element's visible text
+# (BeautifulSoup's get_text() leaves it out, so the other backends drop it too)
+NON_TEXT_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+
+
+def decode_html(content: Union[bytes, str]) -> str:
+    """
+    Decode a response body so every backend parses exactly the same text
+    Args:
+        content: Raw response body or already decoded HTML
+    Returns:
+        str: Decoded HTML
+    """
+    if isinstance(content, str):
+        return content
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content.decode('windows-1252', errors='replace')
+
+
+class ParserBackend:
+    """Interface shared by all parser backends"""
+
+    name = ''
+
+    def parse(self, content: Union[bytes, str]) -> Any:
+        """Parse a page and return its root node"""
+        raise NotImplementedError
+
+    def select(self, node, selector: str) -> List[Any]:
+        """Return all descendants of `node` matching `selector`"""
+        raise NotImplementedError
+
+    def select_one(self, node, selector: str) -> Optional[Any]:
+        """Return the first descendant of `node` matching `selector`, or None"""
+        raise NotImplementedError
+
+    def text(self, node) -> str:
+        """Return the stripped text fragments of `node` joined together"""
+        raise NotImplementedError
+
+    def attr(self, node, name: str) -> Optional[str]:
+        """Return an attribute of `node`, or None if it is missing"""
+        raise NotImplementedError
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """BeautifulSoup with Python's html.parser (the original behaviour)"""
+
+    name = 'html.parser'
+
+    def __init__(self):
+        self._compiled: Dict[str, Any] = {}
+
+    def _compile(self, selector: str):
+        compiled = self._compiled.get(selector)
+        if compiled is None:
+            compiled = self._compiled[selector] = soupsieve.compile(selector)
+        return compiled
+
+    def parse(self, content):
+        return BeautifulSoup(decode_html(content), 'html.parser')
+
+    def select(self, node, selector):
+        return self._compile(selector).select(node)
+
+    def select_one(self, node, selector):
+        return self._compile(selector).select_one(node)
+
+    def text(self, node):
+        return node.get_text(strip=True)
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class LxmlBackend(ParserBackend):
+    """lxml with CSS selectors compiled once to XPath"""
+
+    name = 'lxml'
+
+    def __init__(self):
+        try:
+            import lxml.html
+            from lxml import etree
+            from lxml.cssselect import CSSSelector
+        except ImportError as e:
+            raise ImportError("The 'lxml' parser needs the lxml and cssselect packages") from e
+
+        self._html = lxml.html
+        self._etree = etree
+        self._selector_class = CSSSelector
+        self._compiled: Dict[str, Any] = {}
+
+    def _compile(self, selector: str):
+        compiled = self._compiled.get(selector)
+        if compiled is None:
+            compiled = self._compiled[selector] = self._selector_class(selector, translator='html')
+        return compiled
+
+    def parse(self, content):
+        text = decode_html(content)
+        if not text.strip():
+            text = '<html></html>'
+        root = self._html.document_fromstring(text)
+        self._etree.strip_elements(root, *NON_TEXT_TAGS, with_tail=False)
+        return root
+
+    def select(self, node, selector):
+        return self._compile(selector)(node)
+
+    def select_one(self, node, selector):
+        matches = self._compile(selector)(node)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        return ''.join(fragment.strip() for fragment in node.itertext())
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class SelectolaxBackend(ParserBackend):
+    """selectolax on the lexbor engine"""
+
+    name = 'selectolax'
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as e:
+            raise ImportError("The 'selectolax' parser needs the selectolax package") from e
+
+        self._parser_class = LexborHTMLParser
+
+    def parse(self, content):
+        tree = self._parser_class(decode_html(content))
+        tree.strip_tags(list(NON_TEXT_TAGS))
+        return tree.root
+
+    def select(self, node, selector):
+        return node.css(selector)
+
+    def select_one(self, node, selector):
+        return node.css_first(selector)
+
+    def text(self, node):
+        return node.text(deep=True, separator='', strip=True)
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+
+PARSER_BACKENDS = {
+    BeautifulSoupBackend.name: BeautifulSoupBackend,
+    LxmlBackend.name: LxmlBackend,
+    SelectolaxBackend.name: SelectolaxBackend,
+}
+
+
+def get_parser_backend(parser: Union[str, ParserBackend]) -> ParserBackend:
+    """
+    Look up a parser backend by name
+    Args:
+        parser: Backend name ('html.parser', 'lxml' or 'selectolax') or a backend instance
+    Returns:
+        ParserBackend: Ready to use backend
+    """
+    if isinstance(parser, ParserBackend):
+        return parser
+    try:
+        backend_class = PARSER_BACKENDS[parser]
+    except KeyError:
+        raise ValueError(f"Unknown parser '{parser}', expected one of: {', '.join(PARSER_BACKENDS)}")
+    return backend_class()
@@ -0,0 +1,145 @@
+"""
+Vectorised price normalisation for scrape results
+Parses the price strings of a whole result set at once with pandas string
+operations: prices in pence, unit prices converted to pence per kg, per
+litre or each, and promotion / Clubcard flags.
+"""
+
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from product_batch import ProductBatch
+from tesco_scraper import PRICE_PATTERN, PRODUCT_FIELDS, Product, product_to_dict
+
+# "£1.25/kg", "£0.50/100g", "55p/100ml", "£11.00/75cl", "£0.20/each"
+UNIT_PRICE_PATTERN = (
+    r'(?:£\s*(?P<pounds>\d{1,3}(?:,\d{3})*(?:\.\d+)?|\d+(?:\.\d+)?)|(?P<pence>\d+(?:\.\d+)?)\s*p)'
+    r'\s*/\s*(?P<quantity>\d+(?:\.\d+)?)?\s*(?P<unit>[a-z]+)'
+)
+
+# Unit names and the basis they are normalised to, with the size of one unit in that basis
+UNITS = {
+    'kg': ('kg', 1.0), 'kilo': ('kg', 1.0), 'g': ('kg', 0.001), 'gram': ('kg', 0.001), 'grams': ('kg', 0.001),
+    'l': ('l', 1.0), 'litre': ('l', 1.0), 'liter': ('l', 1.0), 'ltr': ('l', 1.0),
+    'cl': ('l', 0.01), 'ml': ('l', 0.001),
+    'each': ('each', 1.0), 'ea': ('each', 1.0), 'sht': ('each', 1.0), 'sheet': ('each', 1.0),
+}
+
+# Offer wording found in price text
+PROMO_PATTERN = r'clubcard|\bsave\b|\bwas\b|half price|\boffer\b|\bany \d+ for\b|\d+ for £|reduced'
+CLUBCARD_PATTERN = r'clubcard'
+
+
+def products_frame(products: Union[ProductBatch, Iterable[Product]]) -> pd.DataFrame:
+    """
+    Put scrape results in a DataFrame with normalised price columns
+    Args:
+        products: A ProductBatch or any iterable of Products
+    Returns:
+        pd.DataFrame: The product fields in export column order, plus the columns
+            added by normalise_prices
+    """
+    if isinstance(products, ProductBatch):
+        frame = pd.DataFrame({field: products.column(field) for field in PRODUCT_FIELDS})
+    else:
+        frame = pd.DataFrame([product_to_dict(product) for product in products], columns=PRODUCT_FIELDS)
+    return normalise_prices(frame)
+
+
+def normalise_prices(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add numeric price columns parsed from the price strings
+    Args:
+        frame (pd.DataFrame): Rows with 'price' and 'price_per_unit' text columns (and
+            optionally a 'promotion' text column)
+    Returns:
+        pd.DataFrame: A copy with these columns added:
+            price_pence (Int64): Price in pence, <NA> if it couldn't be read
+            unit_price_pence (Float64): Price per unit_basis in pence, <NA> if unknown
+            unit_basis (string): 'kg', 'l' or 'each'
+            promo (bool): The price text mentions an offer
+            clubcard (bool): The offer is a Clubcard Price
+    """
+    frame = frame.copy()
+    frame['price_pence'] = price_pence(frame['price'])
+    frame['unit_price_pence'], frame['unit_basis'] = unit_prices(frame['price_per_unit'])
+
+    offer_text = frame['price'].astype('string').fillna('')
+    if 'promotion' in frame:
+        offer_text = offer_text + ' ' + frame['promotion'].astype('string').fillna('')
+    frame['promo'] = offer_text.str.contains(PROMO_PATTERN, case=False, regex=True).astype(bool)
+    frame['clubcard'] = offer_text.str.contains(CLUBCARD_PATTERN, case=False, regex=True).astype(bool)
+    return frame
+
+
+def _per_distinct(values: pd.Series, parse: Callable[[pd.Series], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Apply a vectorised parse to the distinct values of a column only
+    Prices repeat across thousands of products, so parsing each distinct string
+    once and spreading the results back by code is far cheaper than parsing every row.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype='string')).reset_index(drop=True)
+    # Missing values get code -1: add an all-NA row for them to pick
+    parsed = pd.concat([parsed, parsed.iloc[:0].reindex([len(parsed)])], ignore_index=True)
+    return parsed.take(np.where(codes < 0, len(uniques), codes)).set_axis(values.index)
+
+
+def price_pence(prices: pd.Series) -> pd.Series:
+    """
+    Parse display prices into whole pence (the vectorised parse_price_pence)
+    Args:
+        prices (pd.Series): Price text such as "£2.50" or "75p"
+    Returns:
+        pd.Series: Int64 pence, <NA> where no price could be read
+    """
+    def parse(distinct: pd.Series) -> pd.DataFrame:
+        parts = distinct.str.extract(PRICE_PATTERN)
+        pounds = pd.to_numeric(parts[0].str.replace(',', '', regex=False))
+        pence = pd.to_numeric(parts[1].str.pad(2, side='right', fillchar='0')).fillna(0)
+        pence_only = pd.to_numeric(parts[2]).round()
+        return (pounds * 100 + pence).where(pounds.notna(), pence_only).astype('Int64').to_frame()
+
+    return _per_distinct(prices, parse)[0].rename(prices.name)
+
+
+def unit_prices(prices_per_unit: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Normalise unit prices to pence per kg, per litre or each
+    Args:
+        prices_per_unit (pd.Series): Text such as "£1.25/kg" or "£0.50/100g"
+    Returns:
+        Tuple[pd.Series, pd.Series]: Float64 pence per basis, and the basis
+            ('kg', 'l' or 'each'); both <NA> where the text or unit isn't recognised
+    """
+    def parse(distinct: pd.Series) -> pd.DataFrame:
+        parts = distinct.str.lower().str.extract(UNIT_PRICE_PATTERN)
+        amount = (pd.to_numeric(parts['pounds'].str.replace(',', '', regex=False)) * 100).fillna(
+            pd.to_numeric(parts['pence'])
+        )
+        quantity = pd.to_numeric(parts['quantity']).fillna(1.0)
+        basis = parts['unit'].map({unit: basis for unit, (basis, _) in UNITS.items()}).astype('string')
+        size = parts['unit'].map({unit: size for unit, (_, size) in UNITS.items()}).astype('Float64')
+        per_basis = (amount / (quantity * size)).round(4).astype('Float64')
+        return pd.DataFrame({'unit_price_pence': per_basis.where(basis.notna()), 'unit_basis': basis})
+
+    parsed = _per_distinct(prices_per_unit, parse)
+    return parsed['unit_price_pence'], parsed['unit_basis']
+
+
+def by_unit_price(frame: pd.DataFrame, basis: str, max_pence: Optional[float] = None) -> pd.DataFrame:
+    """
+    Products sold by one basis, cheapest per unit first
+    Args:
+        frame (pd.DataFrame): Output of products_frame or normalise_prices
+        basis (str): 'kg', 'l' or 'each'
+        max_pence (float): Only products at most this many pence per unit
+    Returns:
+        pd.DataFrame: The matching rows, sorted by unit_price_pence
+    """
+    mask = frame['unit_basis'] == basis
+    if max_pence is not None:
+        mask &= frame['unit_price_pence'] <= max_pence
+    return frame[mask.fillna(False)].sort_values('unit_price_pence', kind='stable')
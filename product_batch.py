@@ -0,0 +1,141 @@
+"""
+Columnar container for bulk scrape results
+Stores products column by column in compact arrays and only builds Product
+objects when they are asked for.
+"""
+
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from tesco_scraper import Product
+
+# Sentinels for missing values in the integer columns
+_MISSING_INT = -1
+
+
+class _Categories:
+    """Dictionary-encoded string column: one small code per row plus each distinct value once"""
+
+    def __init__(self):
+        self.codes = array('I')
+        self.values: List[Optional[str]] = []
+        self._index: Dict[Optional[str], int] = {}
+
+    def append(self, value: Optional[str]):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+
+    def to_list(self) -> List[Optional[str]]:
+        values = self.values
+        return [values[code] for code in self.codes]
+
+
+class ProductBatch:
+    """Column-oriented collection of products"""
+
+    # Columns stored as plain lists of (mostly unique) strings
+    TEXT_COLUMNS = ('name', 'price', 'price_per_unit', 'image_url', 'product_url', 'description')
+    # Columns with few distinct values, stored dictionary-encoded
+    CATEGORY_COLUMNS = ('availability', 'brand')
+
+    def __init__(self, products: Iterable[Product] = ()):
+        """
+        Initialize the batch
+        Args:
+            products: Products to add
+        """
+        self._text: Dict[str, List[Optional[str]]] = {column: [] for column in self.TEXT_COLUMNS}
+        self._categories: Dict[str, _Categories] = {column: _Categories() for column in self.CATEGORY_COLUMNS}
+        self.price_pence = array('q')
+        self.rating = array('d')
+        self.review_count = array('q')
+        self.extend(products)
+
+    def append(self, product: Product):
+        """Add one product"""
+        for column, values in self._text.items():
+            values.append(getattr(product, column))
+        for column, categories in self._categories.items():
+            categories.append(getattr(product, column))
+        self.price_pence.append(_MISSING_INT if product.price_pence is None else product.price_pence)
+        self.rating.append(math.nan if product.rating is None else product.rating)
+        self.review_count.append(_MISSING_INT if product.review_count is None else product.review_count)
+
+    def extend(self, products: Iterable[Product]):
+        """Add many products"""
+        for product in products:
+            self.append(product)
+
+    def __len__(self) -> int:
+        return len(self.price_pence)
+
+    def __getitem__(self, row: int) -> Product:
+        """Build the Product stored at `row`"""
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('ProductBatch index out of range')
+
+        price_pence = self.price_pence[row]
+        rating = self.rating[row]
+        review_count = self.review_count[row]
+        return Product(
+            name=self._text['name'][row],
+            price=self._text['price'][row],
+            price_per_unit=self._text['price_per_unit'][row],
+            image_url=self._text['image_url'][row],
+            product_url=self._text['product_url'][row],
+            availability=self._categories['availability'][row],
+            rating=None if math.isnan(rating) else rating,
+            review_count=None if review_count == _MISSING_INT else review_count,
+            description=self._text['description'][row],
+            brand=self._categories['brand'][row],
+            price_pence=None if price_pence == _MISSING_INT else price_pence
+        )
+
+    def __iter__(self) -> Iterator[Product]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def to_products(self) -> List[Product]:
+        """Build every Product in the batch"""
+        return list(self)
+
+    def column(self, name: str) -> Union[List, array]:
+        """
+        Return one column
+        Args:
+            name (str): Product field name
+        Returns:
+            A list for string columns, or the backing array for numeric columns
+            (-1 marks a missing price_pence/review_count, NaN a missing rating)
+        """
+        if name in self._text:
+            return self._text[name]
+        if name in self._categories:
+            return self._categories[name].to_list()
+        if name in ('price_pence', 'rating', 'review_count'):
+            return getattr(self, name)
+        raise KeyError(name)
+
+    def encoded(self, name: str) -> Tuple[array, List[Optional[str]]]:
+        """
+        Dictionary encoding of a category column
+        Args:
+            name (str): 'availability' or 'brand'
+        Returns:
+            Tuple: Per-row codes and the distinct value each code stands for
+        """
+        categories = self._categories[name]
+        return categories.codes, categories.values
+
+    def categories(self, name: str) -> List[Optional[str]]:
+        """Distinct values of a dictionary-encoded column, in first-seen order"""
+        return list(self._categories[name].values)
@@ -0,0 +1,313 @@
+"""
+In-memory product index for scrape results
+Builds an inverted token index over product names and brands, sorted indexes
+on price and unit price, and per-facet posting lists once. Queries then
+intersect small row-id arrays instead of scanning every product.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from prices import normalise_prices
+from tesco_scraper import Product, product_to_dict
+
+# Words of a name or brand, lowercased
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:\'[a-z]+)?')
+
+# Fields with facet counts, and the normalised columns behind them
+FACET_FIELDS = ('brand', 'availability', 'unit_basis')
+
+# Values that mean "unknown" and are left out of facets
+MISSING_VALUES = {None, '', 'N/A'}
+
+# Orders a query can return its matches in; 'position' keeps scrape order
+SORT_KEYS = ('position', 'price', 'unit_price', 'name')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase index tokens"""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class _SortedColumn:
+    """Numeric column with its rows in value order, for range lookups and sorting"""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        known = np.flatnonzero(~np.isnan(values))
+        self.order = known[np.argsort(values[known], kind='stable')]
+        self.sorted_values = values[self.order]
+        self.unknown = np.flatnonzero(np.isnan(values))
+        # Unique position of each row in value order; unknown values sort last, in row order
+        self.rank = np.empty(len(values), dtype=np.int64)
+        self.rank[np.concatenate([self.order, self.unknown])] = np.arange(len(values))
+
+    def _span(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """Start and end positions in value order of the values in [low, high]"""
+        start = 0 if low is None else int(np.searchsorted(self.sorted_values, low, side='left'))
+        end = len(self.order) if high is None else int(np.searchsorted(self.sorted_values, high, side='right'))
+        return start, max(start, end)
+
+    def count(self, low: Optional[float], high: Optional[float]) -> int:
+        """Number of rows with a value in [low, high]"""
+        start, end = self._span(low, high)
+        return end - start
+
+    def between(self, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        """Row ids (ascending) with a value in [low, high]"""
+        start, end = self._span(low, high)
+        return np.sort(self.order[start:end])
+
+
+class ProductIndex:
+    """Token, price and facet indexes over one set of scrape results"""
+
+    def __init__(self, products: Iterable[Union[Product, Dict]]):
+        """
+        Build the indexes
+        Args:
+            products: Products, or product dictionaries as exported (product_to_dict)
+        """
+        self.rows: List[Dict] = [
+            product if isinstance(product, dict) else product_to_dict(product) for product in products
+        ]
+        count = len(self.rows)
+        self._all = np.arange(count, dtype=np.int64)
+
+        frame = normalise_prices(pd.DataFrame({
+            'price': [row.get('price') for row in self.rows],
+            'price_per_unit': [row.get('price_per_unit') for row in self.rows],
+            'promotion': [row.get('promotion') for row in self.rows],
+        }))
+        self.price_pence = frame['price_pence'].to_numpy(dtype='float64', na_value=np.nan)
+        self.unit_price_pence = frame['unit_price_pence'].to_numpy(dtype='float64', na_value=np.nan)
+        self._sorted = {
+            'price': _SortedColumn(self.price_pence),
+            'unit_price': _SortedColumn(self.unit_price_pence),
+        }
+        self._flags = {
+            flag: np.flatnonzero(frame[flag].to_numpy(dtype=bool)) for flag in ('promo', 'clubcard')
+        }
+
+        postings: Dict[str, List[int]] = {}
+        brand_tokens: Dict[Optional[str], List[str]] = {}
+        for row_id, row in enumerate(self.rows):
+            brand = row.get('brand')
+            if brand not in brand_tokens:
+                brand_tokens[brand] = tokenize(brand)
+            for token in set(tokenize(row.get('name'))).union(brand_tokens[brand]):
+                postings.setdefault(token, []).append(row_id)
+        self._tokens = {token: np.array(ids, dtype=np.int64) for token, ids in postings.items()}
+
+        # Each facet is dictionary-encoded: one code per row (-1 if missing) plus a posting list per value
+        self._facets: Dict[str, Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]] = {}
+        for field in FACET_FIELDS:
+            values = frame[field] if field in frame else pd.Series([row.get(field) for row in self.rows], dtype=object)
+            codes, labels = pd.factorize(values)
+            known = np.array([label not in MISSING_VALUES for label in labels], dtype=bool)
+            # Renumber the known labels and send the missing ones to -1
+            renumber = np.append(np.where(known, np.cumsum(known) - 1, -1), -1).astype(np.int64)
+            codes = renumber[codes]
+            labels = [label for label, keep in zip(labels, known) if keep]
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            self._facets[field] = (codes, labels, {
+                label: order[bounds[code]:bounds[code + 1]] for code, label in enumerate(labels)
+            })
+        self._all_facets = self._count_facets(self._all)
+
+        # Name order for sorting by name
+        self._name_order = np.argsort(np.array([(row.get('name') or '').lower() for row in self.rows], dtype=object),
+                                      kind='stable')
+        self._name_rank = np.empty(count, dtype=np.int64)
+        self._name_rank[self._name_order] = np.arange(count)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def query(self, text: Optional[str] = None, min_price: Optional[float] = None,
+              max_price: Optional[float] = None, max_unit_price: Optional[float] = None,
+              unit_basis: Optional[str] = None, brand: Optional[str] = None,
+              availability: Optional[str] = None, promo: bool = False, clubcard: bool = False,
+              sort: str = 'position', descending: bool = False,
+              offset: int = 0, limit: Optional[int] = 50, facets: bool = False) -> Dict:
+        """
+        Find products matching every given condition
+        Args:
+            text (str): Words that must all appear in the name or brand
+            min_price (float): Lowest price in pence
+            max_price (float): Highest price in pence
+            max_unit_price (float): Highest price per unit_basis in pence
+            unit_basis (str): 'kg', 'l' or 'each'
+            brand (str): Exact brand
+            availability (str): Exact availability text
+            promo (bool): Only products with an offer
+            clubcard (bool): Only Clubcard Prices
+            sort (str): One of SORT_KEYS
+            descending (bool): Reverse the sort order
+            offset (int): Matches to skip
+            limit (int): Most matches to return (None for all)
+            facets (bool): Also count brand, availability and unit_basis values among
+                all the matches; on broad queries this takes longer than the lookup
+        Returns:
+            Dict: 'total' matches, this page of 'products', and with facets the
+                'facets' counts
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(SORT_KEYS)}")
+
+        postings = []
+        for token in set(tokenize(text)):
+            postings.append(self._tokens.get(token, self._all[:0]))
+        for field, value in (('unit_basis', unit_basis), ('brand', brand), ('availability', availability)):
+            if value is not None:
+                postings.append(self._facets[field][2].get(value, self._all[:0]))
+        for flag, wanted in (('promo', promo), ('clubcard', clubcard)):
+            if wanted:
+                postings.append(self._flags[flag])
+
+        ranges = []
+        if min_price is not None or max_price is not None:
+            ranges.append(('price', min_price, max_price))
+        if max_unit_price is not None:
+            ranges.append(('unit_price', None, max_unit_price))
+
+        matches = self._intersect(postings, ranges)
+        ordered = self._order(matches, sort, descending, None if limit is None else offset + limit)
+        page = ordered[offset:] if limit is None else ordered[offset:offset + limit]
+        result = {
+            'total': len(matches),
+            'products': [self.rows[row_id] for row_id in page],
+        }
+        if facets:
+            result['facets'] = self.facet_counts(matches)
+        return result
+
+    def _intersect(self, postings: List[np.ndarray], ranges: List[Tuple[str, Optional[float], Optional[float]]]
+                   ) -> np.ndarray:
+        """
+        Row ids (ascending) in every posting list and inside every value range
+        Posting lists are intersected smallest first. Ranges then filter those few
+        rows by value; only without a posting list does the sorted index supply them.
+        """
+        if postings:
+            postings = sorted(postings, key=len)
+            matches = postings[0]
+            for ids in postings[1:]:
+                if not len(matches):
+                    break
+                matches = np.intersect1d(matches, ids, assume_unique=True)
+        elif ranges:
+            # Start from the narrowest range; its size is known from the sorted index alone
+            ranges = sorted(ranges, key=lambda bounds: self._sorted[bounds[0]].count(*bounds[1:]))
+            matches = self._sorted[ranges[0][0]].between(*ranges[0][1:])
+            ranges = ranges[1:]
+        else:
+            return self._all
+
+        for column, low, high in ranges:
+            values = self._sorted[column].values[matches]
+            keep = ~np.isnan(values)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            matches = matches[keep]
+        return matches
+
+    def _order(self, matches: np.ndarray, sort: str, descending: bool, needed: Optional[int]) -> np.ndarray:
+        """Matches in the requested order; only the first `needed` are guaranteed sorted"""
+        if sort == 'position':
+            return matches[::-1] if descending else matches
+        if sort == 'name':
+            if len(matches) == len(self._all):
+                return self._name_order[::-1] if descending else self._name_order
+            keys = self._name_rank[matches]
+            if descending:
+                keys = -keys
+        else:
+            column = self._sorted[sort]
+            if len(matches) == len(self._all):
+                # Everything matches: the sorted index already holds the order
+                return np.concatenate([column.order[::-1] if descending else column.order, column.unknown])
+            keys = column.rank[matches]
+            if descending:
+                # Known values largest first; unknown values stay last
+                known = len(column.order)
+                keys = np.where(keys < known, known - 1 - keys, keys)
+        # Keys are unique, so every page of a query comes from the same total order
+        if needed is not None and needed < len(matches):
+            # Only the top of the order is returned: partition before sorting
+            top = np.argpartition(keys, needed - 1)[:needed] if needed else keys[:0].astype(np.int64)
+            return matches[top[np.argsort(keys[top], kind='stable')]]
+        return matches[np.argsort(keys, kind='stable')]
+
+    def facet_counts(self, matches: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Count the values of each facet field
+        Args:
+            matches (np.ndarray): Row ids to count (every row if None)
+        Returns:
+            Dict[str, Dict[str, int]]: Count per value for each field, most common first
+        """
+        if matches is None or len(matches) == len(self._all):
+            # Counted once when the index was built
+            return self._all_facets
+        return self._count_facets(matches)
+
+    def _count_facets(self, matches: np.ndarray) -> Dict[str, Dict[str, int]]:
+        counts = {}
+        for field, (codes, labels, _) in self._facets.items():
+            codes = codes[matches]
+            tally = np.bincount(codes[codes >= 0], minlength=len(labels))
+            order = np.argsort(-tally, kind='stable')
+            counts[field] = {labels[code]: int(tally[code]) for code in order if tally[code]}
+        return counts
+
+
+class IndexCache:
+    """Thread-safe LRU of ProductIndexes keyed by result set"""
+
+    def __init__(self, max_size: int = 8):
+        """
+        Initialize the cache
+        Args:
+            max_size (int): Most indexes kept in memory
+        """
+        self.max_size = max_size
+        self._indexes: 'OrderedDict[str, Tuple[int, ProductIndex]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, count: int, load_rows) -> ProductIndex:
+        """
+        Index of a result set, rebuilt when its row count has changed
+        Args:
+            key (str): Result set identifier (e.g. a job ID)
+            count (int): Current number of rows in the result set
+            load_rows: Called with no arguments to fetch the rows when (re)building
+        Returns:
+            ProductIndex: Index of the result set
+        """
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == count:
+                self._indexes.move_to_end(key)
+                return cached[1]
+        # Built outside the lock so one large build doesn't hold up queries on other jobs
+        index = ProductIndex(load_rows())
+        with self._lock:
+            self._indexes[key] = (count, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def discard(self, key: str):
+        """Forget the index of a result set"""
+        with self._lock:
+            self._indexes.pop(key, None)
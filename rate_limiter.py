@@ -0,0 +1,244 @@
+"""
+Rate limiting for the Tesco scraper
+Token-bucket politeness controls shared by the concurrent fetch engines, and
+an adaptive controller that finds the highest rate the site tolerates.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum tokens held (defaults to one second of tokens, at least 1)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Take one token, going into debt if the bucket is empty
+        Returns:
+            float: Seconds the caller must wait before using the token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a token is available"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class HostRateLimiter:
+    """Keeps one token bucket per host so each site gets its own request budget"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the limiter
+        Args:
+            rate (float): Requests per second allowed for each host
+            capacity (float): Burst size for each host
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Return the bucket for the host of `url`, creating it on first use"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str):
+        """Block until a request to `url` is allowed"""
+        self.bucket_for(url).acquire()
+
+    async def acquire_async(self, url: str):
+        """Wait until a request to `url` is allowed"""
+        await self.bucket_for(url).acquire_async()
+
+
+class LatencyWindow:
+    """Response times of the most recent requests"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        """
+        Initialize the window
+        Args:
+            size (int): Number of recent response times kept
+            min_samples (int): Samples needed before percentiles are reported
+        """
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Response time below which `percent` % of recent requests finished
+        Returns:
+            Optional[float]: Seconds, or None until min_samples requests have been seen
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header
+    Args:
+        value (str): Delay in seconds or an HTTP date
+    Returns:
+        Optional[float]: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AdaptiveRateController:
+    """
+    AIMD request-rate controller
+    Raises the request rate a little after every healthy response and cuts it
+    sharply when the server throttles (429), fails (5xx, connection errors) or
+    slows down, pausing for as long as a Retry-After header asks.
+    """
+
+    def __init__(self, rate: float = 0.5, min_rate: float = 0.05, max_rate: float = 10.0,
+                 increase: float = 0.1, decrease: float = 0.5, latency_factor: float = 2.0,
+                 cooldown: float = 1.0):
+        """
+        Initialize the controller
+        Args:
+            rate (float): Starting requests per second
+            min_rate (float): Lowest rate backing off can reach
+            max_rate (float): Highest rate healthy responses can reach
+            increase (float): Requests per second added for each second of healthy responses
+            decrease (float): Factor the rate is multiplied by when backing off
+            latency_factor (float): Back off when a response takes this many times the usual latency
+            cooldown (float): Seconds after a back-off during which further bad responses
+                (from requests already in flight) don't cut the rate again
+        """
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.healthy = 0
+        self.backoffs = 0
+        self._bucket = TokenBucket(min(max(rate, min_rate), max_rate), capacity=1)
+        # Moving average of healthy response times
+        self._latency: Optional[float] = None
+        self._paused_until = 0.0
+        self._last_backoff = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current requests per second"""
+        return self._bucket.rate
+
+    def _wait(self) -> float:
+        with self._lock:
+            pause = self._paused_until - time.monotonic()
+        return max(0.0, pause) + self._bucket._reserve()
+
+    def acquire(self, url: Optional[str] = None):
+        """Block until the next request is allowed"""
+        wait = self._wait()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: Optional[str] = None):
+        """Wait (without blocking the event loop) until the next request is allowed"""
+        wait = self._wait()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, latency: float, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Adjust the rate after a response
+        Args:
+            latency (float): Seconds the request took
+            status (int): HTTP status, or None if the request failed without a response
+            retry_after (float): Seconds the server asked us to wait, if any
+        """
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+            if status is None or status == 429 or status >= 500:
+                self._back_off(now)
+                return
+
+            if self._latency is not None and latency > self.latency_factor * self._latency:
+                self._back_off(now)
+            else:
+                # Additive increase: about `increase` requests per second more for every second of traffic
+                rate = self._bucket.rate
+                self._bucket.rate = min(self.max_rate, rate + self.increase / rate)
+                self.healthy += 1
+            self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+
+    def _back_off(self, now: float):
+        """Multiplicative decrease, at most once per cooldown (call with the lock held)"""
+        if now - self._last_backoff < self.cooldown:
+            return
+        self._last_backoff = now
+        self.backoffs += 1
+        self._bucket.rate = max(self.min_rate, self._bucket.rate * self.decrease)
+
+    def stats(self) -> Dict[str, float]:
+        """Current rate and counts of healthy responses and back-offs"""
+        return {'rate': round(self.rate, 3), 'healthy': self.healthy, 'backoffs': self.backoffs}
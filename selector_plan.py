@@ -0,0 +1,161 @@
+"""
+Adaptive selector plans for the Tesco scraper
+Remembers which fallback selector won for each page layout so later pages
+and tiles try the winner first and only walk the full chain on a miss.
+"""
+
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Class names and attribute values mentioned in a selector, e.g.
+# '.product-tile--title' -> 'product-tile--title', '[data-auto="brand"]' -> 'brand'
+_SELECTOR_TOKEN = re.compile(r'\.([\w-]+)|="([^"]+)"')
+
+# Bytes of markup after the first anchor that are checked for markers
+FINGERPRINT_WINDOW = 8 * 1024
+
+
+def selector_markers(selectors: Iterable[str]) -> List[str]:
+    """
+    Collect the literal markup tokens referenced by a set of selectors
+    Args:
+        selectors: CSS selectors used by the scraper
+    Returns:
+        List[str]: Unique tokens in first-seen order
+    """
+    markers = []
+    for selector in selectors:
+        for class_name, attr_value in _SELECTOR_TOKEN.findall(selector):
+            token = class_name or attr_value
+            if token not in markers:
+                markers.append(token)
+    return markers
+
+
+class SelectorPlanCache:
+    """Caches the winning selector of each fallback chain, per page layout"""
+
+    def __init__(self, markers: List[str], max_layouts: int = 32, anchors: Optional[List[str]] = None,
+                 window: int = FINGERPRINT_WINDOW):
+        """
+        Initialize the cache
+        Args:
+            markers (List[str]): Markup tokens whose presence fingerprints a layout
+            max_layouts (int): Number of layout plans kept before the oldest is dropped
+            anchors (List[str]): Tokens marking where the layout's markup starts (e.g. the
+                first product tile); only `window` bytes from there are fingerprinted.
+                Without anchors the whole page is checked.
+            window (int): Size of the fingerprinted sample after the first anchor
+        """
+        self.markers = [(marker, marker.encode('utf-8')) for marker in markers]
+        self.max_layouts = max_layouts
+        self.window = window
+        self.anchors = [(anchor, anchor.encode('utf-8')) for anchor in anchors or []]
+        self._plans: 'OrderedDict[Tuple[bool, ...], Dict[str, str]]' = OrderedDict()
+        # Counted without the lock: concurrent parses may occasionally lose an increment
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, content: Union[bytes, str]) -> Tuple[bool, ...]:
+        """
+        Fingerprint a page layout by which markup tokens appear in it
+        Args:
+            content: Raw page body
+        Returns:
+            Tuple[bool, ...]: Presence flag for each marker
+        """
+        is_text = isinstance(content, str)
+        if self.anchors:
+            # Only the markup from the first anchor on, rather than every marker scanning the whole page
+            start = self._first_anchor(content, is_text)
+            content = content[start:start + self.window] if start is not None else content[:0]
+        if is_text:
+            return tuple(text in content for text, _ in self.markers)
+        return tuple(raw in content for _, raw in self.markers)
+
+    def _first_anchor(self, content: Union[bytes, str], is_text: bool) -> Optional[int]:
+        """Position of the earliest anchor used as a whole word of an attribute value"""
+        delimiters = '" ' if is_text else b'" '
+        best = len(content)
+        for text, raw in self.anchors:
+            anchor = text if is_text else raw
+            # Each search stops at the best position so far, so absent anchors don't scan the whole page
+            position = content.find(anchor, 0, best)
+            while position > 0 and not (content[position - 1:position] in delimiters
+                                        and content[position + len(anchor):position + len(anchor) + 1] in delimiters):
+                # e.g. a '.product-tile' style rule, or 'product-tile--title'
+                position = content.find(anchor, position + 1, best)
+            if position > 0:
+                best = position
+        return best if best < len(content) else None
+
+    def plan_for(self, fingerprint: Tuple[bool, ...]) -> Dict[str, str]:
+        """Return the (possibly empty) plan for a layout fingerprint"""
+        with self._lock:
+            plan = self._plans.get(fingerprint)
+            if plan is None:
+                plan = self._plans[fingerprint] = {}
+                while len(self._plans) > self.max_layouts:
+                    self._plans.popitem(last=False)
+            else:
+                self._plans.move_to_end(fingerprint)
+            return plan
+
+    def find(self, plan: Dict[str, str], field: str, selectors: List[str],
+             probe: Callable[[str], Any]) -> Optional[Any]:
+        """
+        Run a selector fallback chain, trying the plan's winner first
+        Args:
+            plan (Dict[str, str]): Plan returned by plan_for
+            field (str): Name of the chain (e.g. 'tile', 'price')
+            selectors (List[str]): Full fallback chain in priority order
+            probe: Function returning a truthy result for a selector, or a falsy one on failure
+        Returns:
+            The first truthy probe result, or None if every selector fails
+        """
+        winner = plan.get(field)
+        if winner is not None:
+            result = probe(winner)
+            if result:
+                self._hits[field] += 1
+                return result
+
+        self._misses[field] += 1
+        for selector in selectors:
+            if selector == winner:
+                continue
+            result = probe(selector)
+            if result:
+                plan[field] = selector
+                return result
+        return None
+
+    def stats(self) -> Dict:
+        """
+        Selector hit and miss counters
+        Returns:
+            Dict: 'fields' maps each field to its 'hits' (cached winner worked) and
+            'misses' (full chain ran); 'layouts' is the number of cached plans
+        """
+        hits, misses = dict(self._hits), dict(self._misses)
+        with self._lock:
+            layouts = len(self._plans)
+        return {
+            'fields': {field: {'hits': hits.get(field, 0), 'misses': misses.get(field, 0)}
+                       for field in list(misses) + [field for field in hits if field not in misses]},
+            'layouts': layouts,
+        }
+
+    def reset_stats(self):
+        """Zero all hit and miss counters"""
+        self._hits.clear()
+        self._misses.clear()
+
+    def clear(self):
+        """Forget every cached plan and counter"""
+        with self._lock:
+            self._plans.clear()
+        self.reset_stats()
@@ -0,0 +1,110 @@
+"""
+Streaming listing parser for the Tesco scraper
+Feeds a response body into lxml's incremental HTML parser as it downloads
+and hands over each product tile as soon as its closing tag has arrived.
+Finished elements are cleared straight away, so the tree held in memory
+never grows beyond the tiles of one chunk and their open ancestors.
+"""
+
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from parsers import NON_TEXT_TAGS
+
+# Bytes read from the response per chunk
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class TileStream:
+    """
+    Incremental parser emitting whatever `extract` returns for each complete tile
+    Like the full parse, only the tiles of the first selector that matches anything
+    on the page are used. Tiles of the first selector are emitted as soon as they
+    end; tiles of later selectors are held back until the end of the body rules
+    out every selector before theirs.
+    """
+
+    def __init__(self, tile_selectors: List[str], extract: Callable[[Any], Optional[Any]], encoding: str = 'utf-8'):
+        """
+        Initialize the parser
+        Args:
+            tile_selectors (List[str]): CSS selectors of a product tile, most preferred
+                first; an element inside a tile is only a tile itself if it matches a
+                selector preferred over every selector its enclosing tile matches
+            extract: Called with each complete tile element; None results are dropped
+            encoding (str): Character encoding of the body
+        """
+        try:
+            from lxml import etree
+            from cssselect import HTMLTranslator
+        except ImportError as e:
+            raise ImportError("Streaming parsing needs the lxml and cssselect packages") from e
+
+        self._etree = etree
+        translator = HTMLTranslator()
+        self._matchers = [etree.XPath(translator.css_to_xpath(selector, prefix='self::'))
+                          for selector in tile_selectors]
+        self._extract = extract
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+        # Open tiles, outermost first, with the indexes of the selectors each one matches
+        self._open: List[Tuple[Any, Set[int]]] = []
+        # Index of the most preferred selector matched so far
+        self._best = len(self._matchers)
+        # Results of tiles that match only later selectors, until the page ends
+        self._held: List[Tuple[Set[int], Any]] = []
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Parse the next chunk of the body and return the results of the tiles it completed"""
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self) -> List[Any]:
+        """Finish the body and return the results of any tiles completed by its end"""
+        try:
+            self._parser.close()
+        except self._etree.XMLSyntaxError:
+            # An empty or truncated body; lxml has already recovered what it could
+            pass
+        results = self._read_events()
+        # Every earlier selector is ruled out now, so the held tiles of the best one are used
+        results.extend(result for matched, result in self._held if self._best in matched)
+        self._held = []
+        return results
+
+    def _read_events(self) -> List[Any]:
+        results = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                # Inside a tile, only selectors preferred over the tile's own can start a new one
+                limit = min(self._open[-1][1]) if self._open else len(self._matchers)
+                matched = {index for index, matcher in enumerate(self._matchers[:limit]) if matcher(element)}
+                if matched:
+                    self._open.append((element, matched))
+                    if min(matched) < self._best:
+                        self._best = min(matched)
+                        if self._best == 0:
+                            self._held = []
+            elif self._open and element is self._open[-1][0]:
+                _, matched = self._open.pop()
+                # Tiles of a selector later than one already matched are never used
+                if min(matched) <= self._best:
+                    self._etree.strip_elements(element, *NON_TEXT_TAGS, with_tail=False)
+                    result = self._extract(element)
+                    if result is not None:
+                        if 0 in matched:
+                            results.append(result)
+                        else:
+                            self._held.append((matched, result))
+                if not self._open:
+                    self._release(element)
+            elif not self._open:
+                self._release(element)
+        return results
+
+    @staticmethod
+    def _release(element):
+        """Drop a finished element's content and the finished siblings before it"""
+        element.clear(keep_tail=True)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
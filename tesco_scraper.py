@@ -4,21 +4,111 @@ A comprehensive web scraper for extracting product data from Tesco's website.
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import time
 import json
+import random
 import re
+import sys
 from urllib.parse import urljoin, quote
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Iterable, Iterator, Tuple, Callable
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 import logging
 
+from embedded_state import embedded_products
+from http_cache import CachingAdapter, HTTPCache
+from page_index import PageIndex, page_hash
+from parsers import PARSER_BACKENDS, ParserBackend, get_parser_backend
+from rate_limiter import AdaptiveRateController, HostRateLimiter, LatencyWindow, parse_retry_after
+from selector_plan import SelectorPlanCache, selector_markers
+from streaming_parser import STREAM_CHUNK_SIZE, TileStream
+from transport import shared_transport as get_shared_transport
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Percentile of recent response times after which a hedged request is sent
+HEDGE_PERCENTILE = 95
+
+# Common selectors for Tesco product tiles (these may need updating)
+PRODUCT_TILE_SELECTORS = [
+    '.product-tile',
+    '[data-auto="product-tile"]',
+    '.product-list--list-item',
+    '.beans-tile'
+]
+
+# Fallback selectors for each product field, tried in order
+PRODUCT_FIELD_SELECTORS = {
+    'name': [
+        '.product-tile--title',
+        '[data-auto="product-tile-title"]',
+        '.product-details--content h3',
+        'h3 a'
+    ],
+    'price': [
+        '.product-tile--price',
+        '[data-auto="price-current"]',
+        '.price-current',
+        '.beans-price__text'
+    ],
+    'price_per_unit': [
+        '.product-tile--price-per-unit',
+        '[data-auto="price-per-quantity-weight"]',
+        '.price-per-unit'
+    ],
+    'product_url': [
+        'a[href*="/groceries/"]',
+        '.product-tile--title a',
+        'h3 a'
+    ],
+    'image_url': [
+        '.product-tile--image img',
+        'img[src*="digitalcontent"]',
+        '.product-image img'
+    ],
+    'availability': [
+        '.product-tile--availability',
+        '[data-auto="availability"]',
+        '.availability-text'
+    ],
+    'brand': [
+        '.product-tile--brand',
+        '[data-auto="brand"]',
+        '.brand-name'
+    ]
+}
+
+# Prices such as "£2.50", "£1,299.00" or "75p"
+# "£2.50", "£1,299.00" (group 1 pounds, group 2 pence) or "75p" (group 3); the first one in the text is the price
+PRICE_PATTERN = re.compile(r'£\s*(\d{1,3}(?:,\d{3})*|\d+)(?:\.(\d{1,2}))?|(\d+(?:\.\d+)?)\s*p\b')
+
+def parse_price_pence(price: Optional[str]) -> Optional[int]:
+    """
+    Parse a display price into whole pence
+    Args:
+        price (str): Price text such as "£2.50" or "75p"; of several prices, the first is read
+    Returns:
+        Optional[int]: Price in pence, or None if no price could be read
+    """
+    match = PRICE_PATTERN.search(price) if price else None
+    if match is None:
+        return None
+    if match.group(1) is not None:
+        pence = match.group(2) or '0'
+        return int(match.group(1).replace(',', '')) * 100 + int(pence.ljust(2, '0'))
+    return round(float(match.group(3)))
+
+@dataclass(slots=True)
 class Product:
     """Data class to represent a Tesco product"""
     name: str
@@ -31,19 +121,161 @@ class Product:
     review_count: Optional[int]
     description: Optional[str]
     brand: Optional[str]
+    price_pence: Optional[int] = None
+    
+    def __post_init__(self):
+        # Brand and availability repeat across thousands of products; share one string each
+        if self.brand is not None:
+            self.brand = sys.intern(self.brand)
+        if self.availability is not None:
+            self.availability = sys.intern(self.availability)
+        if self.price_pence is None:
+            self.price_pence = parse_price_pence(self.price)
+
+# Column order used by every export format
+PRODUCT_FIELDS = [
+    'name',
+    'price',
+    'price_per_unit',
+    'image_url',
+    'product_url',
+    'availability',
+    'rating',
+    'review_count',
+    'description',
+    'brand'
+]
+
+def product_to_dict(product: Product) -> Dict:
+    """Convert a product to a plain dictionary in export column order"""
+    return {field: getattr(product, field) for field in PRODUCT_FIELDS}
+
+# Scraper used by each parse worker process in pipeline mode
+_worker_scraper = None
+
+def _init_parse_worker(parser: str, adaptive_selectors: bool, base_url: str, embedded_state: bool = False):
+    """Create the parse-only scraper of a pipeline worker process"""
+    global _worker_scraper
+    _worker_scraper = TescoScraper(
+        delay=0, parser=parser, adaptive_selectors=adaptive_selectors, embedded_state=embedded_state
+    )
+    _worker_scraper.base_url = base_url
+
+def _parse_listing_in_worker(content: bytes) -> List[Product]:
+    """Parse a listing page inside a pipeline worker process"""
+    return _worker_scraper._parse_listing_html(content)
+
+def _close_response(future: Future):
+    """Close the response of a finished request that is no longer needed"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+class DeadlineExceeded(requests.Timeout):
+    """A search or crawl ran out of its time budget"""
+
 
 class TescoScraper:
     """Main scraper class for Tesco website"""
     
-    def __init__(self, delay=2):
+    def __init__(self, delay=2, parser: Union[str, ParserBackend] = 'html.parser',
+                 adaptive_selectors: bool = False, http_cache: Union[str, HTTPCache, None] = None,
+                 parse_workers: int = 0, page_index: Union[str, PageIndex, None] = None,
+                 stop_after_unchanged: int = 0, adaptive_rate: bool = False, max_rate: float = 10.0,
+                 max_retries: int = 3, timeout: Union[float, Tuple[float, float], None] = (5, 30),
+                 deadline: Optional[float] = None, hedge: bool = False,
+                 latencies: Optional[LatencyWindow] = None, shared_transport: bool = False,
+                 http2: bool = False, embedded_state: bool = False, stream_parse: bool = False):
         """
         Initialize the scraper
         Args:
             delay (int): Delay between requests in seconds to be respectful
+            parser (str): HTML parser backend: 'html.parser', 'lxml' or 'selectolax'
+            adaptive_selectors (bool): Learn which fallback selector wins for each page
+                layout and try it first on later pages and tiles; only pays off when
+                the first selectors of the chains stop matching
+            http_cache (str): HTTPCache (or path of its database) used to cache and
+                revalidate responses across runs
+            parse_workers (int): Parse listing pages in this many worker processes while
+                the next page downloads (0 parses in the calling thread)
+            page_index (str): PageIndex (or path of its database) for incremental crawls:
+                listing pages unchanged since the last run reuse their stored products
+            stop_after_unchanged (int): With a page index, stop fetching after this many
+                unchanged pages in a row and take the remaining pages from the last run
+                (0 always fetches every page)
+            adaptive_rate (bool): Instead of a fixed delay, start at one request every
+                `delay` seconds and let an AIMD controller speed up while the site responds
+                well and back off on 429/503 responses, errors or rising latency
+            max_rate (float): Highest requests per second the adaptive controller may reach
+            max_retries (int): Times a throttled or failed request is retried before the
+                page is given up on
+            timeout (float): Seconds to wait for a connection and for each read of a
+                response, as one number or a (connect, read) pair
+            deadline (float): Seconds each search or category listing may take; when it
+                runs out, the products of the pages scraped so far are returned
+            hedge (bool): Send a duplicate request when a response takes longer than 95 %
+                of recent ones, and use whichever answers first
+            latencies (LatencyWindow): Response time history to share with other scrapers,
+                so short-lived scrapers have percentiles to hedge with from the start
+            shared_transport (bool): Use the process-wide connection pool shared by all
+                scrapers, so connections stay open from one scraper to the next
+            http2 (bool): Use the shared HTTP/2 transport (needs httpx[http2]); implies shared_transport
+            embedded_state (bool): Read products from the JSON state embedded in listing
+                pages without building the DOM, parsing the HTML only when a page has none
+            stream_parse (bool): Parse listing pages while they download and hand over each
+                product as soon as its tile has arrived, never holding a whole page's tree
+                (needs parser='lxml'; the page index and embedded state are not used)
         """
         self.base_url = "https://www.tesco.com"
         self.session = requests.Session()
         self.delay = delay
+        self.parser = get_parser_backend(parser)
+        self.adaptive_selectors = adaptive_selectors
+        self.embedded_state = embedded_state
+        if stream_parse and self.parser.name != 'lxml':
+            raise ValueError("Streaming parsing needs parser='lxml'")
+        self.stream_parse = stream_parse
+        self.parse_workers = parse_workers
+        self._parse_pool = None
+        self.selector_plans = None
+        if adaptive_selectors:
+            all_selectors = PRODUCT_TILE_SELECTORS + [
+                selector for selectors in PRODUCT_FIELD_SELECTORS.values() for selector in selectors
+            ]
+            # Layouts are told apart by the markup of their first product tile
+            self.selector_plans = SelectorPlanCache(
+                selector_markers(all_selectors), anchors=selector_markers(PRODUCT_TILE_SELECTORS)
+            )
+        
+        if isinstance(http_cache, str):
+            http_cache = HTTPCache(http_cache)
+        self.http_cache = http_cache
+        if isinstance(page_index, str):
+            page_index = PageIndex(page_index)
+        self.page_index = page_index
+        self.stop_after_unchanged = stop_after_unchanged
+        self.shared_transport = shared_transport or http2
+        self.http2 = http2
+        self.max_retries = max_retries
+        # Base of the exponential backoff between retries, in seconds
+        self.retry_backoff = 1.0
+        self.timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.deadline = deadline
+        # Whether the last listing stopped early because its deadline ran out
+        self.deadline_reached = False
+        self.hedge = hedge
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.latencies = latencies if latencies is not None else LatencyWindow()
+        self._hedge_pool = None
+        self.rate_controller = None
+        if adaptive_rate:
+            self.rate_controller = AdaptiveRateController(
+                rate=1 / delay if delay else max_rate, max_rate=max_rate
+            )
+        # Per-host limiter pacing every request in place of the delay, shared by concurrent
+        # fetches (set by AsyncTescoScraper and CatalogueCrawler)
+        self.rate_limiter: Optional[HostRateLimiter] = None
+        self._mount_adapter()
         
         # Set headers to mimic a real browser
         self.session.headers.update({
@@ -55,6 +287,164 @@ class TescoScraper:
             'Upgrade-Insecure-Requests': '1',
         })
         
+    def _mount_adapter(self, pool_size: int = 10):
+        """
+        Mount the session's transport adapter
+        Args:
+            pool_size (int): Connections kept open per host
+        """
+        self._pool_size = pool_size
+        if self.shared_transport:
+            # The shared pool is sized once per process (HTTP_POOL_SIZE)
+            transport = get_shared_transport(http2=self.http2)
+            self._pool_size = transport.pool_size
+            adapter = CachingAdapter(self.http_cache, transport=transport) if self.http_cache is not None else transport
+        elif self.http_cache is not None:
+            adapter = CachingAdapter(self.http_cache, pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+    def _get(self, url: str, paced: bool = True, deadline: Optional[float] = None,
+             stream: bool = False) -> requests.Response:
+        """
+        GET a page, retrying throttled and failed requests
+        Args:
+            url (str): Page URL
+            paced (bool): Wait for the adaptive rate controller (or the rate limiter)
+                before the first attempt (False when the caller already has)
+            deadline (float): time.monotonic() value by which the page must have arrived
+            stream (bool): Return as soon as the headers arrive, leaving the body to be read
+        Returns:
+            requests.Response: A successful response
+        Raises:
+            DeadlineExceeded: If the deadline passes first
+            requests.RequestException: If the page still fails after max_retries retries
+        """
+        controller = self.rate_controller
+        pacer = controller or self.rate_limiter
+        for attempt in range(self.max_retries + 1):
+            if pacer is not None and (paced or attempt):
+                pacer.acquire(url)
+            
+            timeout = self._timeout_within(deadline)
+            started = time.monotonic()
+            retry_after = None
+            try:
+                response = self._send(url, timeout, stream)
+            except DeadlineExceeded:
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if controller is not None:
+                    controller.record(time.monotonic() - started)
+                if attempt == self.max_retries:
+                    raise
+                problem = str(e)
+            else:
+                latency = time.monotonic() - started
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                # Cached answers say nothing about how the site is coping
+                if not getattr(response, 'from_cache', False):
+                    self.latencies.record(latency)
+                    if controller is not None:
+                        controller.record(latency, response.status_code, retry_after)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                response.close()
+                problem = f"HTTP {response.status_code}"
+            
+            # The adaptive controller paces the retry itself (including any Retry-After pause)
+            if controller is None:
+                if retry_after is None:
+                    retry_after = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                if deadline is not None and time.monotonic() + retry_after >= deadline:
+                    raise DeadlineExceeded(f"No time left to retry {url} after {problem}")
+                time.sleep(retry_after)
+            logger.warning(f"Retrying {url} after {problem} (attempt {attempt + 2}/{self.max_retries + 1})")
+    
+    def _timeout_within(self, deadline: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+        """Connect and read timeouts, shortened so a request can't outlast the deadline"""
+        connect, read = self.timeout
+        if deadline is None:
+            return connect, read
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline reached")
+        return (remaining if connect is None else min(connect, remaining),
+                remaining if read is None else min(read, remaining))
+    
+    def _send(self, url: str, timeout: Tuple[Optional[float], Optional[float]],
+              stream: bool = False) -> requests.Response:
+        """
+        Send one GET, hedged with a duplicate if it is slower than usual
+        Args:
+            url (str): Page URL
+            timeout: Connect and read timeouts
+            stream (bool): Don't read the body yet
+        Returns:
+            requests.Response: The first response to arrive (of any status)
+        """
+        hedge_after = self.latencies.percentile(HEDGE_PERCENTILE) if self.hedge else None
+        if hedge_after is None:
+            return self.session.get(url, timeout=timeout, stream=stream)
+        
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedge')
+        first = self._hedge_pool.submit(self.session.get, url, timeout=timeout, stream=stream)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+        
+        self.hedged += 1
+        second = self._hedge_pool.submit(self.session.get, url, timeout=timeout, stream=stream)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        loser = second if winner is first else first
+        if winner.exception() is not None:
+            # The other request may still succeed
+            winner, loser = loser, winner
+        # The slower request can't be cancelled once sent; release its connection when it lands
+        loser.add_done_callback(_close_response)
+        if winner is second:
+            self.hedge_wins += 1
+        return winner.result()
+    
+    def latency_stats(self) -> Dict:
+        """
+        Recent response times and hedging counts
+        Returns:
+            Dict: p50 and p95 response times in seconds (None until enough requests),
+                hedged requests sent and how many of them answered first
+        """
+        return {
+            'p50': self.latencies.percentile(50),
+            'p95': self.latencies.percentile(95),
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+        }
+    
+    def _deadline_at(self) -> Optional[float]:
+        """time.monotonic() value at which a listing starting now runs out of time"""
+        self.deadline_reached = False
+        return time.monotonic() + self.deadline if self.deadline else None
+    
+    def _pause(self):
+        """Respectful delay between requests, unless the adaptive controller or a rate limiter paces them"""
+        if self.rate_controller is None and self.rate_limiter is None:
+            time.sleep(self.delay)
+    
+    def rate_stats(self) -> Dict:
+        """
+        State of the adaptive rate controller
+        Returns:
+            Dict: Current requests per second, healthy responses and back-offs (empty without adaptive_rate)
+        """
+        if self.rate_controller is None:
+            return {}
+        return self.rate_controller.stats()
+    
     def search_products(self, query: str, max_pages: int = 5) -> List[Product]:
         """
         Search for products on Tesco website
@@ -64,35 +454,7 @@ class TescoScraper:
         Returns:
             List[Product]: List of scraped products
         """
-        products = []
-        
-        for page in range(1, max_pages + 1):
-            logger.info(f"Scraping page {page} for query: {query}")
-            
-            # Construct search URL
-            search_url = f"{self.base_url}/groceries/en-GB/search?query={quote(query)}&page={page}"
-            
-            try:
-                response = self.session.get(search_url)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                page_products = self._parse_product_listing(soup)
-                
-                if not page_products:
-                    logger.info(f"No more products found on page {page}")
-                    break
-                    
-                products.extend(page_products)
-                
-                # Respectful delay
-                time.sleep(self.delay)
-                
-            except requests.RequestException as e:
-                logger.error(f"Error fetching page {page}: {e}")
-                break
-                
-        return products
+        return list(self.iter_search_products(query, max_pages))
     
     def scrape_category(self, category_url: str, max_pages: int = 5) -> List[Product]:
         """
@@ -103,61 +465,352 @@ class TescoScraper:
         Returns:
             List[Product]: List of scraped products
         """
-        products = []
+        return list(self.iter_category(category_url, max_pages))
+    
+    def iter_search_products(self, query: str, max_pages: int = 5) -> Iterator[Product]:
+        """
+        Search for products, yielding them as each page is scraped
+        Args:
+            query (str): Search term
+            max_pages (int): Maximum number of pages to scrape
+        Yields:
+            Product: Scraped products in page order
+        """
+        if self.stream_parse:
+            for _, product in self._iter_streamed_products(lambda page: self._search_url(query, page), max_pages,
+                                                           f"for query: {query}"):
+                yield product
+            return
+        for page_products in self.iter_search_pages(query, max_pages):
+            yield from page_products
+    
+    def iter_search_pages(self, query: str, max_pages: int = 5) -> Iterator[List[Product]]:
+        """
+        Search for products, yielding the products of each page as it is scraped
+        Args:
+            query (str): Search term
+            max_pages (int): Maximum number of pages to scrape
+        Yields:
+            List[Product]: Products of each page, in page order
+        """
+        return self._iter_listing_pages(lambda page: self._search_url(query, page), max_pages, f"for query: {query}")
+    
+    def iter_category(self, category_url: str, max_pages: int = 5) -> Iterator[Product]:
+        """
+        Scrape a category, yielding products as each page is scraped
+        Args:
+            category_url (str): URL of the category page
+            max_pages (int): Maximum number of pages to scrape
+        Yields:
+            Product: Scraped products in page order
+        """
+        url_for_page = lambda page: self._category_page_url(category_url, page)
+        label = f"of category: {category_url}"
+        if self.stream_parse:
+            for _, product in self._iter_streamed_products(url_for_page, max_pages, label):
+                yield product
+            return
+        for page_products in self._iter_listing_pages(url_for_page, max_pages, label):
+            yield from page_products
+    
+    def _iter_listing_pages(self, url_for_page: Callable[[int], str], max_pages: int,
+                            label: str, deadline: Optional[float] = None,
+                            partial: bool = True) -> Iterator[List[Product]]:
+        """
+        Fetch listing pages one at a time until one is empty or fails
+        Args:
+            url_for_page: Function building the URL of a page number
+            max_pages (int): Maximum number of pages to scrape
+            label (str): Description of the listing for log messages
+            deadline (float): time.monotonic() value by which the listing must finish (with partial=False)
+            partial (bool): Give the listing the scraper's own deadline and end it early when that
+                runs out, setting deadline_reached (True), or keep to `deadline` and raise
+                DeadlineExceeded, leaving deadline_reached alone (False)
+        Yields:
+            List[Product]: Products of each page
+        """
+        if self.stream_parse:
+            for _, page_products in groupby(self._iter_streamed_products(url_for_page, max_pages, label, deadline, partial),
+                                            key=itemgetter(0)):
+                yield [product for _, product in page_products]
+            return
+        if self.parse_workers:
+            yield from self._iter_listing_pages_pipelined(url_for_page, max_pages, label, deadline, partial)
+            return
         
+        if partial:
+            deadline = self._deadline_at()
+        unchanged_run = 0
         for page in range(1, max_pages + 1):
-            logger.info(f"Scraping category page {page}")
+            logger.info(f"Scraping page {page} {label}")
             
-            # Add page parameter to URL
-            page_url = f"{category_url}?page={page}"
+            url = url_for_page(page)
+            try:
+                response = self._get(url, deadline=deadline)
+            except DeadlineExceeded:
+                if not partial:
+                    raise
+                logger.warning(f"Deadline reached before page {page} {label}, returning partial results")
+                self.deadline_reached = True
+                break
+            except requests.RequestException as e:
+                logger.error(f"Error fetching page {page}: {e}")
+                break
             
+            page_products, unchanged = self._listing_products(url, response.content)
+            
+            if not page_products:
+                logger.info(f"No more products found on page {page}")
+                break
+            
+            yield page_products
+            
+            unchanged_run = unchanged_run + 1 if unchanged else 0
+            if self.stop_after_unchanged and unchanged_run >= self.stop_after_unchanged:
+                yield from self._stored_pages(url_for_page, page + 1, max_pages)
+                return
+            
+            # Respectful delay
+            self._pause()
+    
+    def _iter_streamed_products(self, url_for_page: Callable[[int], str], max_pages: int,
+                                label: str, deadline: Optional[float] = None,
+                                partial: bool = True) -> Iterator[Tuple[int, Product]]:
+        """
+        Fetch listing pages one at a time, parsing each while it downloads
+        Args:
+            url_for_page: Function building the URL of a page number
+            max_pages (int): Maximum number of pages to scrape
+            label (str): Description of the listing for log messages
+            deadline (float), partial (bool): As for _iter_listing_pages
+        Yields:
+            Tuple[int, Product]: Page number and product, as soon as the product's tile has arrived
+        """
+        if partial:
+            deadline = self._deadline_at()
+        for page in range(1, max_pages + 1):
+            logger.info(f"Scraping page {page} {label}")
+            
+            found = 0
             try:
-                response = self.session.get(page_url)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                page_products = self._parse_product_listing(soup)
-                
+                with self._get(url_for_page(page), deadline=deadline, stream=True) as response:
+                    for product in self._stream_products(response):
+                        found += 1
+                        yield page, product
+            except DeadlineExceeded:
+                if not partial:
+                    raise
+                logger.warning(f"Deadline reached before page {page} {label}, returning partial results")
+                self.deadline_reached = True
+                break
+            except requests.RequestException as e:
+                logger.error(f"Error fetching page {page}: {e}")
+                break
+            
+            if not found:
+                logger.info(f"No more products found on page {page}")
+                break
+            
+            # Respectful delay
+            self._pause()
+    
+    def _stream_products(self, response: requests.Response) -> Iterator[Product]:
+        """Parse a streamed listing response, yielding each product once its tile is complete"""
+        # Without a declared charset requests assumes ISO-8859-1; the pages are UTF-8
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+        stream = TileStream(PRODUCT_TILE_SELECTORS, self._extract_product_data, encoding)
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            yield from stream.feed(chunk)
+        yield from stream.close()
+    
+    def _listing_products(self, url: str, content: bytes) -> Tuple[List[Product], bool]:
+        """
+        Parse a listing page, or reuse its products from the page index if it is unchanged
+        Returns:
+            Tuple: The page's products, and whether the page index already had them
+        """
+        if self.page_index is None:
+            return self._parse_listing_html(content), False
+        content_hash = page_hash(content, self.embedded_state)
+        rows = self.page_index.lookup(url, content_hash)
+        if rows is not None:
+            return [Product(**row) for row in rows], True
+        page_products = self._parse_listing_html(content)
+        self.page_index.put(url, content_hash, [product_to_dict(product) for product in page_products])
+        return page_products, False
+    
+    def _stored_pages(self, url_for_page: Callable[[int], str], first_page: int,
+                      max_pages: int) -> Iterator[List[Product]]:
+        """Yield the products the last run stored for the remaining pages, without fetching them"""
+        logger.info(f"{self.stop_after_unchanged} unchanged pages in a row, reusing pages "
+                    f"{first_page}+ from the last run")
+        for page in range(first_page, max_pages + 1):
+            rows = self.page_index.stored(url_for_page(page))
+            if not rows:
+                return
+            yield [Product(**row) for row in rows]
+    
+    def _iter_listing_pages_pipelined(self, url_for_page: Callable[[int], str], max_pages: int,
+                                      label: str, deadline: Optional[float] = None,
+                                      partial: bool = True) -> Iterator[List[Product]]:
+        """
+        Fetch listing pages while earlier pages are parsed in worker processes
+        Args:
+            url_for_page: Function building the URL of a page number
+            max_pages (int): Maximum number of pages to scrape
+            label (str): Description of the listing for log messages
+            deadline (float), partial (bool): As for _iter_listing_pages
+        Yields:
+            List[Product]: Products of each page, in page order
+        """
+        pool = self.parse_pool()
+        # Bound the pages held in memory while parses are outstanding
+        max_pending = self.parse_workers * 2
+        pending = deque()
+        
+        def finished_pages(block_for: int) -> Iterator[Optional[List[Product]]]:
+            # Yield parsed pages in order: the first `block_for` even if still parsing, then any already done
+            while pending and (block_for > 0 or pending[0][1].done()):
+                block_for -= 1
+                page, future, url, content_hash = pending.popleft()
+                page_products = future.result()
+                if content_hash is not None:
+                    self.page_index.put(url, content_hash, [product_to_dict(product) for product in page_products])
                 if not page_products:
+                    logger.info(f"No more products found on page {page}")
+                    yield None
+                    return
+                yield page_products
+        
+        if partial:
+            deadline = self._deadline_at()
+        unchanged_run = 0
+        reuse_from = None
+        try:
+            for page in range(1, max_pages + 1):
+                logger.info(f"Scraping page {page} {label}")
+                
+                url = url_for_page(page)
+                try:
+                    response = self._get(url, deadline=deadline)
+                except DeadlineExceeded:
+                    if not partial:
+                        raise
+                    logger.warning(f"Deadline reached before page {page} {label}, returning partial results")
+                    self.deadline_reached = True
+                    break
+                except requests.RequestException as e:
+                    logger.error(f"Error fetching page {page}: {e}")
                     break
-                    
-                products.extend(page_products)
-                time.sleep(self.delay)
                 
-            except requests.RequestException as e:
-                logger.error(f"Error fetching category page {page}: {e}")
-                break
+                # Unchanged pages skip the workers and reuse their stored products
+                content_hash = page_hash(response.content, self.embedded_state) if self.page_index is not None else None
+                rows = self.page_index.lookup(url, content_hash) if content_hash is not None else None
+                if rows is not None:
+                    future = Future()
+                    future.set_result([Product(**row) for row in rows])
+                    pending.append((page, future, url, None))
+                else:
+                    future = pool.submit(_parse_listing_in_worker, response.content)
+                    pending.append((page, future, url, content_hash))
                 
-        return products
+                for page_products in finished_pages(block_for=len(pending) - max_pending + 1):
+                    if page_products is None:
+                        return
+                    yield page_products
+                
+                unchanged_run = unchanged_run + 1 if rows is not None else 0
+                if self.stop_after_unchanged and unchanged_run >= self.stop_after_unchanged:
+                    reuse_from = page + 1
+                    break
+                
+                # Respectful delay
+                self._pause()
+            
+            for page_products in finished_pages(block_for=len(pending)):
+                if page_products is None:
+                    return
+                yield page_products
+            
+            if reuse_from is not None:
+                yield from self._stored_pages(url_for_page, reuse_from, max_pages)
+        finally:
+            for _, future, _, _ in pending:
+                future.cancel()
+    
+    def parse_pool(self) -> ProcessPoolExecutor:
+        """Return the process pool used for parsing in pipeline mode, starting it on first use"""
+        if self._parse_pool is None:
+            if self.parser.name not in PARSER_BACKENDS:
+                raise ValueError("Pipeline mode needs a built-in parser backend selected by name")
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=max(1, self.parse_workers),
+                initializer=_init_parse_worker,
+                initargs=(self.parser.name, self.adaptive_selectors, self.base_url, self.embedded_state)
+            )
+        return self._parse_pool
+    
+    def close(self):
+        """Shut down the parse worker processes and hedging threads and close the HTTP session"""
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(cancel_futures=True)
+            self._parse_pool = None
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+        self.session.close()
+    
+    def __enter__(self):
+        return self
     
-    def _parse_product_listing(self, soup: BeautifulSoup) -> List[Product]:
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _search_url(self, query: str, page: int) -> str:
+        """Build the search results URL for a query and page number"""
+        return f"{self.base_url}/groceries/en-GB/search?query={quote(query)}&page={page}"
+    
+    def _category_page_url(self, category_url: str, page: int) -> str:
+        """Build the URL for a page of a category listing"""
+        return f"{category_url}?page={page}"
+    
+    def _parse_listing_html(self, content: bytes) -> List[Product]:
+        """
+        Parse raw listing page HTML into products
+        Args:
+            content (bytes): Response body of a listing page
+        Returns:
+            List[Product]: List of parsed products
+        """
+        if self.embedded_state:
+            rows = embedded_products(content, self.base_url)
+            if rows is not None:
+                return [Product(**row) for row in rows]
+        
+        plan = None
+        if self.selector_plans is not None:
+            plan = self.selector_plans.plan_for(self.selector_plans.fingerprint(content))
+        root = self.parser.parse(content)
+        return self._parse_product_listing(root, plan)
+    
+    def _parse_product_listing(self, root, plan: Optional[Dict[str, str]] = None) -> List[Product]:
         """
         Parse product information from a listing page
         Args:
-            soup (BeautifulSoup): Parsed HTML content
+            root: Page parsed by the scraper's parser backend
+            plan (Dict[str, str]): Cached winning selectors for this page layout
         Returns:
             List[Product]: List of parsed products
         """
         products = []
         
-        # Common selectors for Tesco product tiles (these may need updating)
-        product_selectors = [
-            '.product-tile',
-            '[data-auto="product-tile"]',
-            '.product-list--list-item',
-            '.beans-tile'
-        ]
-        
-        product_elements = []
-        for selector in product_selectors:
-            elements = soup.select(selector)
-            if elements:
-                product_elements = elements
-                break
+        product_elements = self._find_by_selectors(
+            plan, 'tile', PRODUCT_TILE_SELECTORS, lambda selector: self.parser.select(root, selector)
+        ) or []
         
         for element in product_elements:
             try:
-                product = self._extract_product_data(element)
+                product = self._extract_product_data(element, plan)
                 if product:
                     products.append(product)
             except Exception as e:
@@ -166,85 +819,44 @@ class TescoScraper:
                 
         return products
     
-    def _extract_product_data(self, element) -> Optional[Product]:
+    def _extract_product_data(self, element, plan: Optional[Dict[str, str]] = None) -> Optional[Product]:
         """
         Extract product data from a single product element
         Args:
-            element: BeautifulSoup element containing product data
+            element: Parsed element containing product data
+            plan (Dict[str, str]): Cached winning selectors for this page layout
         Returns:
             Optional[Product]: Parsed product or None if parsing fails
         """
         try:
-            # Extract product name
-            name_selectors = [
-                '.product-tile--title',
-                '[data-auto="product-tile-title"]',
-                '.product-details--content h3',
-                'h3 a'
-            ]
-            name = self._get_text_by_selectors(element, name_selectors)
+            name = self._get_text_by_selectors(element, PRODUCT_FIELD_SELECTORS['name'], plan, 'name')
             
             if not name:
                 return None
             
-            # Extract price
-            price_selectors = [
-                '.product-tile--price',
-                '[data-auto="price-current"]',
-                '.price-current',
-                '.beans-price__text'
-            ]
-            price = self._get_text_by_selectors(element, price_selectors)
-            
-            # Extract price per unit
-            unit_price_selectors = [
-                '.product-tile--price-per-unit',
-                '[data-auto="price-per-quantity-weight"]',
-                '.price-per-unit'
-            ]
-            price_per_unit = self._get_text_by_selectors(element, unit_price_selectors)
+            price = self._get_text_by_selectors(element, PRODUCT_FIELD_SELECTORS['price'], plan, 'price')
+            price_per_unit = self._get_text_by_selectors(
+                element, PRODUCT_FIELD_SELECTORS['price_per_unit'], plan, 'price_per_unit'
+            )
             
             # Extract product URL
-            link_selectors = [
-                'a[href*="/groceries/"]',
-                '.product-tile--title a',
-                'h3 a'
-            ]
-            product_link = None
-            for selector in link_selectors:
-                link_element = element.select_one(selector)
-                if link_element and link_element.get('href'):
-                    product_link = urljoin(self.base_url, link_element.get('href'))
-                    break
+            product_link = self._get_attr_by_selectors(
+                element, PRODUCT_FIELD_SELECTORS['product_url'], 'href', plan, 'product_url'
+            )
+            if product_link:
+                product_link = urljoin(self.base_url, product_link)
             
             # Extract image URL
-            img_selectors = [
-                '.product-tile--image img',
-                'img[src*="digitalcontent"]',
-                '.product-image img'
-            ]
-            image_url = None
-            for selector in img_selectors:
-                img_element = element.select_one(selector)
-                if img_element and img_element.get('src'):
-                    image_url = img_element.get('src')
-                    break
+            image_url = self._get_attr_by_selectors(
+                element, PRODUCT_FIELD_SELECTORS['image_url'], 'src', plan, 'image_url'
+            )
             
-            # Extract availability
-            availability_selectors = [
-                '.product-tile--availability',
-                '[data-auto="availability"]',
-                '.availability-text'
-            ]
-            availability = self._get_text_by_selectors(element, availability_selectors) or "Available"
+            availability = self._get_text_by_selectors(
+                element, PRODUCT_FIELD_SELECTORS['availability'], plan, 'availability'
+            ) or "Available"
             
             # Extract brand (if available)
-            brand_selectors = [
-                '.product-tile--brand',
-                '[data-auto="brand"]',
-                '.brand-name'
-            ]
-            brand = self._get_text_by_selectors(element, brand_selectors)
+            brand = self._get_text_by_selectors(element, PRODUCT_FIELD_SELECTORS['brand'], plan, 'brand')
             
             return Product(
                 name=name.strip(),
@@ -263,23 +875,77 @@ class TescoScraper:
             logger.warning(f"Error extracting product data: {e}")
             return None
     
-    def _get_text_by_selectors(self, element, selectors: List[str]) -> Optional[str]:
+    def _find_by_selectors(self, plan: Optional[Dict[str, str]], field: Optional[str],
+                           selectors: List[str], probe):
         """
-        Try multiple CSS selectors to find text content
+        Return the first truthy result of `probe` over a selector fallback chain
         Args:
-            element: BeautifulSoup element to search in
+            plan (Dict[str, str]): Cached winning selectors, or None to walk the chain in order
+            field (str): Name of the chain in the plan
             selectors: List of CSS selectors to try
+            probe: Function returning the value found with a selector, or a falsy value
         Returns:
-            Optional[str]: Found text or None
+            The value found, or None
         """
+        if plan is not None and field is not None:
+            return self.selector_plans.find(plan, field, selectors, probe)
         for selector in selectors:
-            found_element = element.select_one(selector)
-            if found_element:
-                text = found_element.get_text(strip=True)
-                if text:
-                    return text
+            result = probe(selector)
+            if result:
+                return result
         return None
     
+    def _get_text_by_selectors(self, element, selectors: List[str], plan: Optional[Dict[str, str]] = None,
+                               field: Optional[str] = None) -> Optional[str]:
+        """
+        Try multiple CSS selectors to find text content
+        Args:
+            element: Parsed element to search in
+            selectors: List of CSS selectors to try
+            plan (Dict[str, str]): Cached winning selectors for this page layout
+            field (str): Name of the field in the plan
+        Returns:
+            Optional[str]: Found text or None
+        """
+        def probe(selector):
+            found_element = self.parser.select_one(element, selector)
+            if found_element is not None:
+                return self.parser.text(found_element)
+            return None
+        
+        return self._find_by_selectors(plan, field, selectors, probe)
+    
+    def _get_attr_by_selectors(self, element, selectors: List[str], attr: str,
+                               plan: Optional[Dict[str, str]] = None, field: Optional[str] = None) -> Optional[str]:
+        """
+        Try multiple CSS selectors to find an attribute value
+        Args:
+            element: Parsed element to search in
+            selectors: List of CSS selectors to try
+            attr (str): Attribute to read from the matched element
+            plan (Dict[str, str]): Cached winning selectors for this page layout
+            field (str): Name of the field in the plan
+        Returns:
+            Optional[str]: Found attribute value or None
+        """
+        def probe(selector):
+            found_element = self.parser.select_one(element, selector)
+            if found_element is not None:
+                return self.parser.attr(found_element, attr)
+            return None
+        
+        return self._find_by_selectors(plan, field, selectors, probe)
+    
+    def selector_stats(self) -> Dict:
+        """
+        Hit and miss counters for the adaptive selector plans
+        Returns:
+            Dict: Per-field hits and misses; a rising miss rate means the cached plan is stale
+        """
+        if self.selector_plans is None:
+            return {}
+        return self.selector_plans.stats()
+    
     def get_product_details(self, product_url: str) -> Dict:
         """
         Get detailed information for a specific product
@@ -289,43 +955,150 @@ class TescoScraper:
             Dict: Detailed product information
         """
         try:
-            response = self.session.get(product_url)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract detailed information
-            details = {
-                'description': self._get_text_by_selectors(soup, ['.product-description', '.product-details']),
-                'ingredients': self._get_text_by_selectors(soup, ['.ingredients', '.product-ingredients']),
-                'nutrition': self._extract_nutrition_info(soup),
-                'reviews': self._extract_review_info(soup)
-            }
-            
-            time.sleep(self.delay)
-            return details
-            
+            details, contacted_site = self._fetch_product_details(product_url)
         except requests.RequestException as e:
             logger.error(f"Error fetching product details: {e}")
             return {}
+        
+        # Respectful delay, unless the cache answered without contacting the site
+        if contacted_site:
+            self._pause()
+        return details
+    
+    def get_product_details_many(self, products_or_urls: Iterable[Union[Product, str]], max_workers: int = 8,
+                                 rate: Optional[float] = None,
+                                 limiter: Optional[HostRateLimiter] = None) -> Dict[str, Dict]:
+        """
+        Get detailed information for many products concurrently
+        Args:
+            products_or_urls: Product objects and/or product page URLs; duplicate URLs are fetched once
+            max_workers (int): Maximum number of product pages fetched at once
+            rate (float): Requests per second shared by all workers (defaults to one
+                request every `delay` seconds, the same pace as sequential fetching)
+            limiter (HostRateLimiter): Limiter to share with other fetches (defaults to
+                the scraper's rate_limiter, or a new one at `rate`)
+        Returns:
+            Dict[str, Dict]: Details for each URL that was fetched successfully
+        
+        Product objects are updated in place with the description, rating and review
+        count found on their page.
+        """
+        products_by_url: Dict[str, List[Product]] = {}
+        for item in products_or_urls:
+            url = item.product_url if isinstance(item, Product) else item
+            if not url:
+                continue
+            targets = products_by_url.setdefault(url, [])
+            if isinstance(item, Product):
+                targets.append(item)
+        
+        if not products_by_url:
+            return {}
+        
+        max_workers = max(1, min(max_workers, len(products_by_url)))
+        if rate is None:
+            rate = 1 / self.delay if self.delay else None
+        if self.rate_controller is not None:
+            # _get paces every request through the adaptive controller
+            limiter = None
+        else:
+            limiter = limiter or self.rate_limiter
+            if limiter is None and rate:
+                limiter = HostRateLimiter(rate)
+        if self._pool_size < max_workers:
+            self._mount_adapter(pool_size=max_workers)
+        
+        def fetch(url: str) -> Dict:
+            # _get already waits for the scraper's own rate_limiter
+            if limiter is not None and limiter is not self.rate_limiter:
+                limiter.acquire(url)
+            return self._fetch_product_details(url)[0]
+        
+        logger.info(f"Fetching details for {len(products_by_url)} products with {max_workers} workers")
+        results: Dict[str, Dict] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch, url): url for url in products_by_url}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                try:
+                    details = future.result()
+                except requests.RequestException as e:
+                    logger.error(f"Error fetching product details for {url}: {e}")
+                    continue
+                
+                results[url] = details
+                reviews = details.get('reviews') or {}
+                for product in products_by_url[url]:
+                    product.description = details.get('description')
+                    product.rating = reviews.get('rating')
+                    product.review_count = reviews.get('review_count')
+                
+                if done % 50 == 0:
+                    logger.info(f"Fetched details for {done}/{len(futures)} products")
+        
+        return results
+    
+    def _fetch_product_details(self, product_url: str) -> Tuple[Dict, bool]:
+        """
+        Fetch and parse a product page without any politeness delay
+        Args:
+            product_url (str): URL of the product page
+        Returns:
+            Tuple[Dict, bool]: Detailed product information, and whether the site was contacted
+        Raises:
+            requests.RequestException: If the page could not be fetched
+        """
+        response = self._get(product_url)
+        contacted_site = not (getattr(response, 'from_cache', False) and not response.revalidated)
+        
+        # An unchanged page (e.g. a 304) reuses the details parsed last time
+        body_hash = getattr(response, 'body_hash', None)
+        if self.http_cache is not None and body_hash:
+            details = self.http_cache.get_parsed(body_hash, 'details')
+            if details is not None:
+                return details, contacted_site
+        
+        details = self._parse_product_details(response.content)
+        
+        if self.http_cache is not None and body_hash:
+            self.http_cache.put_parsed(body_hash, 'details', details)
+        return details, contacted_site
     
-    def _extract_nutrition_info(self, soup: BeautifulSoup) -> Dict:
+    def _parse_product_details(self, content: bytes) -> Dict:
+        """
+        Parse a product page into its details
+        Args:
+            content (bytes): Response body of a product page
+        Returns:
+            Dict: Detailed product information
+        """
+        root = self.parser.parse(content)
+        
+        # Extract detailed information
+        return {
+            'description': self._get_text_by_selectors(root, ['.product-description', '.product-details']),
+            'ingredients': self._get_text_by_selectors(root, ['.ingredients', '.product-ingredients']),
+            'nutrition': self._extract_nutrition_info(root),
+            'reviews': self._extract_review_info(root)
+        }
+    
+    def _extract_nutrition_info(self, root) -> Dict:
         """Extract nutrition information if available"""
         nutrition = {}
-        nutrition_table = soup.select_one('.nutrition-table, .nutritional-information')
+        nutrition_table = self.parser.select_one(root, '.nutrition-table, .nutritional-information')
         
-        if nutrition_table:
-            rows = nutrition_table.select('tr')
+        if nutrition_table is not None:
+            rows = self.parser.select(nutrition_table, 'tr')
             for row in rows:
-                cells = row.select('td, th')
+                cells = self.parser.select(row, 'td, th')
                 if len(cells) >= 2:
-                    key = cells[0].get_text(strip=True)
-                    value = cells[1].get_text(strip=True)
+                    key = self.parser.text(cells[0])
+                    value = self.parser.text(cells[1])
                     nutrition[key] = value
                     
         return nutrition
     
-    def _extract_review_info(self, soup: BeautifulSoup) -> Dict:
+    def _extract_review_info(self, root) -> Dict:
         """Extract review information if available"""
         reviews = {
             'rating': None,
@@ -333,17 +1106,17 @@ class TescoScraper:
         }
         
         # Try to find rating
-        rating_element = soup.select_one('[data-rating], .star-rating, .rating-value')
-        if rating_element:
-            rating_text = rating_element.get_text(strip=True)
+        rating_element = self.parser.select_one(root, '[data-rating], .star-rating, .rating-value')
+        if rating_element is not None:
+            rating_text = self.parser.text(rating_element)
             rating_match = re.search(r'(\d+\.?\d*)', rating_text)
             if rating_match:
                 reviews['rating'] = float(rating_match.group(1))
         
         # Try to find review count
-        review_count_element = soup.select_one('.review-count, [data-review-count]')
-        if review_count_element:
-            count_text = review_count_element.get_text(strip=True)
+        review_count_element = self.parser.select_one(root, '.review-count, [data-review-count]')
+        if review_count_element is not None:
+            count_text = self.parser.text(review_count_element)
             count_match = re.search(r'(\d+)', count_text)
             if count_match:
                 reviews['review_count'] = int(count_match.group(1))
@@ -362,21 +1135,7 @@ class TescoScraper:
             return
         
         # Convert products to dictionaries
-        product_dicts = []
-        for product in products:
-            product_dict = {
-                'name': product.name,
-                'price': product.price,
-                'price_per_unit': product.price_per_unit,
-                'image_url': product.image_url,
-                'product_url': product.product_url,
-                'availability': product.availability,
-                'rating': product.rating,
-                'review_count': product.review_count,
-                'description': product.description,
-                'brand': product.brand
-            }
-            product_dicts.append(product_dict)
+        product_dicts = [product_to_dict(product) for product in products]
         
         # Create DataFrame and save to CSV
         df = pd.DataFrame(product_dicts)
@@ -395,27 +1154,62 @@ class TescoScraper:
             return
         
         # Convert products to dictionaries
-        product_dicts = []
-        for product in products:
-            product_dict = {
-                'name': product.name,
-                'price': product.price,
-                'price_per_unit': product.price_per_unit,
-                'image_url': product.image_url,
-                'product_url': product.product_url,
-                'availability': product.availability,
-                'rating': product.rating,
-                'review_count': product.review_count,
-                'description': product.description,
-                'brand': product.brand
-            }
-            product_dicts.append(product_dict)
+        product_dicts = [product_to_dict(product) for product in products]
         
         # Save to JSON
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(product_dicts, f, indent=2, ensure_ascii=False)
         
         logger.info(f"Saved {len(products)} products to {filename}")
+    
+    def save_to_parquet(self, products: Iterable[Product], filename: str, compression: str = 'zstd'):
+        """
+        Save products to a Parquet file with typed, compressed columns (needs pyarrow)
+        Args:
+            products (List[Product]): Products to save; an iterator is written row group by row group
+            filename (str): Output filename
+            compression (str): Column compression codec
+        """
+        from columnar import write_parquet
+        write_parquet(products, filename, compression=compression)
+    
+    def save_to_arrow(self, products: Iterable[Product], filename: str, compression: str = 'zstd'):
+        """
+        Save products to an Arrow IPC (Feather v2) file (needs pyarrow)
+        Args:
+            products (List[Product]): Products to save; an iterator is written batch by batch
+            filename (str): Output filename
+            compression (str): Column compression codec
+        """
+        from columnar import write_arrow
+        write_arrow(products, filename, compression=compression)
+    
+    def save_to_catalogue(self, products: Iterable[Product],
+                          catalogue='.tesco_cache/catalogue.sqlite') -> Dict[str, int]:
+        """
+        Upsert products into the persistent catalogue, recording price changes
+        Args:
+            products (List[Product]): Products to store; an iterator is written batch by batch
+            catalogue: Catalogue instance, or the path of its SQLite file
+        Returns:
+            Dict[str, int]: Counts of inserted, updated and unchanged products
+        """
+        from catalogue import Catalogue
+        if isinstance(catalogue, Catalogue):
+            return catalogue.upsert(products)
+        with Catalogue(catalogue) as store:
+            return store.upsert(products)
+    
+    def index_products(self, products: Iterable[Product]):
+        """
+        Build an in-memory index for fast filtered and sorted lookups
+        Args:
+            products (List[Product]): Scraped products
+        Returns:
+            ProductIndex: Index answering text, price, unit price and facet queries
+        """
+        from product_index import ProductIndex
+        return ProductIndex(products)
 
 
 def main():
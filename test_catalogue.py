@@ -0,0 +1,60 @@
+"""
+Tests for the persistent product catalogue
+"""
+
+import pytest
+
+from catalogue import Catalogue, product_id
+from tesco_scraper import Product
+
+
+def make_product(index, price='£1.00', availability='Available', rating=None):
+    return Product(name=f'Milk {index}', price=price, price_per_unit=None, image_url=None,
+                   product_url=f'https://www.tesco.com/groceries/en-GB/products/{100 + index}',
+                   availability=availability, rating=rating, review_count=None, description=None, brand='Tesco')
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    with Catalogue(str(tmp_path / 'catalogue.sqlite'), batch_size=2) as store:
+        yield store
+
+
+def test_product_id():
+    assert product_id('https://www.tesco.com/groceries/en-GB/products/254656543?x=1') == '254656543'
+    assert product_id('https://example.com/milk') == 'https://example.com/milk'
+    assert product_id(None) is None
+
+
+def test_only_changes_are_written(catalogue):
+    first = catalogue.upsert((make_product(index) for index in range(5)), observed_at=1000)
+    assert (first['inserted'], first['price_changes']) == (5, 5)
+
+    products = [make_product(index) for index in range(5)]
+    products[1] = make_product(1, price='£0.85')
+    products[2] = make_product(2, rating=4.5)
+    second = catalogue.upsert(products + [make_product(9, price=None)], observed_at=2000)
+    assert second == {'inserted': 1, 'updated': 2, 'unchanged': 3, 'skipped': 0, 'price_changes': 2}
+
+    assert [row['price_pence'] for row in catalogue.price_history('101')] == [100, 85]
+    assert catalogue.get(products[1].product_url).price == '£0.85'
+    assert len(catalogue) == 6
+
+
+def test_listing_crawl_keeps_enriched_details(catalogue):
+    catalogue.upsert([make_product(0, rating=4.5)], observed_at=1000)
+    counts = catalogue.upsert([make_product(0)], observed_at=2000)
+    assert counts['unchanged'] == 1
+    assert catalogue.get('100').rating == 4.5
+
+
+def test_changes_since_pairs_new_and_previous_prices(catalogue):
+    catalogue.upsert([make_product(0), make_product(1)], observed_at=1000)
+    catalogue.upsert([make_product(0, price='£1.20'), make_product(1, availability='Out of stock')], observed_at=2000)
+
+    changes = catalogue.changes_since(1500)
+    assert [(row['product_id'], row['previous_price_pence'], row['price_pence']) for row in changes] == [
+        ('100', 100, 120), ('101', 100, 100)
+    ]
+    assert changes[1]['previous_availability'] == 'Available'
+    assert changes[1]['availability'] == 'Out of stock'
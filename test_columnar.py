@@ -0,0 +1,57 @@
+"""
+Tests for the Parquet and Arrow exports
+"""
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import pyarrow.parquet as pq
+
+from columnar import read_arrow, read_parquet, read_products, write_parquet
+from tesco_scraper import Product, TescoScraper
+
+PRODUCTS = [
+    Product(name=f'Product {index}', price=f'£{index}.50' if index % 3 else 'N/A', price_per_unit=None,
+            image_url=None, product_url=f'https://www.tesco.com/groceries/en-GB/products/{index}',
+            availability='Available' if index % 2 else 'Out of stock', rating=4.5 if index % 4 else None,
+            review_count=index if index % 5 else None, description=None, brand='Tesco' if index % 6 else None)
+    for index in range(25)
+]
+
+
+@pytest.mark.parametrize('extension', ['parquet', 'arrow'])
+def test_round_trip(tmp_path, extension):
+    filename = str(tmp_path / f'products.{extension}')
+    scraper = TescoScraper(delay=0)
+    getattr(scraper, 'save_to_parquet' if extension == 'parquet' else 'save_to_arrow')(iter(PRODUCTS), filename)
+
+    assert read_products(filename) == PRODUCTS
+
+
+@pytest.mark.parametrize('reader, extension', [(read_parquet, 'parquet'), (read_arrow, 'arrow')])
+def test_typed_columns(tmp_path, reader, extension):
+    filename = str(tmp_path / f'products.{extension}')
+    scraper = TescoScraper(delay=0)
+    if extension == 'parquet':
+        scraper.save_to_parquet(PRODUCTS, filename)
+    else:
+        scraper.save_to_arrow(PRODUCTS, filename)
+
+    df = reader(filename, columns=['price_pence', 'brand'])
+    assert list(df.columns) == ['price_pence', 'brand']
+    assert df['price_pence'].iloc[1] == 150
+    assert df['price_pence'].isna().sum() == 9
+    assert list(df['brand'].cat.categories) == ['Tesco']
+
+
+def test_streams_row_groups(tmp_path):
+    filename = str(tmp_path / 'products.parquet')
+    assert write_parquet(iter(PRODUCTS), filename, row_group_size=10) == 25
+    assert pq.ParquetFile(filename).num_row_groups == 3
+
+
+def test_empty_export_keeps_schema(tmp_path):
+    filename = str(tmp_path / 'products.parquet')
+    write_parquet([], filename)
+    assert list(read_parquet(filename).columns)[-1] == 'price_pence'
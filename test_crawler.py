@@ -0,0 +1,90 @@
+"""
+Tests for the full-catalogue crawler against the local stand-in server
+"""
+
+import time
+
+import pytest
+
+from bench_server import Corpus
+from crawler import CatalogueCrawler, Frontier
+
+
+@pytest.fixture
+def corpus():
+    return Corpus(products=120, tiles_per_page=8)
+
+
+@pytest.fixture
+def make_crawler(make_scraper, tmp_path):
+    def make(delay=0, deadline=None, **kwargs):
+        scraper = make_scraper(delay=delay, deadline=deadline)
+        return CatalogueCrawler(scraper, Frontier(str(tmp_path / 'crawl.sqlite')), **kwargs)
+    return make
+
+
+def test_crawl_discovers_tree_and_scrapes_each_leaf_once(server, make_crawler):
+    scraped = {}
+    stats = make_crawler(max_workers=3).run(
+        on_products=lambda url, products: scraped.setdefault(url.rsplit('/shop/', 1)[1], products)
+    )
+
+    assert sorted(scraped) == sorted(path for path in server.corpus.categories if '/' in path)
+    urls = [product.product_url for products in scraped.values() for product in products]
+    assert len(urls) == len(set(urls)) == 120
+    # Root, 3 departments and 6 aisles
+    assert (stats['done'], stats['failed'], stats['products']) == (10, 0, 120)
+
+
+def test_interrupted_crawl_resumes(make_crawler):
+    calls = []
+
+    def stop_after_two(url, products):
+        calls.append(url)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        make_crawler(max_workers=1).run(on_products=stop_after_two)
+    assert make_crawler().frontier.stats()['done'] == 5
+
+    resumed = []
+    stats = make_crawler().run(on_products=lambda url, products: resumed.append(url))
+    assert len(resumed) == 5
+    assert calls[1] in resumed
+    assert stats['done'] == 10
+
+
+def test_max_depth_scrapes_departments(make_crawler):
+    scraped = []
+    make_crawler(max_depth=1).run(on_products=lambda url, products: scraped.append(len(products)))
+    assert sorted(scraped) == [40, 40, 40]
+
+
+def test_workers_share_the_sequential_pace(server, make_crawler):
+    crawler = make_crawler(delay=0.05, max_workers=3)
+    started = time.monotonic()
+    stats = crawler.run()
+    elapsed = time.monotonic() - started
+
+    assert stats['products'] == 120
+    # One request every delay across all three workers, not one per worker
+    assert elapsed >= (server.requests - 1) * 0.05 * 0.9
+
+
+def test_deadline_leaves_cut_short_categories_pending(make_crawler):
+    crawler = make_crawler(delay=0.02, max_workers=3)
+    stats = crawler.run(deadline=0.2)
+    assert stats['pending'] > 0 and stats['failed'] == 0
+
+    # Categories cut short were not checkpointed with part of their products
+    stats = make_crawler().run()
+    assert (stats['done'], stats['products']) == (10, 120)
+
+
+def test_scraper_listing_deadline_does_not_cut_categories_short(make_crawler):
+    # A per-listing deadline shorter than one category would leave it half scraped
+    crawler = make_crawler(delay=0.05, deadline=0.06, max_workers=3)
+    stats = crawler.run()
+    assert (stats['done'], stats['products']) == (10, 120)
+    assert not crawler.scraper.deadline_reached
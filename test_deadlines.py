@@ -0,0 +1,63 @@
+"""
+Tests for request timeouts, search deadlines and hedged requests
+"""
+
+import io
+import threading
+import time
+
+import requests
+
+from bench_server import Corpus, StandInServer
+from tesco_scraper import TescoScraper
+
+
+def test_stalled_server_times_out():
+    with StandInServer(Corpus(products=40, tiles_per_page=8), latency=2) as server:
+        scraper = TescoScraper(delay=0, timeout=(1, 0.2), max_retries=0)
+        scraper.base_url = server.base_url
+        started = time.monotonic()
+        assert scraper.search_products('milk', max_pages=5) == []
+        assert time.monotonic() - started < 1.5
+
+
+def test_deadline_returns_partial_results():
+    with StandInServer(Corpus(products=240, tiles_per_page=8), latency=0.1) as server:
+        scraper = TescoScraper(delay=0, deadline=0.5)
+        scraper.base_url = server.base_url
+        started = time.monotonic()
+        products = scraper.search_products('milk', max_pages=30)
+        elapsed = time.monotonic() - started
+
+    assert 0 < len(products) < 240
+    assert scraper.deadline_reached
+    assert elapsed < 1.0
+
+
+def test_slow_request_is_hedged():
+    scraper = TescoScraper(delay=0, hedge=True)
+    for _ in range(20):
+        scraper.latencies.record(0.01)
+
+    calls = []
+    lock = threading.Lock()
+
+    def get(url, timeout=None, stream=False):
+        with lock:
+            calls.append(url)
+            first = len(calls) == 1
+        # The first request stalls; the hedge answers straight away
+        time.sleep(1 if first else 0)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'second' if not first else b'first'
+        response.raw = io.BytesIO()
+        return response
+
+    scraper.session.get = get
+    started = time.monotonic()
+    response = scraper._get('http://example.test/page')
+    assert response.content == b'second'
+    assert time.monotonic() - started < 0.5
+    assert scraper.latency_stats()['hedged'] == scraper.latency_stats()['hedge_wins'] == 1
+    scraper.close()
@@ -0,0 +1,54 @@
+"""
+Tests for reading products from the JSON state embedded in listing pages
+"""
+
+from bench_server import Corpus
+from embedded_state import embedded_products, find_state_blob, iter_product_records
+from tesco_scraper import TescoScraper
+
+
+def test_state_products_match_the_html_parse():
+    corpus = Corpus(products=60, tiles_per_page=24)
+    fast = TescoScraper(delay=0, embedded_state=True)
+    # The DOM is never built when the page has state
+    fast.parser.parse = None
+    slow = TescoScraper(delay=0, parser='lxml')
+    for page in (1, 3):
+        content = corpus.listing_page(page)
+        assert fast._parse_listing_html(content) == slow._parse_listing_html(content)
+    assert len(fast._parse_listing_html(corpus.listing_page(1))) == 24
+
+
+def test_pages_without_state_fall_back_to_html():
+    corpus = Corpus(products=30, tiles_per_page=10, embed_state=False)
+    content = corpus.listing_page(1)
+    assert find_state_blob(content) is None
+    scraper = TescoScraper(delay=0, embedded_state=True)
+    assert len(scraper._parse_listing_html(content)) == 10
+
+    # State that is unreadable or holds no products is ignored too
+    broken = content.replace(b'</main>', b'<script type="application/discover+json">{oops</script></main>')
+    assert embedded_products(broken, scraper.base_url) is None
+    assert len(scraper._parse_listing_html(broken)) == 10
+
+
+def test_nested_product_records_are_found_in_order():
+    state = {
+        'props': {'apolloCache': {
+            'ProductType:2': {'__typename': 'ProductType', 'id': '2', 'title': 'Beans', 'price': 0.75,
+                              'unitPrice': 1.76, 'unitOfMeasure': 'kg', 'isForSale': False,
+                              'seller': {'name': 'Tesco', 'price': 0}},
+            'ProductType:1': {'__typename': 'ProductType', 'id': '1', 'title': 'Milk', 'price': {'actual': 1.45}},
+        }},
+        'banners': [{'title': 'Offers'}],
+    }
+    assert [record['title'] for record in iter_product_records(state)] == ['Beans', 'Milk']
+
+    page = b'<html><script id="__NEXT_DATA__" type="application/json">' + \
+        b'{"items": [{"title": "Beans", "price": 0.75, "unitPrice": 1.76, "unitOfMeasure": "kg", ' + \
+        b'"id": 2, "isForSale": false}]}</script></html>'
+    [beans] = embedded_products(page, 'https://www.tesco.com')
+    assert beans['price'] == '£0.75'
+    assert beans['price_per_unit'] == '£1.76/kg'
+    assert beans['product_url'] == 'https://www.tesco.com/groceries/en-GB/products/2'
+    assert beans['availability'] == 'Currently unavailable'
@@ -0,0 +1,72 @@
+"""
+Tests for on-demand exports and their retention
+"""
+
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+from exports import ExportCache, available_encodings, compress, render_export
+
+ROWS = [{'name': 'Milk', 'price': '£1.45'}, {'name': 'Bread, White', 'price': None}]
+
+
+def test_render_export_formats():
+    assert render_export(ROWS, 'csv').decode('utf-8') == 'name,price\nMilk,£1.45\n"Bread, White",\n'
+    assert json.loads(render_export(ROWS, 'json')) == ROWS
+    assert render_export([], 'csv') == b''
+    with pytest.raises(ValueError):
+        render_export(ROWS, 'xml')
+
+
+def test_exports_are_built_once_and_compressed_on_request(tmp_path):
+    cache = ExportCache(str(tmp_path))
+    loads = []
+
+    def load_rows():
+        loads.append(1)
+        return ROWS
+
+    plain = cache.get('milk_0123456789ab.json', load_rows)
+    packed = cache.get('milk_0123456789ab.json', load_rows, 'gzip')
+    assert packed.endswith('.json.gz')
+    with open(plain, 'rb') as f, open(packed, 'rb') as g:
+        assert gzip.decompress(g.read()) == f.read()
+    assert len(loads) == 1
+    assert cache.get('gone_0123456789ab.csv', lambda: None) is None
+
+
+@pytest.mark.skipif('zstd' not in available_encodings(), reason='zstandard not installed')
+def test_zstd_round_trip():
+    import zstandard
+    assert zstandard.ZstdDecompressor().decompress(compress(b'x' * 1000, 'zstd')) == b'x' * 1000
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    cache = ExportCache(str(tmp_path), max_age=3600, max_bytes=250)
+    now = time.time()
+    for index, name in enumerate(['old.csv', 'a.csv', 'b.csv', 'c.csv']):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 100)
+        # a.csv was used least recently; old.csv was created too long ago
+        age = 7200 if name == 'old.csv' else 60
+        os.utime(path, (now - 100 + index, now - age))
+
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == ['b.csv', 'c.csv']
+    assert cache.stats() == {'files': 2, 'bytes': 200}
+
+
+def test_returned_export_is_kept_even_when_over_the_size_limit(tmp_path):
+    cache = ExportCache(str(tmp_path), max_bytes=10)
+    rows = [{'name': 'Milk', 'price': '£1.45'}] * 5
+    path = cache.get('milk.csv', lambda: rows, 'gzip')
+    assert os.listdir(tmp_path) == ['milk.csv.gz']
+
+    # Evicted by another worker: the next request builds it again
+    os.remove(path)
+    assert cache.get('milk.csv', lambda: rows) == cache.path('milk.csv')
+    assert os.path.exists(cache.path('milk.csv'))
@@ -0,0 +1,116 @@
+"""
+Tests for the persistent HTTP cache, against a local stand-in server
+"""
+
+import http.server
+
+import pytest
+
+from http_cache import HTTPCache
+from tesco_scraper import TescoScraper
+
+PRODUCT_PAGE = b"""
+<html><body>
+<div class="product-description">Soft white bread.</div>
+<span class="star-rating">4.5</span>
+</body></html>
+"""
+
+
+class ProductPageHandler(http.server.BaseHTTPRequestHandler):
+    """Serves one product page with an ETag and counts full and conditional responses"""
+
+    counts = {'full': 0, 'not_modified': 0}
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.counts['not_modified'] += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.counts['full'] += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(PRODUCT_PAGE)))
+        self.end_headers()
+        self.wfile.write(PRODUCT_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(serve):
+    ProductPageHandler.counts = {'full': 0, 'not_modified': 0}
+    return serve(ProductPageHandler)
+
+
+def test_revalidates_with_conditional_get(server, tmp_path):
+    scraper = TescoScraper(delay=0, http_cache=str(tmp_path / 'cache.sqlite'))
+
+    first = scraper.get_product_details(f"{server}/groceries/en-GB/products/1")
+    second = scraper.get_product_details(f"{server}/groceries/en-GB/products/1")
+
+    assert first == second
+    assert first['description'] == 'Soft white bread.'
+    assert ProductPageHandler.counts == {'full': 1, 'not_modified': 1}
+
+
+def test_skips_parsing_unchanged_pages(server, tmp_path, monkeypatch):
+    scraper = TescoScraper(delay=0, http_cache=str(tmp_path / 'cache.sqlite'))
+    scraper.get_product_details(f"{server}/groceries/en-GB/products/1")
+
+    def fail(content):
+        raise AssertionError("unchanged page was parsed again")
+
+    monkeypatch.setattr(scraper, '_parse_product_details', fail)
+    assert scraper.get_product_details(f"{server}/groceries/en-GB/products/1")['reviews']['rating'] == 4.5
+
+
+def test_fresh_entries_are_served_without_a_request(server, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache.sqlite'), max_age=60)
+    scraper = TescoScraper(delay=0, http_cache=cache)
+
+    scraper.get_product_details(f"{server}/groceries/en-GB/products/1")
+    scraper.get_product_details(f"{server}/groceries/en-GB/products/1")
+
+    assert ProductPageHandler.counts == {'full': 1, 'not_modified': 0}
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache.sqlite'), max_size=25)
+
+    cache.put('https://example.com/a', 200, {}, b'a' * 10)
+    cache.put('https://example.com/b', 200, {}, b'b' * 10)
+    cache.get('https://example.com/a')
+    cache.put('https://example.com/c', 200, {}, b'c' * 10)
+
+    assert cache.get('https://example.com/a') is not None
+    assert cache.get('https://example.com/b') is None
+    assert cache.get('https://example.com/c') is not None
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache.sqlite'), ttl=-1)
+    cache.put('https://example.com/a', 200, {}, b'body')
+
+    assert cache.get('https://example.com/a') is None
+
+
+def test_replaced_bodies_drop_their_parsed_data(tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache.sqlite'), max_size=25)
+    old = cache.put('https://example.com/a', 200, {}, b'old page')
+    cache.put('https://example.com/b', 200, {}, b'old page')
+    cache.put_parsed(old, 'listing', ['milk'])
+
+    # Still stored under /b, so its parsed data stays
+    cache.put('https://example.com/a', 200, {}, b'new page')
+    assert cache.get_parsed(old, 'listing') == ['milk']
+    cache.put('https://example.com/b', 200, {}, b'new page')
+    assert cache.get_parsed(old, 'listing') is None
+
+    # Replacing entries keeps the size count right, so nothing is evicted early
+    for _ in range(5):
+        cache.put('https://example.com/a', 200, {}, b'x' * 10)
+    assert cache.get('https://example.com/b') is not None
@@ -0,0 +1,93 @@
+"""
+Tests for the shared job store, with two managers standing in for two worker processes
+"""
+
+import threading
+import time
+
+import pytest
+
+from job_store import JobStore, SharedJobManager
+from jobs import Job
+
+
+@pytest.fixture
+def managers(tmp_path):
+    release = threading.Event()
+    runs = []
+
+    def runner(job):
+        runs.append(job.search_term)
+        release.wait(5)
+        job.add_results([{'name': f'{job.search_term} {index}'} for index in range(3)])
+        job.report_progress(80, 'Saving...', page=1)
+        job.update(status=Job.COMPLETED, files={'csv': 'milk.csv'})
+
+    path = str(tmp_path / 'jobs.sqlite')
+    first = SharedJobManager(runner, JobStore(path), max_workers=1)
+    second = SharedJobManager(runner, JobStore(path), max_workers=1)
+    yield first, second, release, runs
+    release.set()
+
+
+def wait_for_status(manager, job_id, status):
+    for _ in range(200):
+        job = manager.get(job_id)
+        if job is not None and job.to_dict(include_results=False)['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} never reached {status}')
+
+
+def test_other_process_sees_progress_and_results(managers):
+    first, second, release, runs = managers
+    job = first.submit('milk', 1)
+    wait_for_status(second, job.id, Job.RUNNING)
+    release.set()
+
+    data = wait_for_status(second, job.id, Job.COMPLETED).to_dict()
+    assert [row['name'] for row in data['results']] == ['milk 0', 'milk 1', 'milk 2']
+    assert data['csv_file'] == 'milk.csv'
+    events = second.get(job.id).wait_for_events(0, timeout=1)
+    assert [event['event'] for event in events] == ['status', 'products', 'progress', 'done']
+    assert second.latest().id == job.id
+
+
+def test_identical_searches_coalesce_across_processes(managers):
+    first, second, release, runs = managers
+    job = first.submit('milk', 1)
+    assert second.submit(' MILK', 1).id == job.id
+    release.set()
+    wait_for_status(first, job.id, Job.COMPLETED)
+
+    assert second.submit('milk', 1).id == job.id
+    assert runs == ['milk']
+    stats = first.stats()
+    assert (stats['coalesced'], stats['cache_hits'], stats['completed']) == (1, 1, 1)
+
+
+def test_stale_jobs_are_failed(managers):
+    first, second, release, runs = managers
+    second.stale_after = 0.05
+    job = first.submit('milk', 1)
+    wait_for_status(first, job.id, Job.RUNNING)
+    time.sleep(0.1)
+
+    # The next submission notices the job stopped reporting and runs the search again
+    retry = second.submit('milk', 1)
+    assert retry.id != job.id
+    assert first.get(job.id).to_dict()['status'] == Job.FAILED
+
+
+def test_jobs_queued_in_a_live_process_are_not_stale(managers):
+    first, second, release, runs = managers
+    first.stale_after = second.stale_after = 0.05
+    running = first.submit('milk', 1)
+    waiting = first.submit('bread', 1)
+    wait_for_status(first, running.id, Job.RUNNING)
+    time.sleep(0.15)
+
+    # The running job stopped reporting, but the queued one is kept alive by its process
+    second.submit('eggs', 1)
+    assert first.get(running.id).to_dict()['status'] == Job.FAILED
+    assert first.get(waiting.id).to_dict()['status'] == Job.QUEUED
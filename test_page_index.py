@@ -0,0 +1,81 @@
+"""
+Tests for incremental crawls against the local stand-in server
+"""
+
+import pytest
+
+from async_scraper import AsyncTescoScraper
+from bench_server import Corpus
+from page_index import PageIndex, page_hash
+from tesco_scraper import TescoScraper
+
+
+@pytest.fixture
+def corpus():
+    return Corpus(products=60, tiles_per_page=10)
+
+
+def crawl(make_scraper, index, **kwargs):
+    scraper = make_scraper(page_index=index, **kwargs)
+    try:
+        return scraper.search_products('milk', max_pages=10)
+    finally:
+        scraper.close()
+
+
+def test_page_hash_ignores_scripts():
+    assert page_hash(b'<p>1</p><script>nonce=1</script>') == page_hash(b'<p>1</p><SCRIPT>nonce=2</SCRIPT >')
+    assert page_hash(b'<p>1</p>') != page_hash(b'<p>2</p>')
+
+
+def test_embedded_state_changes_are_not_reused(tmp_path):
+    page = Corpus(products=60, tiles_per_page=10).listing_page(1)
+    repriced = page.replace(b'"actual":3.1,', b'"actual":9.9,', 1)
+    assert page_hash(page) == page_hash(repriced)
+    assert page_hash(page, include_state=True) != page_hash(repriced, include_state=True)
+
+    url = 'https://www.tesco.com/groceries/en-GB/search?query=milk&page=1'
+    scraper = TescoScraper(delay=0, embedded_state=True, page_index=PageIndex(str(tmp_path / 'pages.sqlite')))
+    products, reused = scraper._listing_products(url, page)
+    assert (products[0].price, reused) == ('£3.10', False)
+    products, reused = scraper._listing_products(url, repriced)
+    assert (products[0].price, reused) == ('£9.90', False)
+    assert scraper._listing_products(url, repriced)[1] is True
+
+
+@pytest.mark.parametrize('parse_workers', [0, 1])
+def test_unchanged_pages_reuse_stored_products(server, make_scraper, tmp_path, parse_workers):
+    index = PageIndex(str(tmp_path / 'pages.sqlite'))
+    first = crawl(make_scraper, index, parse_workers=parse_workers)
+    # Pipelined crawls may read a page past the end, so only the unchanged count is exact
+    assert index.stats()['unchanged'] == 0
+
+    server.corpus.products[25]['price'] = '£9.99'
+    second = crawl(make_scraper, index, parse_workers=parse_workers)
+    # Every page but the edited one, including the empty page that ends the crawl
+    assert index.stats()['unchanged'] == 6
+    assert [product.name for product in second] == [product.name for product in first]
+    assert second[25].price == '£9.99'
+    assert second[25].price_pence == 999
+
+
+def test_stop_after_unchanged_pages(server, make_scraper, tmp_path):
+    index = PageIndex(str(tmp_path / 'pages.sqlite'))
+    first = crawl(make_scraper, index)
+    before = server.requests
+
+    second = crawl(make_scraper, index, stop_after_unchanged=2)
+    assert server.requests - before == 2
+    # Pages 3-6 plus the empty page 7 that ended the last crawl
+    assert index.stats()['assumed'] == 5
+    assert [product.product_url for product in second] == [product.product_url for product in first]
+
+
+def test_async_crawl_uses_page_index(server, tmp_path):
+    index = PageIndex(str(tmp_path / 'pages.sqlite'))
+    scraper = AsyncTescoScraper(delay=0, rate=1000, page_index=index)
+    scraper.base_url = server.base_url
+    first = scraper.search_products('milk', max_pages=10)
+    second = scraper.search_products('milk', max_pages=10)
+    assert second == first
+    assert index.stats()['unchanged'] >= 6
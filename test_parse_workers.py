@@ -0,0 +1,36 @@
+"""
+Tests for parsing listing pages in worker processes, against the local stand-in server
+"""
+
+from bench_server import Corpus, StandInServer
+from tesco_scraper import TescoScraper
+
+
+def scraper_for(server, **kwargs):
+    scraper = TescoScraper(delay=0, **kwargs)
+    scraper.base_url = server.base_url
+    return scraper
+
+
+def test_pipelined_pages_match_sequential_pages():
+    with StandInServer(Corpus(products=45, tiles_per_page=10)) as server:
+        expected = list(scraper_for(server).iter_search_pages('milk', max_pages=5))
+        assert [len(page) for page in expected] == [10, 10, 10, 10, 5]
+
+        scraper = scraper_for(server, parse_workers=2)
+        try:
+            assert list(scraper.iter_search_pages('milk', max_pages=5)) == expected
+        finally:
+            scraper.close()
+
+
+def test_pipelined_crawl_stops_at_the_first_empty_page():
+    with StandInServer(Corpus(products=25, tiles_per_page=10)) as server:
+        scraper = scraper_for(server, parse_workers=2)
+        try:
+            pages = list(scraper.iter_search_pages('milk', max_pages=30))
+        finally:
+            scraper.close()
+        assert [len(page) for page in pages] == [10, 10, 5]
+        # Page 4 is empty; at most max_pending (2 * parse_workers) pages are fetched past it
+        assert server.requests <= 4 + 4
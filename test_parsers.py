@@ -0,0 +1,187 @@
+"""
+Equivalence tests for the HTML parser backends
+Every backend must turn the same HTML into identical products and details.
+"""
+
+import pytest
+
+from parsers import PARSER_BACKENDS
+from selector_plan import SelectorPlanCache
+from tesco_scraper import TescoScraper
+
+LISTING_HTML = """
+<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Search results</title>
+<script>window.__STATE__ = {"tiles": [1, 2, 3]};</script>
+</head>
+<body>
+<ul class="product-list">
+  <li class="product-list--list-item">
+    <div class="product-tile">
+      <div class="product-tile--image"><img src="https://digitalcontent.api.tesco.com/bread.jpg" alt=""></div>
+      <h3 class="product-tile--title"><a href="/groceries/en-GB/products/254656543">Tesco  White
+        Bread 800G</a></h3>
+      <p class="product-tile--price">&pound;0.75</p>
+      <p class="product-tile--price-per-unit">&pound;0.09/100g</p>
+      <span class="product-tile--brand">Tesco</span>
+      <span class="product-tile--availability"> In stock </span>
+    </div>
+  </li>
+  <li class="product-list--list-item">
+    <div class="product-tile">
+      <h3 data-auto="product-tile-title"><a href="https://www.tesco.com/groceries/en-GB/products/1">Warburtons <b>Toastie</b> Bread 800g</a></h3>
+      <div data-auto="price-current"><span>£1</span><span>.50</span><!-- price note --></div>
+      <div data-auto="price-per-quantity-weight">£0.19/100g<script>track("unit")</script></div>
+      <span class="brand-name">Warburtons</span>
+      <img src="https://digitalcontent.api.tesco.com/toastie.jpg">
+    </div>
+  </li>
+  <li class="product-list--list-item">
+    <div class="product-tile">
+      <div class="product-details--content"><h3>Hovis Soft White Medium 800G</h3></div>
+      <span class="beans-price__text">£1.40 Clubcard Price</span>
+      <a href="/groceries/en-GB/products/2" class="tile-link">View</a>
+      <p class="availability-text">Currently unavailable</p>
+    </div>
+  </li>
+  <li class="product-list--list-item">
+    <div class="product-tile">
+      <h3 class="product-tile--title">   </h3>
+      <p class="product-tile--price">£9.99</p>
+    </div>
+  </li>
+  <li class="product-list--list-item">
+    <div class="product-tile">
+      <h3 class="product-tile--title">Kingsmill 50/50 &amp; Seeds &#8211; 800g</h3>
+      <p class="price-current">£1.25</p>
+      <p class="price-per-unit">£0.16/100g</p>
+    </div>
+  </li>
+</ul>
+</body>
+</html>
+"""
+
+FALLBACK_TILE_HTML = """
+<html><body>
+<div data-auto="product-tile"><h3><a href="/groceries/en-GB/products/3">Brioche Rolls</a></h3><span class="price-current">£1.20</span></div>
+<div data-auto="product-tile"><h3><a href="/groceries/en-GB/products/4">Bagels</a></h3></div>
+</body></html>
+"""
+
+DETAILS_HTML = """
+<html><body>
+<div class="product-description"><p>Soft white bread.</p><p>Baked in the UK.</p></div>
+<div class="product-ingredients">Wheat Flour, Water, Yeast</div>
+<table class="nutrition-table">
+  <tr><th>Typical values</th><th>Per 100g</th></tr>
+  <tr><td>Energy</td><td>1012kJ / 239kcal</td></tr>
+  <tr><td>Fat</td><td>1.9g</td></tr>
+  <tr><td>Incomplete row</td></tr>
+</table>
+<span class="star-rating">Rated 4.6 out of 5</span>
+<span class="review-count">(128 reviews)</span>
+</body></html>
+"""
+
+
+def available_backends():
+    """Names of the backends whose libraries are installed"""
+    names = []
+    for name, backend_class in PARSER_BACKENDS.items():
+        try:
+            backend_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+BACKENDS = available_backends()
+
+
+def parse_listing(parser, html):
+    scraper = TescoScraper(delay=0, parser=parser)
+    return scraper._parse_listing_html(html.encode('utf-8'))
+
+
+def parse_details(parser, html):
+    scraper = TescoScraper(delay=0, parser=parser)
+    return scraper._parse_product_details(html.encode('utf-8'))
+
+
+def test_reference_backend_parses_listing():
+    products = parse_listing('html.parser', LISTING_HTML)
+
+    assert [' '.join(product.name.split()) for product in products] == [
+        'Tesco White Bread 800G',
+        'WarburtonsToastieBread 800g',
+        'Hovis Soft White Medium 800G',
+        'Kingsmill 50/50 & Seeds – 800g',
+    ]
+    assert products[0].price == '£0.75'
+    assert products[0].availability == 'In stock'
+    assert products[1].price == '£1.50'
+    assert products[1].price_per_unit == '£0.19/100g'
+    assert products[1].product_url == 'https://www.tesco.com/groceries/en-GB/products/1'
+    assert products[2].availability == 'Currently unavailable'
+    assert products[3].availability == 'Available'
+
+
+@pytest.mark.parametrize('parser', BACKENDS)
+@pytest.mark.parametrize('html', [LISTING_HTML, FALLBACK_TILE_HTML, '', '<html><body></body></html>'])
+def test_backends_produce_identical_products(parser, html):
+    assert parse_listing(parser, html) == parse_listing('html.parser', html)
+
+
+@pytest.mark.parametrize('parser', BACKENDS)
+def test_backends_produce_identical_details(parser):
+    assert parse_details(parser, DETAILS_HTML) == parse_details('html.parser', DETAILS_HTML)
+
+
+@pytest.mark.parametrize('parser', BACKENDS)
+def test_backends_decode_bytes_identically(parser):
+    html = LISTING_HTML.replace('utf-8', 'windows-1252').encode('windows-1252')
+    reference = TescoScraper(delay=0)._parse_listing_html(html)
+    assert TescoScraper(delay=0, parser=parser)._parse_listing_html(html) == reference
+
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ValueError):
+        TescoScraper(delay=0, parser='regex')
+
+
+@pytest.mark.parametrize('html', [LISTING_HTML, FALLBACK_TILE_HTML])
+def test_selector_plan_matches_full_fallback_chain(html):
+    adaptive = TescoScraper(delay=0, adaptive_selectors=True)
+    plain = TescoScraper(delay=0, adaptive_selectors=False)
+
+    for _ in range(3):
+        assert adaptive._parse_listing_html(html.encode('utf-8')) == plain._parse_listing_html(html.encode('utf-8'))
+
+
+def test_selector_plan_counts_hits_and_misses():
+    scraper = TescoScraper(delay=0, adaptive_selectors=True)
+    scraper._parse_listing_html(FALLBACK_TILE_HTML.encode('utf-8'))
+    first = scraper.selector_stats()['fields']
+    scraper._parse_listing_html(FALLBACK_TILE_HTML.encode('utf-8'))
+    second = scraper.selector_stats()['fields']
+
+    assert first['tile'] == {'hits': 0, 'misses': 1}
+    assert second['tile'] == {'hits': 1, 'misses': 1}
+    assert second['name']['hits'] == first['name']['hits'] + 2
+    assert scraper.selector_stats()['layouts'] == 1
+
+
+def test_layout_fingerprint_reads_the_first_tile_only():
+    plans = SelectorPlanCache(['product-tile', 'beans-tile', 'price'], anchors=['product-tile', 'beans-tile'])
+    page = b'<div class="product-tile"><span class="price">1</span></div>'
+    styled = b'<style>.product-tile {} .beans-tile {}</style><p class="product-tile--title">x</p>' + page
+    assert plans.fingerprint(styled) == plans.fingerprint(page) == (True, False, True)
+    assert plans.fingerprint(page.decode()) == (True, False, True)
+    assert plans.fingerprint(b'<div class="beans-tile"></div>') == (False, True, False)
+    # Markup past the window after the first tile is not looked at
+    far = page + b' ' * 10000 + b'<div class="beans-tile"></div>'
+    assert plans.fingerprint(far) == plans.fingerprint(page)
+    assert plans.fingerprint(b'<p>no products</p>') == (False, False, False)
@@ -0,0 +1,54 @@
+"""
+Tests for vectorised price normalisation
+"""
+
+import pandas as pd
+
+from product_batch import ProductBatch
+from prices import by_unit_price, normalise_prices, price_pence, products_frame, unit_prices
+from tesco_scraper import Product, parse_price_pence
+
+
+def make_product(name, price, price_per_unit=None):
+    return Product(name=name, price=price, price_per_unit=price_per_unit, image_url=None, product_url='',
+                   availability='Available', rating=None, review_count=None, description=None, brand=None)
+
+def test_price_pence_matches_the_row_parser():
+    texts = ['£2.50', '£0.75', '£1,299.00', '£1.5', '75p', '£1.40 Clubcard Price', 'N/A', None, '12.5p', '£2.50',
+             'Now 50p (was £1.20)', '£1.20 now 50p', 'Any 3 for £10', '2 for 90p']
+    prices = pd.Series(texts, index=range(100, 100 + len(texts)), name='price')
+    parsed = price_pence(prices)
+    assert list(parsed.index) == list(prices.index)
+    assert parsed.dtype == 'Int64'
+    assert [None if pd.isna(value) else value for value in parsed] == [parse_price_pence(text) for text in texts]
+    # The first price in the text is the one read
+    assert parsed.tolist()[10:] == [50, 120, 1000, 90]
+
+
+def test_unit_prices_are_normalised_per_kg_litre_or_each():
+    per_basis, basis = unit_prices(pd.Series(
+        ['£1.25/kg', '£0.50/100g', '55p/100ml', '£11.00/75cl', '£0.20/each', '£3.00/pint', None]
+    ))
+    assert per_basis.round(2).tolist()[:5] == [125.0, 500.0, 550.0, 1466.67, 20.0]
+    assert basis.tolist()[:5] == ['kg', 'kg', 'l', 'l', 'each']
+    assert per_basis[5:].isna().all() and basis[5:].isna().all()
+
+
+def test_frame_flags_offers_and_filters_by_unit_price():
+    products = [
+        make_product('Cheddar', '£3.00 Clubcard Price', '£7.50/kg'),
+        make_product('Brie', '£2.00', '£0.80/100g'),
+        make_product('Milk', '£1.45', '£0.64/litre'),
+        make_product('Mystery', 'N/A'),
+    ]
+    frame = products_frame(products)
+    assert frame['clubcard'].tolist() == [True, False, False, False]
+    assert frame['promo'].tolist() == [True, False, False, False]
+    normalised = ['price_pence', 'unit_price_pence', 'unit_basis', 'promo', 'clubcard']
+    assert products_frame(ProductBatch(products))[normalised].equals(frame[normalised])
+
+    assert by_unit_price(frame, 'kg')['name'].tolist() == ['Cheddar', 'Brie']
+    assert by_unit_price(frame, 'kg', max_pence=750)['name'].tolist() == ['Cheddar']
+
+    promoted = normalise_prices(frame[['price', 'price_per_unit']].assign(promotion=['', '', 'Any 2 for £2', None]))
+    assert promoted['promo'].tolist() == [True, False, True, False]
@@ -0,0 +1,62 @@
+"""
+Tests for the compact Product representation and ProductBatch
+"""
+
+import pickle
+
+import pytest
+
+from product_batch import ProductBatch
+from tesco_scraper import Product, parse_price_pence
+
+
+def make_product(index, **overrides):
+    fields = dict(
+        name=f'Product {index}', price=f'£{index}.25', price_per_unit=None, image_url=None,
+        product_url=f'https://www.tesco.com/groceries/en-GB/products/{index}', availability='Available',
+        rating=None, review_count=None, description=None, brand='Tesco'
+    )
+    fields.update(overrides)
+    return Product(**fields)
+
+
+@pytest.mark.parametrize('text, pence', [
+    ('£2.50', 250),
+    ('£0.75', 75),
+    ('£1,299.00', 129900),
+    ('£1.5', 150),
+    ('75p', 75),
+    ('£1.40 Clubcard Price', 140),
+    ('N/A', None),
+    (None, None),
+])
+def test_parse_price_pence(text, pence):
+    assert parse_price_pence(text) == pence
+
+
+def test_product_is_slotted_and_interned():
+    first = make_product(1, brand=''.join(['Tes', 'co']))
+    second = make_product(2, brand=''.join(['Te', 'sco']))
+
+    assert not hasattr(first, '__dict__')
+    assert first.brand is second.brand
+    assert first.price_pence == 125
+    assert pickle.loads(pickle.dumps(first)) == first
+
+
+def test_batch_round_trips_products():
+    products = [
+        make_product(1),
+        make_product(2, price='N/A', rating=4.5, review_count=0, brand=None, availability='Out of stock'),
+        make_product(3, description='Soft white bread', price_per_unit='£0.09/100g'),
+    ]
+    batch = ProductBatch(products)
+
+    assert len(batch) == 3
+    assert batch.to_products() == products
+    assert batch[-1] == products[-1]
+    assert list(batch.column('price_pence')) == [125, -1, 325]
+    assert batch.column('brand') == ['Tesco', None, 'Tesco']
+    assert batch.categories('availability') == ['Available', 'Out of stock']
+    with pytest.raises(IndexError):
+        batch[3]
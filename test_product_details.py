@@ -0,0 +1,90 @@
+"""
+Tests for fetching product details concurrently, against the local stand-in server
+"""
+
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from bench_server import Corpus
+from rate_limiter import HostRateLimiter
+from tesco_scraper import Product
+
+
+@pytest.fixture
+def corpus():
+    return Corpus(products=20, tiles_per_page=20)
+
+
+def product_url(server, index):
+    return f'{server.base_url}/groceries/en-GB/products/{250000000 + index}'
+
+
+def test_details_are_written_back_and_urls_fetched_once(server, make_scraper):
+    scraper = make_scraper()
+    products = scraper.search_products('milk', max_pages=1)[:5]
+    for product in products:
+        product.product_url = product.product_url.replace('https://www.tesco.com', server.base_url)
+    # A second Product for the same page, and two bare URLs already listed
+    duplicate = replace(products[0])
+    items = products + [duplicate, products[0].product_url, products[1].product_url]
+
+    requests_before = server.requests
+    results = scraper.get_product_details_many(items, max_workers=4)
+    assert server.requests - requests_before == 5
+    assert set(results) == {product.product_url for product in products}
+    for product in products + [duplicate]:
+        assert product.description.startswith(product.name)
+        assert product.rating is not None
+        assert product.review_count is not None
+
+
+def test_failed_fetches_are_skipped(server, make_scraper):
+    scraper = make_scraper(max_retries=0)
+    good = Product(name='Good', price='£1.00', price_per_unit=None, image_url=None,
+                   product_url=product_url(server, 1), availability='Available', rating=None,
+                   review_count=None, description=None, brand=None)
+    missing = product_url(server, 999)
+    results = scraper.get_product_details_many([good, missing], max_workers=2)
+    assert list(results) == [good.product_url]
+    assert good.description is not None
+
+
+class CountingLimiter(HostRateLimiter):
+    """HostRateLimiter recording when each request was let through"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.times = []
+        self._times_lock = threading.Lock()
+
+    def acquire(self, url):
+        super().acquire(url)
+        with self._times_lock:
+            self.times.append(time.monotonic())
+
+
+def test_shared_limiter_paces_every_worker(server, make_scraper):
+    scraper = make_scraper()
+    limiter = CountingLimiter(rate=20, capacity=1)
+    urls = [product_url(server, index) for index in range(8)]
+    scraper.get_product_details_many(urls, max_workers=8, limiter=limiter)
+    assert len(limiter.times) == 8
+    # Eight requests at 20 per second from one shared bucket, despite eight workers
+    assert limiter.times[-1] - limiter.times[0] >= 0.3
+
+    # The scraper's own limiter is used when none is passed
+    scraper.rate_limiter = limiter
+    scraper.get_product_details_many(urls[:2], max_workers=2)
+    assert len(limiter.times) == 10
+
+
+def test_default_rate_matches_the_sequential_delay(server, make_scraper, monkeypatch):
+    rates = []
+    monkeypatch.setattr('tesco_scraper.HostRateLimiter', lambda rate: rates.append(rate) or HostRateLimiter(1000))
+    scraper = make_scraper()
+    scraper.delay = 0.5
+    scraper.get_product_details_many([product_url(server, 1), product_url(server, 2)], max_workers=8)
+    assert rates == [2.0]
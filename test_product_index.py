@@ -0,0 +1,76 @@
+"""
+Tests for the in-memory product index
+"""
+
+import pytest
+
+from product_index import IndexCache, ProductIndex, tokenize
+from tesco_scraper import Product, TescoScraper
+
+
+def make_product(index, name, price, price_per_unit=None, brand=None, availability='Available'):
+    return Product(name=name, price=price, price_per_unit=price_per_unit, image_url=None,
+                   product_url=f'https://www.tesco.com/groceries/en-GB/products/{index}',
+                   availability=availability, rating=None, review_count=None, description=None, brand=brand)
+
+
+PRODUCTS = [
+    make_product(1, 'Arla Semi Skimmed Milk 2L', '£1.65', '£0.83/litre', 'Arla'),
+    make_product(2, 'Tesco Whole Milk 4 Pints', '£1.45', '£0.64/litre', 'Tesco'),
+    make_product(3, 'Cathedral City Mature Cheddar 350G', '£3.50 Clubcard Price', '£10.00/kg', 'Cathedral City'),
+    make_product(4, 'Tesco Mature Cheddar 400G', '£3.10', '£7.75/kg', 'Tesco', 'Currently unavailable'),
+    make_product(5, 'Mystery Milk', 'N/A', None, None),
+]
+
+
+def test_query_matches_a_linear_scan():
+    index = TescoScraper(delay=0).index_products(PRODUCTS)
+
+    result = index.query(text='milk', sort='price')
+    assert [product['name'] for product in result['products']] == [
+        'Tesco Whole Milk 4 Pints', 'Arla Semi Skimmed Milk 2L', 'Mystery Milk'
+    ]
+    assert index.query(text='tesco cheddar')['total'] == 1
+    assert index.query(text='milk', max_price=150)['total'] == 1
+    assert index.query(text='yoghurt')['total'] == 0
+
+    cheese = index.query(unit_basis='kg', max_unit_price=1000, sort='unit_price', descending=True)
+    assert [product['product_url'][-1] for product in cheese['products']] == ['3', '4']
+    assert index.query(clubcard=True)['products'][0]['brand'] == 'Cathedral City'
+    assert index.query(brand='Tesco', availability='Available')['total'] == 1
+    assert index.query(min_price=140, max_price=320, max_unit_price=100)['total'] == 2
+
+    # Paging takes the next slice of the same order; unknown prices sort last either way
+    ordered = [product['name'] for product in index.query(sort='price', limit=None)['products']]
+    assert ordered[-1] == 'Mystery Milk'
+    assert [product['name'] for product in index.query(sort='price', offset=1, limit=2)['products']] == ordered[1:3]
+    assert index.query(sort='price', descending=True)['products'][-1]['name'] == 'Mystery Milk'
+
+    with pytest.raises(ValueError):
+        index.query(sort='rating')
+
+
+def test_facet_counts_cover_all_matches():
+    index = ProductIndex(PRODUCTS)
+    facets = index.query(text='milk', limit=1, facets=True)['facets']
+    assert facets['brand'] == {'Arla': 1, 'Tesco': 1}
+    assert facets['unit_basis'] == {'l': 2}
+    assert index.facet_counts()['availability'] == {'Available': 4, 'Currently unavailable': 1}
+    assert 'facets' not in index.query(text='milk')
+    assert tokenize("Sainsbury's Free-Range EGGS") == ["sainsbury's", 'free', 'range', 'eggs']
+
+
+def test_index_cache_rebuilds_when_results_grow():
+    cache = IndexCache(max_size=1)
+    loads = []
+
+    def load(count):
+        loads.append(count)
+        return PRODUCTS[:count]
+
+    assert len(cache.get('job', 2, lambda: load(2))) == 2
+    assert len(cache.get('job', 2, lambda: load(2))) == 2
+    assert len(cache.get('job', 5, lambda: load(5))) == 5
+    cache.get('other', 1, lambda: load(1))
+    cache.get('job', 5, lambda: load(5))
+    assert loads == [2, 5, 1, 5]
@@ -0,0 +1,121 @@
+"""
+Tests for rate limiting, the concurrent crawler, and request retries
+"""
+
+import asyncio
+import time
+from email.utils import formatdate
+
+from async_scraper import AsyncTescoScraper
+from bench_server import Corpus, StandInServer
+from rate_limiter import AdaptiveRateController, HostRateLimiter, TokenBucket, parse_retry_after
+from tesco_scraper import TescoScraper
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+
+
+def test_rate_rises_while_healthy_and_halves_on_throttling():
+    controller = AdaptiveRateController(rate=1.0, max_rate=2.0, increase=0.5, cooldown=60)
+    controller.record(0.1, 200)
+    controller.record(0.1, 200)
+    assert controller.rate > 1.5
+
+    controller.record(0.1, 429)
+    halved = controller.rate
+    # A burst of failures from requests already in flight backs off only once
+    controller.record(0.1, 503)
+    controller.record(0.1)
+    assert controller.rate == halved
+    assert controller.stats()['backoffs'] == 1
+
+    for _ in range(50):
+        controller.record(0.1, 200)
+    assert controller.rate == 2.0
+
+
+def test_latency_spike_and_retry_after_slow_requests_down():
+    controller = AdaptiveRateController(rate=4.0, min_rate=1.5, cooldown=0)
+    controller.record(0.1, 200)
+    before = controller.rate
+    controller.record(1.0, 200)
+    assert controller.rate == before / 2
+
+    controller.record(0.1, 429, retry_after=0.3)
+    assert controller.rate == 1.5
+    started = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - started >= 0.25
+
+
+def test_failed_pages_are_retried_instead_of_ending_the_search():
+    with StandInServer(Corpus(products=80, tiles_per_page=8), error_rate=0.3, seed=3) as server:
+        scraper = TescoScraper(delay=0, max_retries=5)
+        scraper.base_url = server.base_url
+        scraper.retry_backoff = 0.001
+        products = scraper.search_products('milk', max_pages=20)
+    assert len(products) == 80
+
+
+def test_adaptive_scraper_backs_off_when_throttled():
+    with StandInServer(Corpus(products=120, tiles_per_page=8), rate_limit=10) as server:
+        scraper = TescoScraper(delay=0.05, adaptive_rate=True, max_rate=100)
+        scraper.base_url = server.base_url
+        products = scraper.search_products('milk', max_pages=30)
+        assert len(products) == 120
+        assert server.throttled >= 1
+    assert scraper.rate_stats()['backoffs'] >= 1
+    assert scraper.rate_stats()['rate'] < 100
+
+
+def test_token_bucket_allows_the_burst_then_holds_the_rate():
+    bucket = TokenBucket(rate=20, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(10):
+        bucket.acquire()
+    # Ten more tokens at 20 per second
+    assert 0.45 <= time.monotonic() - start < 0.8
+
+    assert TokenBucket(rate=0.5).capacity == 1.0
+
+
+def test_hosts_have_separate_buckets():
+    limiter = HostRateLimiter(rate=1, capacity=1)
+    limiter.acquire('https://www.tesco.com/a')
+    start = time.monotonic()
+    asyncio.run(limiter.acquire_async('https://example.com/b'))
+    assert time.monotonic() - start < 0.05
+    assert limiter.bucket_for('https://WWW.tesco.com/c') is limiter.bucket_for('https://www.tesco.com/d')
+
+
+class OutOfOrderScraper(AsyncTescoScraper):
+    """Makes earlier pages finish last"""
+
+    async def _fetch_listing(self, url, page, deadline=None):
+        await asyncio.sleep(0.05 * (6 - page))
+        return await super()._fetch_listing(url, page, deadline)
+
+
+def test_async_crawl_keeps_page_order_and_stops_at_the_first_empty_page():
+    with StandInServer(Corpus(products=45, tiles_per_page=10)) as server:
+        sequential = TescoScraper(delay=0)
+        sequential.base_url = server.base_url
+        expected = sequential.search_products('milk', max_pages=5)
+
+        scraper = OutOfOrderScraper(delay=0, max_concurrency=5, rate=1000)
+        scraper.base_url = server.base_url
+        assert scraper.search_products('milk', max_pages=5) == expected
+
+        # Pages 1-5 hold products, page 6 is empty: later pages waiting for a slot are never fetched
+        requests_before = server.requests
+        scraper = AsyncTescoScraper(delay=0, max_concurrency=2, rate=1000)
+        scraper.base_url = server.base_url
+        assert scraper.search_products('milk', max_pages=20) == expected
+        assert server.requests - requests_before <= 8
@@ -0,0 +1,98 @@
+"""
+Tests for parsing listing pages while they download
+"""
+
+from concurrent.futures import Future
+
+import pytest
+
+from bench_server import Corpus, StandInServer
+from http_cache import HTTPCache
+from streaming_parser import STREAM_CHUNK_SIZE, TileStream
+from tesco_scraper import PRODUCT_TILE_SELECTORS, TescoScraper, _close_response
+
+
+def test_streamed_products_match_full_parse():
+    with StandInServer(Corpus(products=100, tiles_per_page=24)) as server:
+        streaming = TescoScraper(delay=0, parser='lxml', stream_parse=True)
+        streaming.base_url = server.base_url
+        full = TescoScraper(delay=0, parser='lxml')
+        full.base_url = server.base_url
+
+        assert streaming.search_products('milk', max_pages=10) == full.search_products('milk', max_pages=10)
+        assert [len(page) for page in streaming.iter_search_pages('milk', max_pages=10)] == [24, 24, 24, 24, 4]
+
+
+def test_tiles_are_emitted_before_the_page_ends_and_the_tree_stays_small():
+    page = Corpus(products=400, tiles_per_page=400).listing_page(1)
+    scraper = TescoScraper(delay=0, parser='lxml')
+    tree_sizes = []
+
+    def extract(tile):
+        tree_sizes.append(sum(1 for _ in tile.getroottree().iter()))
+        return scraper._extract_product_data(tile)
+
+    stream = TileStream(PRODUCT_TILE_SELECTORS, extract)
+    chunks = [page[start:start + STREAM_CHUNK_SIZE] for start in range(0, len(page), STREAM_CHUNK_SIZE)]
+    early = stream.feed(chunks[0])
+    assert 0 < len(early) < 400
+    assert len(early) + sum(len(stream.feed(chunk)) for chunk in chunks[1:]) + len(stream.close()) == 400
+
+    # Only the tiles of the current chunk and their open ancestors are held, not the page's ~5000 elements
+    assert max(tree_sizes) < 500
+
+
+def test_streaming_needs_lxml():
+    with pytest.raises(ValueError):
+        TescoScraper(stream_parse=True)
+
+
+def test_streamed_pages_are_cached_and_revalidated(tmp_path):
+    cache = HTTPCache(str(tmp_path / 'cache.sqlite'))
+    with StandInServer(Corpus(products=50, tiles_per_page=24)) as server:
+        def crawl():
+            scraper = TescoScraper(delay=0, parser='lxml', stream_parse=True, http_cache=cache, hedge=True)
+            scraper.base_url = server.base_url
+            return scraper.search_products('milk', max_pages=10)
+
+        # Second crawl: every page is revalidated with a 304 and streamed from the cache
+        first = crawl()
+        assert len(first) == 50
+        assert crawl() == first
+        assert cache.get(f'{server.base_url}/groceries/en-GB/search?query=milk&page=1') is not None
+
+        # Fresh entries are answered without a request
+        cache.max_age = 3600
+        requests_before = server.requests
+        assert crawl() == first
+        assert server.requests == requests_before
+
+        # A cached response that loses a hedge race closes cleanly
+        scraper = TescoScraper(delay=0, http_cache=cache)
+        future = Future()
+        future.set_result(scraper.session.get(f'{server.base_url}/groceries/en-GB/search?query=milk&page=1',
+                                              stream=True))
+        _close_response(future)
+
+
+def tile(css_class, name):
+    return (f'<div class="{css_class}"><h3 class="product-tile--title"><a href="/p/{name}">{name}</a></h3>'
+            f'<p class="product-tile--price">£1.00</p></div>')
+
+
+@pytest.mark.parametrize('tiles', [
+    [tile('beans-tile', 'Promo banner'), tile('product-tile', 'Milk')],
+    [tile('product-tile', 'Milk'), tile('beans-tile', 'Promo banner'), tile('product-tile', 'Bread')],
+    [tile('beans-tile', 'Milk'), tile('beans-tile', 'Bread')],
+    [f'<li class="product-list--list-item">{tile("product-tile", "Milk")}</li>',
+     f'<li class="product-list--list-item">{tile("beans-tile", "Bread")}</li>'],
+])
+def test_streamed_mixed_tiles_use_the_same_selector_as_full_parse(tiles):
+    page = f'<html><body><ul>{"".join(tiles)}</ul></body></html>'.encode()
+    scraper = TescoScraper(delay=0, parser='lxml')
+    expected = [product.name for product in scraper._parse_listing_html(page)]
+
+    stream = TileStream(PRODUCT_TILE_SELECTORS, scraper._extract_product_data)
+    streamed = [product.name for chunk in (page[:40], page[40:]) for product in stream.feed(chunk)]
+    streamed += [product.name for product in stream.close()]
+    assert streamed == expected
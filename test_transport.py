@@ -0,0 +1,82 @@
+"""
+Tests for the shared pooled HTTP transport
+"""
+
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from http_cache import HTTPCache
+from tesco_scraper import TescoScraper
+from transport import close_shared_transports, shared_transport, transport_stats
+
+
+def test_scrapers_share_open_connections(make_scraper):
+    for _ in range(3):
+        with make_scraper(shared_transport=True) as scraper:
+            assert len(scraper.search_products('milk', max_pages=10)) == 40
+
+    stats = transport_stats()['http1']
+    # 3 searches of 6 pages each (the last one empty) over one kept-alive connection
+    assert stats['requests'] == 18
+    assert stats['connections'] == 1
+    assert stats['reused'] == 17
+
+
+def test_cached_scraper_sends_through_shared_transport(make_scraper, tmp_path):
+    cache = HTTPCache(str(tmp_path / 'http.sqlite'))
+    with make_scraper(shared_transport=True, http_cache=cache) as scraper:
+        scraper.search_products('milk', max_pages=2)
+    assert transport_stats()['http1']['requests'] == 2
+    cache.close()
+
+
+def test_http2_transport_matches_default(server, make_scraper):
+    pytest.importorskip('httpx')
+    expected = make_scraper().search_products('milk', max_pages=10)
+    scraper = make_scraper(http2=True)
+    assert scraper.search_products('milk', max_pages=10) == expected
+    assert scraper.session.get_adapter(server.base_url) is shared_transport(http2=True)
+
+    stats = transport_stats()['http2']
+    assert stats['connections'] == 1
+    # The stand-in server only speaks HTTP/1.1, so httpx falls back to it
+    assert stats['versions'] == {'HTTP/1.1': 6}
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    """Sets a session cookie on /login and echoes the Cookie header back on any other path"""
+
+    def do_GET(self):
+        body = (self.headers.get('Cookie') or '').encode()
+        self.send_response(200)
+        if self.path == '/login':
+            self.send_header('Set-Cookie', 'session=first-scraper; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('http2', [False, True])
+def test_shared_transport_keeps_cookies_per_scraper(serve, http2):
+    if http2:
+        pytest.importorskip('httpx')
+    base_url = serve(CookieHandler)
+    close_shared_transports()
+    try:
+        first = TescoScraper(delay=0, shared_transport=True, http2=http2)
+        second = TescoScraper(delay=0, shared_transport=True, http2=http2)
+        first.session.get(f'{base_url}/login')
+        assert first.session.cookies.get('session') == 'first-scraper'
+        assert first.session.get(f'{base_url}/echo').text == 'session=first-scraper'
+        assert second.session.get(f'{base_url}/echo').text == ''
+        assert not second.session.cookies
+
+        streamed = first.session.get(f'{base_url}/echo', stream=True)
+        assert not streamed._content_consumed
+        assert b''.join(streamed.iter_content(4)) == b'session=first-scraper'
+    finally:
+        close_shared_transports()
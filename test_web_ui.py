@@ -0,0 +1,243 @@
+"""
+Tests for the web UI job endpoints, with the scraper replaced by a fake
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import web_ui
+from tesco_scraper import Product
+
+
+class FakeScraper:
+    """Stands in for TescoScraper; searches block until `release` is set"""
+
+    release = threading.Event()
+    searches = []
+    options = []
+    deadline_reached = False
+
+    def __init__(self, *args, **kwargs):
+        FakeScraper.options.append(kwargs)
+
+    def close(self):
+        pass
+
+    def iter_search_pages(self, query, max_pages=5):
+        FakeScraper.searches.append(query)
+        FakeScraper.release.wait(5)
+        for page in range(max_pages):
+            yield [
+                Product(name=f'{query} {index}', price=f'£{index}.00', price_per_unit=None, image_url=None,
+                        product_url=f'https://www.tesco.com/groceries/en-GB/products/{index}',
+                        availability='Available', rating=None, review_count=None, description=None, brand='Tesco')
+                for index in range(page * 3 + 1, page * 3 + 4)
+            ]
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def client(request, monkeypatch, tmp_path):
+    FakeScraper.release = threading.Event()
+    FakeScraper.searches = []
+    FakeScraper.options = []
+    monkeypatch.setattr(web_ui, 'TescoScraper', FakeScraper)
+    if request.param == 'shared':
+        store = web_ui.JobStore(str(tmp_path / 'jobs.sqlite'))
+        manager = web_ui.SharedJobManager(web_ui.scrape_products, store, max_workers=2, max_queued=1)
+    else:
+        manager = web_ui.JobManager(web_ui.scrape_products, max_workers=2, max_queued=1)
+    monkeypatch.setattr(web_ui, 'job_manager', manager)
+    monkeypatch.setattr(web_ui, 'export_cache', web_ui.ExportCache(str(tmp_path / 'downloads')))
+    monkeypatch.setattr(web_ui, 'index_cache', web_ui.IndexCache())
+    yield web_ui.app.test_client()
+    FakeScraper.release.set()
+
+
+def wait_for(client, job_id, status='completed'):
+    for _ in range(200):
+        data = client.get(f'/status/{job_id}').get_json()
+        if data['status'] == status:
+            return data
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} never reached {status}: {data}')
+
+
+def test_concurrent_searches_run_as_separate_jobs(client):
+    first = client.post('/search', json={'search_term': 'milk', 'max_pages': 1}).get_json()
+    second = client.post('/search', json={'search_term': 'bread', 'max_pages': 1}).get_json()
+    assert first['job_id'] != second['job_id']
+
+    wait_for(client, first['job_id'], 'running')
+    wait_for(client, second['job_id'], 'running')
+    FakeScraper.release.set()
+
+    assert [row['name'] for row in wait_for(client, first['job_id'])['results']][0] == 'milk 1'
+    assert [row['name'] for row in wait_for(client, second['job_id'])['results']][0] == 'bread 1'
+
+
+def test_full_pool_queues_then_refuses(client):
+    job_ids = [client.post('/search', json={'search_term': term}).get_json()['job_id'] for term in ('a', 'b', 'c')]
+    assert client.get(f'/status/{job_ids[2]}').get_json()['queue_position'] == 0
+
+    response = client.post('/search', json={'search_term': 'd'})
+    assert response.status_code == 503
+
+    FakeScraper.release.set()
+    for job_id in job_ids:
+        wait_for(client, job_id)
+
+
+def test_status_without_id_reports_latest_job(client):
+    job_id = client.post('/search', json={'search_term': 'milk'}).get_json()['job_id']
+    FakeScraper.release.set()
+    wait_for(client, job_id)
+
+    data = client.get('/status').get_json()
+    assert data['job_id'] == job_id
+    assert data['is_running'] is False
+    assert client.get('/status/unknown').status_code == 404
+
+
+def test_search_requires_term(client):
+    assert client.post('/search', json={'search_term': '  '}).status_code == 400
+
+
+def read_events(response):
+    """Parse a text/event-stream body into (id, event, data) tuples"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_stream_sends_each_page_once_and_ends_with_done(client):
+    job_id = client.post('/search', json={'search_term': 'milk', 'max_pages': 2}).get_json()['job_id']
+    FakeScraper.release.set()
+
+    events = read_events(client.get(f'/stream/{job_id}'))
+    names = [product['name'] for _, event, data in events if event == 'products' for product in data['products']]
+    assert names == [f'milk {index}' for index in range(1, 7)]
+    assert [data['page'] for _, event, data in events if event == 'progress' and 'page' in data] == [1, 2]
+    assert events[-1][1] == 'done'
+    assert events[-1][2]['status'] == 'completed'
+
+    # Resuming after the first products event only replays what came later
+    first_products = next(event_id for event_id, event, _ in events if event == 'products')
+    resumed = read_events(client.get(f'/stream/{job_id}', headers={'Last-Event-ID': str(first_products)}))
+    assert resumed == [event for event in events if event[0] > first_products]
+    assert client.get('/stream/unknown').status_code == 404
+
+
+def test_identical_searches_share_one_scrape(client):
+    first = client.post('/search', json={'search_term': 'Milk', 'max_pages': 1}).get_json()
+    second = client.post('/search', json={'search_term': '  milk ', 'max_pages': 1}).get_json()
+    assert second['job_id'] == first['job_id']
+    FakeScraper.release.set()
+    wait_for(client, first['job_id'])
+
+    response = client.post('/search', json={'search_term': 'milk', 'max_pages': 1})
+    assert response.status_code == 200
+    assert response.get_json()['cached'] is True
+    assert FakeScraper.searches == ['Milk']
+    assert client.get('/jobs').get_json()['cache_hits'] == 1
+
+    # A different page count is a different search
+    other = client.post('/search', json={'search_term': 'milk', 'max_pages': 2}).get_json()
+    assert other['job_id'] != first['job_id']
+    wait_for(client, other['job_id'])
+
+
+def test_expired_results_are_scraped_again(client):
+    web_ui.job_manager.cache_ttl = 0
+    first = client.post('/search', json={'search_term': 'milk'}).get_json()
+    FakeScraper.release.set()
+    wait_for(client, first['job_id'])
+
+    second = client.post('/search', json={'search_term': 'milk'}).get_json()
+    assert second['job_id'] != first['job_id']
+    wait_for(client, second['job_id'])
+    assert FakeScraper.searches == ['milk', 'milk']
+
+
+def test_downloads_are_generated_on_demand(client):
+    job_id = client.post('/search', json={'search_term': 'semi skimmed/milk', 'max_pages': 1}).get_json()['job_id']
+    FakeScraper.release.set()
+    csv_file = wait_for(client, job_id)['csv_file']
+    assert csv_file.startswith('semi_skimmed_milk_')
+    assert os.listdir(web_ui.export_cache.directory) == []
+
+    response = client.get(f'/download/{csv_file}')
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('name,price,price_per_unit')
+    assert lines[1].startswith('semi skimmed/milk 1,')
+
+    compressed = client.get(f'/download/{csv_file}', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.get_data()).splitlines() == response.get_data().splitlines()
+
+    partial = client.get(f'/download/{csv_file}', headers={'Range': 'bytes=0-3'})
+    assert partial.status_code == 206
+    assert partial.get_data(as_text=True) == 'name'
+
+    etag = response.headers['ETag']
+    assert client.get(f'/download/{csv_file}', headers={'If-None-Match': etag}).status_code == 304
+
+    json_file = wait_for(client, job_id)['json_file']
+    assert len(client.get(f'/download/{json_file}').get_json()) == 3
+    assert client.get(f'/download/other_{job_id}.csv').status_code == 404
+
+
+def test_download_regenerates_an_export_evicted_before_it_was_sent(client, monkeypatch):
+    job_id = client.post('/search', json={'search_term': 'milk', 'max_pages': 1}).get_json()['job_id']
+    FakeScraper.release.set()
+    csv_file = wait_for(client, job_id)['csv_file']
+    cache = web_ui.export_cache
+    calls = []
+
+    def get_then_evict(filename, load_rows, encoding=None):
+        path = type(cache).get(cache, filename, load_rows, encoding)
+        calls.append(path)
+        if len(calls) == 1:
+            os.remove(path)
+        return path
+
+    monkeypatch.setattr(cache, 'get', get_then_evict)
+    response = client.get(f'/download/{csv_file}')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).startswith('name,')
+    assert len(calls) == 2
+
+
+def test_query_filters_sorts_and_counts_job_results(client):
+    job_id = client.post('/search', json={'search_term': 'milk', 'max_pages': 2}).get_json()['job_id']
+    FakeScraper.release.set()
+    wait_for(client, job_id)
+
+    data = client.get(f'/query?job_id={job_id}&q=MILK&max_price=400&sort=price&order=desc&limit=2&facets=1').get_json()
+    assert data['total'] == 4
+    assert [product['name'] for product in data['products']] == ['milk 4', 'milk 3']
+    assert data['facets']['brand'] == {'Tesco': 4}
+    assert 'facets' not in client.get(f'/query?job_id={job_id}&q=milk').get_json()
+
+    # Without a job_id the most recent job is queried
+    assert client.get('/query?q=milk&brand=Asda').get_json()['total'] == 0
+    assert client.get('/query?sort=rating').status_code == 400
+    assert client.get('/query?min_price=cheap').status_code == 400
+    assert client.get('/query?job_id=unknown').status_code == 404
+
+
+def test_hedging_is_opt_in(client, monkeypatch):
+    FakeScraper.release.set()
+    monkeypatch.delenv('SEARCH_HEDGE', raising=False)
+    wait_for(client, client.post('/search', json={'search_term': 'milk', 'max_pages': 1}).get_json()['job_id'])
+    monkeypatch.setenv('SEARCH_HEDGE', '1')
+    wait_for(client, client.post('/search', json={'search_term': 'bread', 'max_pages': 1}).get_json()['job_id'])
+    assert [options['hedge'] for options in FakeScraper.options] == [False, True]
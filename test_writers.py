@@ -0,0 +1,56 @@
+"""
+Tests for the streaming product writers
+"""
+
+import json
+
+import pandas as pd
+
+from tesco_scraper import Product, TescoScraper
+from writers import CSVStreamWriter, JSONLinesWriter, stream_to_file
+
+PRODUCTS = [
+    Product(name='Warburtons Toastie, "Thick"', price='£1.50', price_per_unit='£0.19/100g', image_url=None,
+            product_url='https://www.tesco.com/groceries/en-GB/products/1', availability='Available',
+            rating=4.5, review_count=12, description='Soft\nwhite bread', brand='Warburtons'),
+    Product(name='Tesco White Bread 800G', price='£0.75', price_per_unit=None, image_url='https://example.com/b.jpg',
+            product_url='https://www.tesco.com/groceries/en-GB/products/2', availability='Available',
+            rating=None, review_count=None, description=None, brand=None),
+]
+
+
+def test_csv_stream_matches_save_to_csv(tmp_path):
+    stream_to_file(iter(PRODUCTS), str(tmp_path / 'stream.csv'))
+    TescoScraper(delay=0).save_to_csv(PRODUCTS, str(tmp_path / 'saved.csv'))
+
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'stream.csv'), pd.read_csv(tmp_path / 'saved.csv'))
+
+
+def test_csv_append_keeps_single_header(tmp_path):
+    filename = str(tmp_path / 'products.csv')
+    with CSVStreamWriter(filename) as writer:
+        writer.write(PRODUCTS[0])
+    with CSVStreamWriter(filename, append=True) as writer:
+        writer.write(PRODUCTS[1])
+
+    assert list(pd.read_csv(filename)['price']) == ['£1.50', '£0.75']
+
+
+def test_json_lines_round_trip(tmp_path):
+    filename = str(tmp_path / 'products.jsonl')
+    with JSONLinesWriter(filename) as writer:
+        assert writer.write_many(PRODUCTS) == 2
+
+    with open(filename, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [Product(**row) for row in rows] == PRODUCTS
+
+
+def test_first_product_reaches_disk_before_close(tmp_path):
+    filename = str(tmp_path / 'products.jsonl')
+    writer = JSONLinesWriter(filename, flush_interval=3600)
+    writer.write(PRODUCTS[0])
+
+    with open(filename, encoding='utf-8') as f:
+        assert json.loads(f.readline())['name'] == PRODUCTS[0].name
+    writer.close()
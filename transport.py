@@ -0,0 +1,270 @@
+"""
+Shared HTTP transport for the Tesco scraper
+One connection pool per process that every TescoScraper can mount, so
+back-to-back jobs reuse open keep-alive connections instead of opening new
+TCP and TLS connections, and concurrent fetches share a small set of them.
+HTTP/2 multiplexing is available through the optional httpx package.
+"""
+
+import http.client
+import http.cookiejar
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per host by the shared transports
+DEFAULT_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 16))
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter shared between sessions, counting requests and the connections opened for them"""
+
+    http_version = 'HTTP/1.1'
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        """
+        Initialize the adapter
+        Args:
+            pool_size (int): Connections kept open per host
+        """
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.pool_size = pool_size
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+        return super().send(request, **kwargs)
+
+    def connections_opened(self) -> int:
+        """Connections opened so far by the pools still open"""
+        pools = self.poolmanager.pools
+        opened = 0
+        for key in pools.keys():
+            try:
+                opened += pools[key].num_connections
+            except KeyError:
+                # Evicted since keys() was taken
+                pass
+        return opened
+
+    def stats(self) -> Dict:
+        """Requests sent, connections opened, and requests that reused an open connection"""
+        opened = self.connections_opened()
+        return {
+            'http_version': self.http_version,
+            'pool_size': self.pool_size,
+            'requests': self.requests,
+            'connections': opened,
+            'reused': max(0, self.requests - opened),
+        }
+
+    def close(self):
+        # Sessions close their adapters; other sessions are still using this one
+        pass
+
+    def shutdown(self):
+        """Close every pooled connection"""
+        super().close()
+
+
+class _RejectCookies(http.cookiejar.DefaultCookiePolicy):
+    """Cookie policy that neither stores nor sends any cookie"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class _ReplyBody:
+    """
+    Body of an httpx reply in the shape requests expects of response.raw
+    Exposes the reply headers as _original_response.msg, which is where
+    requests reads Set-Cookie headers into the session's cookie jar.
+    """
+
+    def __init__(self, reply, httpx):
+        self._reply = reply
+        self._httpx = httpx
+        self._chunks: Optional[Iterator[bytes]] = None
+        headers = http.client.HTTPMessage()
+        for name, value in reply.headers.multi_items():
+            headers[name] = value
+        self._original_response = SimpleNamespace(msg=headers)
+
+    def stream(self, amt: int = 2 ** 16, decode_content=None) -> Iterator[bytes]:
+        # httpx has already decoded any gzip/deflate content encoding
+        httpx = self._httpx
+        try:
+            yield from self._reply.iter_bytes(amt)
+        except httpx.TimeoutException as e:
+            raise requests.ConnectionError(e)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+
+    def read(self, amt: Optional[int] = None, decode_content=None) -> bytes:
+        if amt is None:
+            return b''.join(self._chunks or self.stream())
+        if self._chunks is None:
+            self._chunks = self.stream(amt)
+        return next(self._chunks, b'')
+
+    def close(self):
+        self._reply.close()
+
+    def release_conn(self):
+        self._reply.close()
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Transport adapter sending requests through an httpx client, using HTTP/2 where the server offers it
+    The client is shared by every session mounting the adapter, so it keeps no
+    cookies of its own: each reply's cookies go to the session that sent it.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        """
+        Initialize the adapter
+        Args:
+            pool_size (int): Most connections kept open; with HTTP/2 one connection per
+                host carries many concurrent requests
+        """
+        super().__init__()
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("HTTP/2 needs httpx with HTTP/2 support. Install with: pip install 'httpx[http2]'")
+        self._httpx = httpx
+        self.pool_size = pool_size
+        self.client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            follow_redirects=False,
+            cookies=http.cookiejar.CookieJar(policy=_RejectCookies()),
+        )
+        self.requests = 0
+        self.opened = 0
+        self.http_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        httpx = self._httpx
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        outgoing = self.client.build_request(
+            request.method, request.url, headers=dict(request.headers), content=request.body,
+            timeout=httpx.Timeout(read, connect=connect),
+            extensions={'trace': self._trace},
+        )
+        started = time.perf_counter()
+        try:
+            # With stream the body is read as the caller iterates over it
+            reply = self.client.send(outgoing, stream=stream)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        with self._lock:
+            self.requests += 1
+            self.http_versions[reply.http_version] = self.http_versions.get(reply.http_version, 0) + 1
+
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response.raw = _ReplyBody(reply, httpx)
+        if not stream:
+            # httpx has already decoded any gzip/deflate content encoding
+            response._content = reply.content
+            response._content_consumed = True
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = reply.reason_phrase
+        response.url = request.url
+        response.request = request
+        # Time until the headers arrived, as requests measures it
+        response.elapsed = timedelta(seconds=time.perf_counter() - started)
+        response.connection = self
+        response.http_version = reply.http_version
+        return response
+
+    def _trace(self, event: str, info: Dict):
+        # httpcore reports each new TCP connection through the trace extension
+        if event == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.opened += 1
+
+    def stats(self) -> Dict:
+        """Requests sent, connections opened, requests that reused a connection, and HTTP versions used"""
+        with self._lock:
+            return {
+                'http_version': 'HTTP/2',
+                'pool_size': self.pool_size,
+                'requests': self.requests,
+                'connections': self.opened,
+                'reused': max(0, self.requests - self.opened),
+                'versions': dict(self.http_versions),
+            }
+
+    def close(self):
+        # Sessions close their adapters; other sessions are still using this one
+        pass
+
+    def shutdown(self):
+        """Close every pooled connection"""
+        self.client.close()
+
+
+_transports: Dict[bool, BaseAdapter] = {}
+_transports_lock = threading.Lock()
+
+
+def shared_transport(http2: bool = False, pool_size: Optional[int] = None) -> BaseAdapter:
+    """
+    Return the process-wide transport adapter, creating it on first use
+    Args:
+        http2 (bool): The HTTP/2 transport (needs httpx) instead of the requests/urllib3 one
+        pool_size (int): Connections kept open per host; only used when the transport
+            is created (defaults to HTTP_POOL_SIZE or 16)
+    Returns:
+        BaseAdapter: Adapter to mount on a session; closing the session leaves it open
+    """
+    with _transports_lock:
+        transport = _transports.get(http2)
+        if transport is None:
+            size = pool_size or DEFAULT_POOL_SIZE
+            transport = HTTP2Adapter(size) if http2 else PooledAdapter(size)
+            _transports[http2] = transport
+            logger.info(f"Created shared {'HTTP/2' if http2 else 'HTTP/1.1'} transport with {size} connections per host")
+        return transport
+
+
+def transport_stats() -> Dict[str, Dict]:
+    """Stats of the shared transports created so far, keyed by 'http1' and 'http2'"""
+    with _transports_lock:
+        transports = dict(_transports)
+    return {('http2' if http2 else 'http1'): transport.stats() for http2, transport in transports.items()}
+
+
+def close_shared_transports():
+    """Close the shared transports and their connections (they are recreated on next use)"""
+    with _transports_lock:
+        transports = list(_transports.values())
+        _transports.clear()
+    for transport in transports:
+        transport.shutdown()
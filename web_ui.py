@@ -3,24 +3,22 @@ Simple Web UI for Tesco Scraper
 A Flask web interface to make scraping easier
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
-from tesco_scraper import TescoScraper
-import os
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
+from werkzeug.utils import safe_join, secure_filename
+from tesco_scraper import TescoScraper, product_to_dict
+from rate_limiter import LatencyWindow
+from transport import transport_stats
+from jobs import Job, JobManager, QueueFullError
+from job_store import JobStore, SharedJobManager
+from exports import EXPORT_FORMATS, ExportCache, available_encodings
+from product_index import SORT_KEYS, IndexCache
 import json
+import os
+import re
 from datetime import datetime
-import threading
 
 app = Flask(__name__)
 
-# Global variables to track scraping status
-scraping_status = {
-    'is_running': False,
-    'progress': 0,
-    'message': '',
-    'results': [],
-    'error': None
-}
-
 @app.route('/')
 def index():
     """Main page"""
@@ -29,11 +27,6 @@ def index():
 @app.route('/search', methods=['POST'])
 def search_products():
     """Start product search"""
-    global scraping_status
-    
-    if scraping_status['is_running']:
-        return jsonify({'error': 'Scraping already in progress'}), 400
-    
     data = request.get_json()
     search_term = data.get('search_term', '').strip()
     max_pages = int(data.get('max_pages', 2))
@@ -41,100 +34,281 @@ def search_products():
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
-    # Reset status
-    scraping_status.update({
-        'is_running': True,
-        'progress': 0,
-        'message': f'Starting search for "{search_term}"...',
-        'results': [],
-        'error': None
-    })
+    try:
+        # Identical searches share one job: a running one is joined, a recent one is reused
+        job = job_manager.submit(search_term, max_pages)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     
-    # Start scraping in background thread
-    thread = threading.Thread(target=scrape_products, args=(search_term, max_pages))
-    thread.daemon = True
-    thread.start()
+    if job.status == Job.COMPLETED:
+        return jsonify({'message': 'Search results ready', 'status': job.status, 'job_id': job.id,
+                        'queue_position': 0, 'cached': True})
     
-    return jsonify({'message': 'Search started', 'status': 'started'})
+    return jsonify({
+        'message': 'Search started',
+        'status': job.status,
+        'job_id': job.id,
+        'queue_position': job_manager.queue_position(job),
+        'cached': False
+    }), 202
+
+def product_to_result(product):
+    """Convert a product to the dictionary sent to the browser (and exported on download)"""
+    result = product_to_dict(product)
+    result['brand'] = product.brand or 'N/A'
+    return result
+
+# Seconds a search may run before it finishes with the pages scraped so far
+SEARCH_DEADLINE = float(os.environ.get('SEARCH_DEADLINE', 120))
+
+# Response times of recent searches, used to decide when to hedge a slow request
+search_latencies = LatencyWindow()
 
-def scrape_products(search_term, max_pages):
-    """Background function to scrape products"""
-    global scraping_status
+def scrape_products(job):
+    """Background function to scrape products for a job"""
+    scraper = TescoScraper(
+        delay=1,
+        deadline=SEARCH_DEADLINE or None,
+        # Hedging duplicates slow requests to the site, so deployments opt in with SEARCH_HEDGE=1
+        hedge=os.environ.get('SEARCH_HEDGE') == '1',
+        latencies=search_latencies,
+        # Jobs share one connection pool, so back-to-back searches skip the TCP/TLS handshakes
+        shared_transport=True,
+        http2=os.environ.get('HTTP2') == '1'
+    )
+    
+    job.report_progress(10, job.message)
     
     try:
-        scraper = TescoScraper(delay=1)
-        
-        scraping_status['message'] = f'Searching for "{search_term}"...'
-        scraping_status['progress'] = 10
-        
-        products = scraper.search_products(search_term, max_pages=max_pages)
-        
-        scraping_status['progress'] = 80
-        scraping_status['message'] = f'Found {len(products)} products, saving results...'
-        
-        # Convert products to dictionaries for JSON
-        results = []
-        for product in products:
-            results.append({
-                'name': product.name,
-                'price': product.price,
-                'price_per_unit': product.price_per_unit,
-                'image_url': product.image_url,
-                'product_url': product.product_url,
-                'availability': product.availability,
-                'brand': product.brand or 'N/A'
-            })
-        
-        # Save to files
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{search_term.replace(' ', '_')}_{timestamp}"
-        
-        scraper.save_to_csv(products, f"static/downloads/{filename}.csv")
-        scraper.save_to_json(products, f"static/downloads/{filename}.json")
-        
-        scraping_status.update({
-            'is_running': False,
-            'progress': 100,
-            'message': f'Search completed! Found {len(products)} products.',
-            'results': results,
-            'csv_file': f"{filename}.csv",
-            'json_file': f"{filename}.json"
-        })
-        
-    except Exception as e:
-        scraping_status.update({
-            'is_running': False,
-            'progress': 0,
-            'message': 'Search failed',
-            'error': str(e),
-            'results': []
-        })
+        # Publish each page as soon as it is scraped so streaming clients see results early
+        count = 0
+        for page, page_products in enumerate(scraper.iter_search_pages(job.search_term, max_pages=job.max_pages), 1):
+            count += len(page_products)
+            job.add_results([product_to_result(product) for product in page_products])
+            job.report_progress(
+                10 + 80 * page // job.max_pages,
+                f'Scraped page {page} of {job.max_pages}, {count} products so far...',
+                page=page,
+                count=count
+            )
+    finally:
+        scraper.close()
+    
+    # Download files are generated from the stored results when first requested
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{secure_filename(job.search_term) or 'search'}_{timestamp}_{job.id}"
+    
+    message = f'Search completed! Found {count} products.'
+    if scraper.deadline_reached:
+        message = f'Search stopped at the {SEARCH_DEADLINE:g}s time limit. Found {count} products.'
+    
+    job.update(
+        status=Job.COMPLETED,
+        progress=100,
+        message=message,
+        files={fmt: f"{filename}.{fmt}" for fmt in EXPORT_FORMATS}
+    )
+
+# Generated downloads, deleted after EXPORT_MAX_AGE seconds or beyond EXPORT_MAX_MB in total
+export_cache = ExportCache(
+    'static/downloads',
+    max_age=float(os.environ.get('EXPORT_MAX_AGE', 24 * 3600)),
+    max_bytes=int(float(os.environ.get('EXPORT_MAX_MB', 256)) * 1024 * 1024)
+)
+
+# Download names look like <search>_<timestamp>_<job id>.<format>
+EXPORT_FILENAME = re.compile(r'^.+_(?P<job_id>[0-9a-f]{12})\.(?P<fmt>csv|json)$')
+
+def create_job_manager():
+    """
+    Build the job manager from the environment
+    Runs up to SCRAPE_WORKERS searches at once (per process) and queues the rest;
+    repeated searches reuse results for SEARCH_CACHE_TTL seconds. With JOB_STORE
+    set, jobs live in that SQLite file so several worker processes can share them.
+    """
+    options = {
+        'max_workers': int(os.environ.get('SCRAPE_WORKERS', 4)),
+        'max_queued': int(os.environ.get('SCRAPE_QUEUE', 50)),
+        'cache_ttl': float(os.environ.get('SEARCH_CACHE_TTL', 600)),
+    }
+    store_path = os.environ.get('JOB_STORE')
+    if store_path:
+        return SharedJobManager(scrape_products, JobStore(store_path), **options)
+    return JobManager(scrape_products, cache_size=int(os.environ.get('SEARCH_CACHE_SIZE', 100)), **options)
+
+job_manager = create_job_manager()
+
+# Seconds between keepalive comments on an idle event stream
+SSE_KEEPALIVE = 15
+
+def _requested_job():
+    """Job named by the job_id query parameter, or the most recent one"""
+    job_id = request.args.get('job_id')
+    return job_manager.get(job_id) if job_id else job_manager.latest()
 
 @app.route('/status')
-def get_status():
-    """Get current scraping status"""
-    return jsonify(scraping_status)
+@app.route('/status/<job_id>')
+def get_status(job_id=None):
+    """Get the status of a job (the most recent one if no ID is given)"""
+    job = job_manager.get(job_id) if job_id else _requested_job()
+    if job is None:
+        if job_id or request.args.get('job_id'):
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify({'is_running': False, 'progress': 0, 'message': '', 'results': [], 'error': None})
+    
+    status = job.to_dict()
+    status['queue_position'] = job_manager.queue_position(job)
+    return jsonify(status)
+
+@app.route('/stream/<job_id>')
+def stream_job(job_id):
+    """
+    Stream a job's progress as Server-Sent Events
+    Sends 'status', 'progress' and 'products' events (only the products scraped
+    since the previous event) and ends with a 'done' event. Reconnecting clients
+    resume after the Last-Event-ID header or the last_event_id query parameter.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+    
+    def events():
+        after = last_event_id
+        while True:
+            new_events = job.wait_for_events(after, timeout=SSE_KEEPALIVE)
+            if not new_events:
+                # Comment line, keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            for event in new_events:
+                data = event['data']
+                if event['event'] == 'products':
+                    data = {'products': job.results_slice(data['start'], data['end']), **data}
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(data)}\n\n"
+                after = event['id']
+                if event['event'] == 'done':
+                    return
+    
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/jobs')
+def list_jobs():
+    """Job counts by status, and connection reuse of this process's shared transport"""
+    stats = job_manager.stats()
+    stats['transport'] = transport_stats()
+    return jsonify(stats)
+
+# Indexes of recently queried jobs' results, rebuilt as a running job adds products
+index_cache = IndexCache(max_size=int(os.environ.get('QUERY_INDEX_JOBS', 8)))
+
+# Most products one /query response returns
+QUERY_MAX_LIMIT = 500
+
+@app.route('/query')
+def query_products():
+    """
+    Filter, sort and page a job's results (the most recent job if no job_id is given)
+    Query parameters: q (words in the name or brand), min_price / max_price and
+    max_unit_price (pence), unit (kg, l or each), brand, availability, promo=1,
+    clubcard=1, sort (position, price, unit_price or name), order (asc or desc),
+    offset, limit and facets=1. Returns the total match count, the page of products
+    and (with facets=1) facet counts, answered from an index of the job's results.
+    """
+    job = _requested_job()
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    args = request.args
+    try:
+        numbers = {name: float(args[name]) for name in ('min_price', 'max_price', 'max_unit_price') if args.get(name)}
+        offset = max(int(args.get('offset', 0)), 0)
+        limit = min(max(int(args.get('limit', 50)), 0), QUERY_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Prices, offset and limit must be numbers'}), 400
+    sort = args.get('sort', 'position')
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f"sort must be one of: {', '.join(SORT_KEYS)}"}), 400
+    
+    count = job.to_dict(include_results=False)['result_count']
+    index = index_cache.get(job.id, count, lambda: job.results_slice(0, count))
+    result = index.query(
+        text=args.get('q'),
+        unit_basis=args.get('unit') or None,
+        brand=args.get('brand') or None,
+        availability=args.get('availability') or None,
+        promo=args.get('promo') == '1',
+        clubcard=args.get('clubcard') == '1',
+        sort=sort,
+        descending=args.get('order') == 'desc',
+        offset=offset,
+        limit=limit,
+        facets=args.get('facets') == '1',
+        **numbers
+    )
+    result.update(job_id=job.id, status=job.status, offset=offset, limit=limit)
+    return jsonify(result)
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Download results file"""
-    file_path = os.path.join('static', 'downloads', filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    else:
+    """
+    Download a job's results as CSV or JSON
+    The file is generated from the stored results on first request, then served
+    from the export cache; gzip/zstd copies go to clients that accept them. Range
+    and conditional requests are answered by send_file.
+    """
+    match = EXPORT_FILENAME.match(filename)
+    if match is None:
+        # Files saved before downloads were generated on demand
+        file_path = safe_join(export_cache.directory, filename)
+        if file_path and os.path.isfile(file_path):
+            return send_file(file_path, as_attachment=True)
         return jsonify({'error': 'File not found'}), 404
+    
+    def load_rows():
+        job = job_manager.get(match['job_id'])
+        if job is None or job.status != Job.COMPLETED or job.files.get(match['fmt']) != filename:
+            return None
+        return job.to_dict()['results']
+    
+    encoding = _preferred_encoding()
+    for attempt in range(2):
+        path = export_cache.get(filename, load_rows, encoding)
+        if path is None:
+            return jsonify({'error': 'File not found'}), 404
+        try:
+            response = send_file(path, mimetype=EXPORT_FORMATS[match['fmt']], as_attachment=True,
+                                 download_name=filename, conditional=True)
+            break
+        except FileNotFoundError:
+            # Another worker evicted the export before it was opened; generate it again
+            if attempt:
+                raise
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _preferred_encoding():
+    """Compressed encoding the client accepts most, or None for the plain file"""
+    if not request.headers.get('Accept-Encoding'):
+        return None
+    accepted = [encoding for encoding in available_encodings() if request.accept_encodings[encoding] > 0]
+    return max(accepted, key=lambda encoding: request.accept_encodings[encoding], default=None)
 
 @app.route('/clear')
 def clear_results():
-    """Clear current results"""
-    global scraping_status
-    if not scraping_status['is_running']:
-        scraping_status.update({
-            'progress': 0,
-            'message': '',
-            'results': [],
-            'error': None
-        })
+    """Clear a finished job's results (the most recent job if no ID is given)"""
+    job = _requested_job()
+    if job is not None:
+        job_manager.remove(job.id)
+        index_cache.discard(job.id)
     return jsonify({'message': 'Results cleared'})
 
 # Create necessary directories
@@ -0,0 +1,117 @@
+"""
+Streaming writers for scraped products
+Append products to CSV or JSON Lines files as they arrive, so a crawl of any
+size writes with flat memory and the first rows reach disk within seconds.
+"""
+
+import csv
+import json
+import logging
+import os
+import time
+from typing import Iterable
+
+from tesco_scraper import PRODUCT_FIELDS, Product, product_to_dict
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingWriter:
+    """Base class for writers that append one product at a time"""
+
+    def __init__(self, filename: str, append: bool = False, flush_interval: float = 1.0):
+        """
+        Open the output file
+        Args:
+            filename (str): Output filename
+            append (bool): Add to an existing file instead of replacing it
+            flush_interval (float): Maximum seconds a written product waits before reaching disk
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.count = 0
+        existing = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+        self._file = open(filename, 'a' if append else 'w', encoding='utf-8', newline='')
+        self._last_flush = time.monotonic()
+        self._open(new_file=not existing)
+
+    def _open(self, new_file: bool):
+        """Prepare the file, writing anything a new file needs before its first product"""
+
+    def _write(self, product: Product):
+        raise NotImplementedError
+
+    def write(self, product: Product):
+        """Append one product"""
+        self._write(product)
+        self.count += 1
+        now = time.monotonic()
+        if self.count == 1 or now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def write_many(self, products: Iterable[Product]) -> int:
+        """
+        Append products as they are produced (e.g. from iter_search_products)
+        Returns:
+            int: Number of products written
+        """
+        written = 0
+        for product in products:
+            self.write(product)
+            written += 1
+        return written
+
+    def close(self):
+        """Flush and close the file"""
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Saved {self.count} products to {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CSVStreamWriter(StreamingWriter):
+    """Appends products to a CSV file with the same columns as save_to_csv"""
+
+    def _open(self, new_file: bool):
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        if new_file:
+            self._writer.writerow(PRODUCT_FIELDS)
+
+    def _write(self, product: Product):
+        self._writer.writerow(['' if value is None else value for value in
+                               (getattr(product, field) for field in PRODUCT_FIELDS)])
+
+
+class JSONLinesWriter(StreamingWriter):
+    """Appends products to a JSON Lines file, one JSON object per line"""
+
+    def _write(self, product: Product):
+        self._file.write(json.dumps(product_to_dict(product), ensure_ascii=False))
+        self._file.write('\n')
+
+
+def stream_to_file(products: Iterable[Product], filename: str, append: bool = False) -> int:
+    """
+    Write products to a CSV (.csv) or JSON Lines (.jsonl) file as they are produced
+    Args:
+        products: Products, typically from iter_search_products or iter_category
+        filename (str): Output filename; the extension picks the format
+        append (bool): Add to an existing file instead of replacing it
+    Returns:
+        int: Number of products written
+    """
+    if filename.endswith('.csv'):
+        writer_class = CSVStreamWriter
+    elif filename.endswith(('.jsonl', '.ndjson')):
+        writer_class = JSONLinesWriter
+    else:
+        raise ValueError(f"Cannot tell the output format of '{filename}', use .csv or .jsonl")
+
+    with writer_class(filename, append=append) as writer:
+        return writer.write_many(products)